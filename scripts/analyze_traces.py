@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""Stage latency percentiles, retry-time breakdown and critical path from trace logs (T07.4).
+
+Reads one or more `trace.jsonl` files, each with its rotated segments (plain or `.gz`), in a single
+streaming pass. Memory grows with
+the number of runs and distinct stages, not with the number of events: latencies go into fixed-size
+log-bucket sketches (about 1% relative error), and span trees are folded as records arrive. A span
+is written after its children, so an open parent only holds the best sibling chains seen so far:
+one `(end time, chain length)` entry per end time that beats every earlier-ending chain, at most
+`CHILD_WINDOW` of them. A new span extends the longest chain that ended before it started; the
+critical path of a span is the longest chain among its children. Each chain keeps its total and
+step count but only its last `MAX_PATH_STEPS` steps.
+
+Records without `duration_ms` (branch-boundary events from `emit_trace_log.py`) get the time since
+the previous event of the same run as their duration. Records without a parseable `ts` are counted
+as malformed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import gzip
+import json
+import math
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import stage_profile
+import trace_store
+
+
+RELATIVE_ACCURACY = 0.01
+QUANTILES = (0.5, 0.95, 0.99)
+CHILD_WINDOW = 256
+MAX_PATH_STEPS = 64
+ROOT = ""
+
+Step = Tuple[str, float, Optional[str], int]  # stage, duration_ms, service, depth
+Chain = Tuple[float, float, Tuple[Step, ...], int]  # end_s, total_ms, last steps (depth-first), omitted steps
+
+
+class LatencySketch:
+    """Log-bucketed histogram: constant memory per key, quantiles within RELATIVE_ACCURACY."""
+
+    _gamma = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+    _log_gamma = math.log(_gamma)
+
+    __slots__ = ("buckets", "zeros", "count", "total", "max")
+
+    def __init__(self) -> None:
+        self.buckets: Dict[int, int] = {}
+        self.zeros = 0
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        if value <= 1e-6:
+            self.zeros += 1
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank = max(math.ceil(q * self.count) - 1, 0)  # nearest rank, 0-based
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank < seen:
+                return min(2 * self._gamma**key / (self._gamma + 1), self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        out = {"count": self.count, "total_ms": round(self.total, 3), "max_ms": round(self.max, 3)}
+        for q in QUANTILES:
+            out[f"p{int(q * 100)}_ms"] = round(self.quantile(q), 3)
+        return out
+
+
+class RunState:
+    __slots__ = ("stages", "pending", "last_event_ts", "retry", "events", "first_ts", "last_ts")
+
+    def __init__(self) -> None:
+        self.stages: Dict[str, List[float]] = {}  # stage -> [count, total_ms]
+        # parent span_id (ROOT for top-level spans) -> chains sorted by end, lengths increasing
+        self.pending: Dict[str, List[Chain]] = {}
+        self.last_event_ts: float | None = None
+        self.retry: Dict[str, float] = {"failed_attempt_ms": 0.0, "backoff_ms": 0.0, "successful_attempt_ms": 0.0}
+        self.events = 0
+        self.first_ts: str | None = None
+        self.last_ts: str | None = None
+
+
+def _open(path: Path) -> Iterable[str]:
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8")
+    return path.open("r", encoding="utf-8")
+
+
+def _lines(path: Path, run_id: str | None) -> Iterator[str]:
+    if run_id is not None and trace_store.index_path(path).exists():
+        # Indexed segment: read only the byte ranges holding this run.
+        yield from trace_store.query_segment(path, run_id)
+        return
+    with _open(path) as fh:
+        yield from fh
+
+
+def expand_paths(paths: Iterable[Path]) -> List[Path]:
+    """Each given log with its rotated (and `.gz`) segments from `trace_store.segments`, oldest first.
+
+    An unindexed active log is read as is; index and lock sidecars (from `trace*.jsonl*` globs) and
+    segments already listed are skipped.
+    """
+    out: List[Path] = []
+    seen = set()
+    for path in paths:
+        if path.name.endswith((trace_store.INDEX_SUFFIX, ".lock")):
+            continue
+        found = trace_store.segments(path)
+        if path not in found and (path.exists() or not found):
+            found.append(path)
+        for segment in found:
+            key = segment.resolve()
+            if key not in seen:
+                seen.add(key)
+                out.append(segment)
+    return out
+
+
+def iter_records(paths: Iterable[Path], stats: Dict[str, int], run_id: str | None = None) -> Iterator[Dict[str, Any]]:
+    for path in expand_paths(paths):
+        for line in _lines(path, run_id):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                stats["malformed"] += 1
+                continue
+            if isinstance(record, dict) and record.get("stage"):
+                yield record
+            else:
+                stats["malformed"] += 1
+
+
+def _epoch(ts: Any) -> float | None:
+    if not isinstance(ts, str):
+        return None
+    try:
+        return datetime.fromisoformat(ts).timestamp()
+    except ValueError:
+        return None
+
+
+def _service(record: Dict[str, Any]) -> str | None:
+    attrs = record.get("attrs") or {}
+    return attrs.get("service") or attrs.get("final_service")
+
+
+class TraceAnalyzer:
+    def __init__(self, run_filter: str | None = None) -> None:
+        self.run_filter = run_filter
+        self.runs: Dict[Tuple[str, str], RunState] = {}
+        self.by_stage: Dict[str, LatencySketch] = {}
+        self.by_service: Dict[Tuple[str, str], LatencySketch] = {}
+        self.retry_by_class: Dict[str, Dict[str, float]] = {}
+        self.retry_by_service: Dict[str, Dict[str, float]] = {}
+        self.records = 0
+        self.malformed = 0
+
+    def add(self, record: Dict[str, Any]) -> None:
+        run_id = str(record.get("run_id"))
+        if self.run_filter is not None and run_id != self.run_filter:
+            return
+        ts = record.get("ts")
+        now = _epoch(ts)
+        duration = record.get("duration_ms")
+        if now is None or not isinstance(duration, (int, float, type(None))):
+            self.malformed += 1
+            return
+        key = (run_id, str(record.get("trace_id") or run_id))
+        run = self.runs.get(key)
+        if run is None:
+            run = self.runs[key] = RunState()
+        self.records += 1
+        run.events += 1
+        if run.first_ts is None or ts < run.first_ts:
+            run.first_ts = ts
+        end_ts = record.get("end_ts")
+        if not isinstance(end_ts, str) or _epoch(end_ts) is None:
+            end_ts = ts
+        if run.last_ts is None or end_ts > run.last_ts:
+            run.last_ts = end_ts
+
+        stage = record["stage"]
+        start_s = now
+        if duration is None:
+            # Boundary event: the stage ran since the previous boundary of this run.
+            duration = (now - run.last_event_ts) * 1000 if run.last_event_ts is not None else None
+            run.last_event_ts = now
+            if duration is None:
+                return
+            start_s = now - duration / 1000
+        duration = float(duration)
+
+        counts = run.stages.setdefault(stage, [0, 0.0])
+        counts[0] += 1
+        counts[1] += duration
+        self.by_stage.setdefault(stage, LatencySketch()).add(duration)
+        service = _service(record)
+        if service:
+            self.by_service.setdefault((stage, service), LatencySketch()).add(duration)
+        self._retry(run, record, stage, duration, service)
+        self._fold(run, record, stage, start_s, duration, service)
+
+    def _retry(self, run: RunState, record: Dict[str, Any], stage: str, duration: float, service: str | None) -> None:
+        if stage == "attempt":
+            bucket = "successful_attempt_ms" if record.get("status") == "ok" else "failed_attempt_ms"
+        elif stage == "backoff":
+            bucket = "backoff_ms"
+        else:
+            return
+        run.retry[bucket] += duration
+        if bucket != "successful_attempt_ms":
+            error_class = (record.get("attrs") or {}).get("error_class") or "unknown"
+            row = self.retry_by_class.setdefault(error_class, {"failed_attempt_ms": 0.0, "backoff_ms": 0.0})
+            row[bucket] += duration
+        if service:
+            row = self.retry_by_service.setdefault(
+                service, {"failed_attempt_ms": 0.0, "backoff_ms": 0.0, "successful_attempt_ms": 0.0}
+            )
+            row[bucket] += duration
+
+    def _fold(
+        self, run: RunState, record: Dict[str, Any], stage: str, start_s: float, duration: float, service: str | None
+    ) -> None:
+        end_s = start_s + duration / 1000
+        span_id = record.get("span_id")
+        children = run.pending.pop(span_id, None) if span_id else None
+        # This span followed by its children's critical chain, one level deeper.
+        steps: Tuple[Step, ...] = ((stage, duration, service, 0),)
+        omitted = 0
+        if children:
+            _, _, child_steps, omitted = children[-1]
+            steps += tuple((s, d, svc, depth + 1) for s, d, svc, depth in child_steps)
+
+        parent = record.get("parent_id") if span_id else None
+        chains = run.pending.setdefault(parent or ROOT, [])
+        ends = [chain[0] for chain in chains]
+        before = bisect.bisect_right(ends, start_s + 1e-6)
+        total = duration
+        if before:
+            _, prev_total, prev_steps, prev_omitted = chains[before - 1]
+            total += prev_total
+            steps = prev_steps + steps
+            omitted += prev_omitted
+        if len(steps) > MAX_PATH_STEPS:
+            omitted += len(steps) - MAX_PATH_STEPS
+            steps = steps[-MAX_PATH_STEPS:]
+
+        # Keep chains sorted by end with strictly increasing totals: a chain that ends later but is
+        # not longer than another can never be the best predecessor or the critical path.
+        at = bisect.bisect_right(ends, end_s)
+        if at and chains[at - 1][1] >= total:
+            return
+        drop = at
+        while drop < len(chains) and chains[drop][1] <= total:
+            drop += 1
+        chains[at:drop] = [(end_s, total, steps, omitted)]
+        if len(chains) > CHILD_WINDOW:
+            del chains[0]
+
+    def _critical_path(self, run: RunState) -> Dict[str, Any]:
+        """Longest chain of top-level spans, each expanded through its children's critical chain."""
+        roots = run.pending.get(ROOT)
+        if not roots:
+            return {"total_ms": 0.0, "steps": [], "omitted_steps": 0}
+        _, total, chain, omitted = roots[-1]
+        steps: List[Dict[str, Any]] = []
+        for stage, duration, service, depth in chain:
+            node: Dict[str, Any] = {"stage": stage, "duration_ms": round(duration, 3), "depth": depth}
+            if service:
+                node["service"] = service
+            steps.append(node)
+        return {"total_ms": round(total, 3), "steps": steps, "omitted_steps": omitted}
+
+    def report(self) -> Dict[str, Any]:
+        runs = []
+        for (run_id, trace_id), run in sorted(self.runs.items(), key=lambda item: item[1].first_ts or ""):
+            wall_ms = None
+            first_s, last_s = _epoch(run.first_ts), _epoch(run.last_ts)
+            if first_s is not None and last_s is not None:
+                wall_ms = round((last_s - first_s) * 1000, 3)
+            runs.append(
+                {
+                    "run_id": run_id,
+                    "trace_id": trace_id,
+                    "events": run.events,
+                    "started": run.first_ts,
+                    "wall_ms": wall_ms,
+                    "stages": {stage: {"count": c, "total_ms": round(t, 3)} for stage, (c, t) in sorted(run.stages.items())},
+                    "retry": {k: round(v, 3) for k, v in run.retry.items()},
+                    "critical_path": self._critical_path(run),
+                    "unclosed_spans": sum(1 for key in run.pending if key != ROOT),
+                }
+            )
+        return {
+            "records": self.records,
+            "runs": runs,
+            "stages": {stage: sketch.summary() for stage, sketch in sorted(self.by_stage.items())},
+            "services": [
+                {"stage": stage, "service": service, **sketch.summary()}
+                for (stage, service), sketch in sorted(self.by_service.items())
+            ],
+            "retry_by_error_class": {k: {m: round(v, 3) for m, v in row.items()} for k, row in sorted(self.retry_by_class.items())},
+            "retry_by_service": {k: {m: round(v, 3) for m, v in row.items()} for k, row in sorted(self.retry_by_service.items())},
+        }
+
+
+def render_text(report: Dict[str, Any], max_runs: int = 10) -> str:
+    def ms(value: float | None) -> str:
+        return "-" if value is None else f"{value:.1f}"
+
+    lines = [f"{'stage':<28} {'service':<12} {'n':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}"]
+    rows = [(stage, "", s) for stage, s in report["stages"].items()]
+    rows += [(s["stage"], s["service"], s) for s in report["services"]]
+    for stage, service, s in sorted(rows, key=lambda r: (r[0], r[1])):
+        lines.append(
+            f"{stage[:28]:<28} {service[:12]:<12} {s['count']:>7} {ms(s['p50_ms']):>9} "
+            f"{ms(s['p95_ms']):>9} {ms(s['p99_ms']):>9} {ms(s['max_ms']):>9}"
+        )
+    if report["retry_by_error_class"]:
+        lines.append("")
+        lines.append(f"{'retry: error_class':<28} {'failed_ms':>12} {'backoff_ms':>12}")
+        for error_class, row in report["retry_by_error_class"].items():
+            lines.append(f"{error_class[:28]:<28} {ms(row['failed_attempt_ms']):>12} {ms(row['backoff_ms']):>12}")
+    slowest = sorted(report["runs"], key=lambda r: r["critical_path"]["total_ms"], reverse=True)[:max_runs]
+    for run in slowest:
+        cp = run["critical_path"]
+        lines.append("")
+        lines.append(
+            f"run {run['run_id']} trace {run['trace_id']}: critical path {ms(cp['total_ms'])} ms, "
+            f"wall {ms(run['wall_ms'])} ms, retry {ms(run['retry']['failed_attempt_ms'] + run['retry']['backoff_ms'])} ms"
+        )
+        if cp.get("omitted_steps"):
+            lines.append(f"  ... {cp['omitted_steps']} earlier steps omitted")
+        for step in cp["steps"]:
+            service = f" [{step['service']}]" if step.get("service") else ""
+            lines.append(f"  {'  ' * step['depth']}{step['stage']}{service} {ms(step['duration_ms'])}")
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Summarize trace logs: stage percentiles, retries, critical path")
+    parser.add_argument("paths", nargs="*", type=Path, default=[Path("logs/trace/trace.jsonl")])
+    parser.add_argument("--run-id", help="Only analyze this run")
+    parser.add_argument("--format", choices=["text", "json"], default="text")
+    parser.add_argument("--output", type=Path, help="Also write the JSON report here")
+    parser.add_argument("--max-runs", type=int, default=10, help="Runs shown in the text table (slowest first)")
+    args = parser.parse_args()
+
+    stats = {"malformed": 0}
+    analyzer = TraceAnalyzer(args.run_id)
+    for record in iter_records(args.paths, stats, args.run_id):
+        analyzer.add(record)
+    report = analyzer.report()
+    report["malformed_lines"] = stats["malformed"] + analyzer.malformed
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    if args.format == "json":
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        print(render_text(report, args.max_runs))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(stage_profile.run(main))
@@ -8,6 +8,9 @@ import json
 from pathlib import Path
 from typing import Any, Dict, List
 
+import page_ranges
+import stage_profile
+
 
 def _read_json(path: Path) -> Dict[str, Any]:
     return json.loads(path.read_text(encoding="utf-8"))
@@ -35,18 +38,19 @@ def main() -> int:
     parser.add_argument("--output", required=True, help="Output jobs JSON path")
     args = parser.parse_args()
 
+    pages = page_ranges.canonical(args.pages)
     payload = _read_json(Path(args.jobs))
     jobs: List[Dict[str, Any]] = payload.get("jobs", [])
 
     updated = 0
     for job in jobs:
         if _matches_target(job, args.target_file_id, args.target_job_id):
-            job["page_range"] = args.pages
+            job["page_range"] = pages
             job["rerun"] = True
             updated += 1
 
     payload["rerun"] = {
-        "pages": args.pages,
+        "pages": pages,
         "target_file_id": args.target_file_id,
         "target_job_id": args.target_job_id,
         "updated_jobs": updated,
@@ -58,4 +62,4 @@ def main() -> int:
 
 
 if __name__ == "__main__":
-    raise SystemExit(main())
+    raise SystemExit(stage_profile.run(main))
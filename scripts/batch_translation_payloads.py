@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""Pack routed OCR payloads into budgeted provider requests and unpack responses (T06.3)."""
+
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+from typing import Any, Dict, List
+
+from payload_store import SHARED_FIELDS, load_payloads
+import stage_profile
+import tracing
+
+
+DEFAULT_BUDGET = {"max_chars": 4000, "max_tokens": None, "max_items": 50}
+# Alternative size caps: a service that declares one does not inherit the other from the defaults.
+SIZE_KEYS = ("max_chars", "max_tokens")
+
+
+def _load(path: Path) -> Any:
+    return json.loads(path.read_text())
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough provider-agnostic estimate: CJK/non-ASCII ~1 token per char, ASCII ~4 chars per token."""
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return non_ascii + (len(text) - non_ascii + 3) // 4
+
+
+def service_budget(service_cfg: Dict[str, Any], service: str) -> Dict[str, Any]:
+    """Service budget with defaults filled in only for keys the service leaves unset.
+
+    `max_chars` and `max_tokens` count as one setting: a service that only declares `max_tokens`
+    (openai, ollama) is not also capped by the default character budget.
+    """
+    budgets = service_cfg.get("batch_budgets", {})
+    own = dict(budgets.get(service, {}))
+    defaults = dict(DEFAULT_BUDGET)
+    defaults.update(budgets.get("default", {}))
+    if any(own.get(key) for key in SIZE_KEYS):
+        defaults.update({key: None for key in SIZE_KEYS})
+    defaults.update(own)
+    return defaults
+
+
+def _fits(batch: Dict[str, Any], chars: int, tokens: int, budget: Dict[str, Any]) -> bool:
+    if not batch["items"]:
+        return True
+    if budget.get("max_items") and len(batch["items"]) + 1 > budget["max_items"]:
+        return False
+    if budget.get("max_chars") and batch["char_count"] + chars > budget["max_chars"]:
+        return False
+    if budget.get("max_tokens") and batch["token_estimate"] + tokens > budget["max_tokens"]:
+        return False
+    return True
+
+
+@tracing.traced()
+def pack_batches(payloads: List[Dict[str, Any]], service_cfg: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Greedy, order-preserving packing.
+
+    A batch never mixes services or files, items keep their routing order (and therefore page
+    order), and a segment larger than the budget travels alone rather than being split.
+    """
+    batches: List[Dict[str, Any]] = []
+    current: Dict[str, Any] | None = None
+
+    for payload in payloads:
+        text = str(payload.get("source_text", ""))
+        chars = len(text)
+        tokens = estimate_tokens(text)
+        group = (payload.get("service"), payload.get("file_id"))
+        budget = service_budget(service_cfg, str(payload.get("service")))
+
+        if current is None or current["_group"] != group or not _fits(current, chars, tokens, budget):
+            current = {
+                "_group": group,
+                "batch_id": f"batch_{len(batches) + 1:04d}",
+                "shared": {key: payload.get(key) for key in SHARED_FIELDS},
+                "budget": budget,
+                "pages": [],
+                "char_count": 0,
+                "token_estimate": 0,
+                "items": [],
+            }
+            batches.append(current)
+
+        page = payload.get("page")
+        if not current["pages"] or current["pages"][-1] != page:
+            current["pages"].append(page)
+        current["items"].append(
+            {
+                "index": len(current["items"]),
+                "segment_id": payload.get("segment_id"),
+                "page": page,
+                "bbox": payload.get("bbox"),
+                "source_text": text,
+                "memory_key": payload.get("memory_key"),
+                "glossary_hits": payload.get("glossary_hits", []),
+            }
+        )
+        current["char_count"] += chars
+        current["token_estimate"] += tokens
+
+    for batch in batches:
+        batch.pop("_group")
+    return batches
+
+
+def unpack_batch(batch: Dict[str, Any], response_items: List[Any]) -> List[Dict[str, Any]]:
+    """Map provider response items back to segment ids.
+
+    Items may be plain strings (matched by position) or objects carrying `index` or
+    `segment_id` plus `translated_text`/`text`. Any count, id or shape mismatch raises ValueError
+    so a partially answered batch is never silently misaligned.
+    """
+    items = batch.get("items", [])
+    if not isinstance(response_items, list):
+        raise ValueError(f"{batch.get('batch_id')}: response is not an array")
+    if len(response_items) != len(items):
+        raise ValueError(
+            f"{batch.get('batch_id')}: expected {len(items)} response items, got {len(response_items)}"
+        )
+
+    by_segment = {item["segment_id"]: item for item in items}
+    out: List[Dict[str, Any] | None] = [None] * len(items)
+    for position, resp in enumerate(response_items):
+        if isinstance(resp, str):
+            idx, text = position, resp
+        elif not isinstance(resp, dict):
+            raise ValueError(f"{batch.get('batch_id')}: response item at position {position} is not a string or object")
+        else:
+            text = resp.get("translated_text", resp.get("text"))
+            if "index" in resp:
+                idx = resp["index"]
+                if isinstance(idx, str) and idx.strip().isdigit():
+                    idx = int(idx)
+                if not isinstance(idx, int) or isinstance(idx, bool):
+                    raise ValueError(f"{batch.get('batch_id')}: invalid index {idx!r} at position {position}")
+            elif resp.get("segment_id") in by_segment:
+                idx = by_segment[resp["segment_id"]]["index"]
+            else:
+                idx = position
+        if not 0 <= idx < len(items) or out[idx] is not None or not isinstance(text, str):
+            raise ValueError(f"{batch.get('batch_id')}: invalid or duplicate response item at position {position}")
+        out[idx] = {"segment_id": items[idx]["segment_id"], "translated_text": text}
+    return [row for row in out if row is not None]
+
+
+def summarize(payloads: List[Dict[str, Any]], batches: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "total_payloads": len(payloads),
+        "total_batches": len(batches),
+        "avg_items_per_batch": round(len(payloads) / len(batches), 2) if batches else 0.0,
+        "max_batch_chars": max((b["char_count"] for b in batches), default=0),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Batch OCR translation payloads for provider requests")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    pack = sub.add_parser("pack", help="Pack translation payloads into budgeted batches")
+    pack.add_argument("payloads", type=Path, help="translation-payloads.json (or compact directory) from routing")
+    pack.add_argument("--services-config", type=Path, default=Path("configs/services.json"))
+    pack.add_argument("--output", type=Path, default=Path("logs/ocr/translation-batches.json"))
+
+    unpack = sub.add_parser("unpack", help="Map batch responses back to segment ids")
+    unpack.add_argument("responses", type=Path, help="JSON map of batch_id -> response item array")
+    unpack.add_argument("--batches", type=Path, required=True)
+    unpack.add_argument("--output", type=Path, default=Path("logs/ocr/translations.json"))
+    args = parser.parse_args()
+
+    if args.command == "pack":
+        payloads = load_payloads(args.payloads)
+        batches = pack_batches(payloads, _load(args.services_config))
+        summary = summarize(payloads, batches)
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(batches, ensure_ascii=False, indent=2) + "\n")
+        print(json.dumps({"status": "PASS", "summary": summary, "output": str(args.output)}))
+        return 0
+
+    batches = _load(args.batches)
+    responses = _load(args.responses)
+    rows: List[Dict[str, Any]] = []
+    failed: List[Dict[str, str]] = []
+    for batch in batches:
+        items = responses.get(batch["batch_id"])
+        if items is None:
+            failed.append({"batch_id": batch["batch_id"], "reason": "missing_response"})
+            continue
+        try:
+            rows.extend(unpack_batch(batch, items))
+        except ValueError as exc:
+            failed.append({"batch_id": batch["batch_id"], "reason": str(exc)})
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(rows, ensure_ascii=False, indent=2) + "\n")
+    status = "PASS" if not failed else "FAIL"
+    print(json.dumps({"status": status, "segments": len(rows), "failed_batches": failed, "output": str(args.output)}))
+    return 0 if not failed else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(stage_profile.run(main))
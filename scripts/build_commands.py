@@ -8,11 +8,15 @@ import hashlib
 import json
 import shlex
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
+
+import page_ranges
+import stage_profile
+import tracing
 
 
 OPTIONAL_ARG_ORDER = (
-    ("page_range", "--pages", lambda v: v and v != "all"),
+    ("page_range", "--pages", lambda v: v and _pages_arg(v) != "all"),
     ("pool_max_workers", "--pool-max-workers", lambda v: v is not None),
     ("prompt_path", "--custom-system-prompt", lambda v: bool(v)),
     ("glossary_path", "--glossaries", lambda v: bool(v)),
@@ -31,6 +35,14 @@ def _service_flag(service: str, config: Dict[str, Any]) -> str | None:
     return flags[service]
 
 
+def _pages_arg(value: Any) -> str:
+    """Canonical `--pages` value; a range the engine cannot parse is passed through as given."""
+    try:
+        return page_ranges.canonical(str(value))
+    except ValueError:
+        return str(value)
+
+
 def build_argv(job: Dict[str, Any], service_config: Dict[str, Any]) -> List[str]:
     argv: List[str] = [
         "pdf2zh-next",
@@ -54,11 +66,119 @@ def build_argv(job: Dict[str, Any], service_config: Dict[str, Any]) -> List[str]
             continue
         if key == "pool_max_workers":
             value = max(1, int(value))
+        elif key == "page_range":
+            value = _pages_arg(value)
         argv.extend([flag_name, str(value)])
 
     return argv
 
 
+COALESCE_IGNORED_KEYS = {"job_id", "page_range", "chunked_from", "rerun", "coalesced_from"}
+
+
+def _coalesce_key(job: Dict[str, Any]) -> str:
+    return json.dumps({k: v for k, v in job.items() if k not in COALESCE_IGNORED_KEYS}, sort_keys=True, default=str)
+
+
+def coalesce_jobs(jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Merge jobs on the same file/options whose page ranges overlap or touch.
+
+    Planned chunks (`chunked_from`) are never extended, so the max-pages-per-part cap holds:
+    pages a chunk already covers are removed from every other job instead. Non-chunked jobs are
+    merged with each other (the first job of each group, in input order, keeps its job_id), then
+    clipped against the chunks; a job left with no pages is dropped. Every chunk or merged job
+    lists the job ids whose pages it took over in `coalesced_from`. Jobs with an unparsable
+    `page_range` pass through unchanged.
+    """
+    spans: Dict[int, List[page_ranges.Interval]] = {}
+    groups: Dict[str, List[int]] = {}
+    for idx, job in enumerate(jobs):
+        try:
+            spans[idx] = page_ranges.parse(job.get("page_range"))
+        except ValueError:
+            continue
+        groups.setdefault(_coalesce_key(job), []).append(idx)
+
+    parent = list(range(len(jobs)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    absorbed: Dict[int, List[int]] = {}  # surviving job index -> job indexes it took pages from
+    clipped: Dict[int, List[page_ranges.Interval]] = {}
+    for members in groups.values():
+        chunks = [idx for idx in members if jobs[idx].get("chunked_from")]
+        plain = [idx for idx in members if not jobs[idx].get("chunked_from")]
+
+        # Chunks keep their planned ranges; a later chunk only loses pages an earlier one covers.
+        covered: List[page_ranges.Interval] = []
+        owners: List[Tuple[List[page_ranges.Interval], int]] = []
+        for idx in chunks:
+            _take_over(idx, spans[idx], owners, absorbed)
+            clipped[idx] = page_ranges.subtract(spans[idx], covered)
+            covered = page_ranges.union(covered, spans[idx])
+            if clipped[idx]:
+                owners.append((clipped[idx], idx))
+
+        ordered = sorted((start, end, idx) for idx in plain for start, end in spans[idx])
+        reach_end, reach_idx = 0, -1
+        for start, end, idx in ordered:
+            if reach_idx >= 0 and start <= reach_end + 1:
+                parent[find(idx)] = find(reach_idx)
+            if end >= reach_end:
+                reach_end, reach_idx = end, idx
+        merged_plain: Dict[int, List[int]] = {}
+        for idx in plain:
+            merged_plain.setdefault(find(idx), []).append(idx)
+        for group in merged_plain.values():
+            head = min(group)
+            intervals: List[page_ranges.Interval] = []
+            for idx in sorted(group):
+                intervals = page_ranges.union(intervals, spans[idx])
+                if idx != head:
+                    absorbed.setdefault(head, []).append(idx)
+            for idx in group:
+                _take_over(idx, spans[idx], owners, absorbed)
+            clipped[head] = page_ranges.subtract(intervals, covered)
+            for idx in group:
+                if idx != head:
+                    clipped[idx] = []
+
+    out: List[Dict[str, Any]] = []
+    for idx, job in enumerate(jobs):
+        if idx not in clipped:
+            out.append(job)
+            continue
+        if not clipped[idx]:
+            continue
+        taken = [other for other in absorbed.get(idx, []) if other != idx]
+        if not taken and clipped[idx] == spans[idx]:
+            out.append(job)
+            continue
+        job = dict(job)
+        job["page_range"] = page_ranges.format_ranges(clipped[idx])
+        if taken:
+            job["coalesced_from"] = [jobs[i].get("job_id") for i in [idx] + sorted(set(taken))]
+        out.append(job)
+    return out
+
+
+def _take_over(
+    idx: int,
+    intervals: List[page_ranges.Interval],
+    owners: List[Tuple[List[page_ranges.Interval], int]],
+    absorbed: Dict[int, List[int]],
+) -> None:
+    """Record job `idx` under every earlier chunk that covers some of its pages."""
+    for chunk_intervals, owner in owners:
+        if page_ranges.intersect(intervals, chunk_intervals):
+            absorbed.setdefault(owner, []).append(idx)
+
+
+@tracing.traced()
 def build_records(jobs: List[Dict[str, Any]], service_config: Dict[str, Any]) -> List[Dict[str, Any]]:
     records: List[Dict[str, Any]] = []
     for job in jobs:
@@ -73,6 +193,7 @@ def build_records(jobs: List[Dict[str, Any]], service_config: Dict[str, Any]) ->
                 "input_file": job.get("input_file"),
                 "page_range": job.get("page_range", "all"),
                 "chunked_from": job.get("chunked_from"),
+                "coalesced_from": job.get("coalesced_from"),
                 "service": job.get("service", "default"),
                 "fallback_order": service_config.get("fallback_order", []),
                 "argv": argv,
@@ -83,6 +204,7 @@ def build_records(jobs: List[Dict[str, Any]], service_config: Dict[str, Any]) ->
     return records
 
 
+@tracing.traced("build_commands")
 def main() -> int:
     parser = argparse.ArgumentParser(description="Build deterministic command(s) from normalized jobs")
     parser.add_argument("jobs", type=Path, help="Path to normalized jobs JSON array")
@@ -94,6 +216,11 @@ def main() -> int:
     )
     parser.add_argument("--output", type=Path, help="Where to write command records JSON")
     parser.add_argument("--audit-out", type=Path, help="Write compact audit JSONL")
+    parser.add_argument(
+        "--coalesce",
+        action="store_true",
+        help="Merge jobs on the same file with overlapping/adjacent page ranges",
+    )
     args = parser.parse_args()
 
     jobs = _load_json(args.jobs)
@@ -102,6 +229,9 @@ def main() -> int:
     if not isinstance(jobs, list):
         raise ValueError("Expected jobs JSON array or object")
 
+    if args.coalesce:
+        jobs = coalesce_jobs(jobs)
+
     service_config = _load_json(args.service_config)
     records = build_records(jobs, service_config)
 
@@ -128,4 +258,4 @@ def main() -> int:
 
 
 if __name__ == "__main__":
-    raise SystemExit(main())
+    raise SystemExit(stage_profile.run(main))
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""Stream run artifacts into one downloadable zip/tar archive with size and SHA-256 (T07.3).
+
+Files are copied in fixed-size chunks straight into the archive stream, so memory stays bounded
+whatever the run size. The archive is never re-read: its byte count and SHA-256 come from a
+writer that hashes everything on its way to disk.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import os
+import tarfile
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+import stage_profile
+import tracing
+
+
+CHUNK_BYTES = 1 << 20
+BUNDLE_FORMATS = ("zip", "tar", "tar.gz")
+# Already-compressed payloads gain nothing from deflate; store them as-is.
+STORED_SUFFIXES = {".pdf", ".png", ".jpg", ".jpeg", ".gz", ".zip", ".zst"}
+FAST_LEVEL = 1
+MANIFEST_NAME = "manifest.json"
+
+
+class HashingWriter(io.RawIOBase):
+    """Write-only, non-seekable sink that counts and hashes every byte passed through."""
+
+    def __init__(self, raw: Any) -> None:
+        self._raw = raw
+        self._digest = hashlib.sha256()
+        self.bytes = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        view = memoryview(data)
+        self._raw.write(view)
+        self._digest.update(view)
+        self.bytes += len(view)
+        return len(view)
+
+    def tell(self) -> int:
+        return self.bytes
+
+    def flush(self) -> None:
+        self._raw.flush()
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+
+class _HashingReader(io.RawIOBase):
+    """Source file reader that hashes what tarfile pulls through it."""
+
+    def __init__(self, path: Path) -> None:
+        self._fh = path.open("rb")
+        self._digest = hashlib.sha256()
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._fh.read(CHUNK_BYTES if size is None or size < 0 else size)
+        self._digest.update(data)
+        return data
+
+    def close(self) -> None:
+        self._fh.close()
+        super().close()
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+
+def _stored(path: Path) -> bool:
+    return path.suffix.lower() in STORED_SUFFIXES
+
+
+def _plan(exports: List[Dict[str, Any]]) -> Tuple[List[Tuple[str, Path, str]], List[Dict[str, str]]]:
+    """(artifact, source file, archive name) per file; directories are walked, names kept unique."""
+    planned: List[Tuple[str, Path, str]] = []
+    missing: List[Dict[str, str]] = []
+    used = set()
+    for item in exports:
+        source = Path(item["path"])
+        if not source.exists():
+            missing.append({"artifact": item["artifact"], "source": item["path"]})
+            continue
+        if source.is_dir():
+            files: Iterator[Tuple[Path, Path]] = (
+                (p, Path(source.name) / p.relative_to(source)) for p in sorted(source.rglob("*")) if p.is_file()
+            )
+        else:
+            files = iter([(source, Path(source.name))])
+        for path, rel in files:
+            if rel in used:
+                rel = Path(item["artifact"]) / rel
+            used.add(rel)
+            planned.append((item["artifact"], path, rel.as_posix()))
+    return planned, missing
+
+
+def _copy(src: Path, dst: Any) -> str:
+    digest = hashlib.sha256()
+    with src.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(CHUNK_BYTES), b""):
+            digest.update(chunk)
+            dst.write(chunk)
+    return digest.hexdigest()
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _zip_entry(archive: zipfile.ZipFile, src: Path, name: str, size: int) -> str:
+    if not _stored(src):
+        # ZipFile.write is the public way to set a per-entry level; deflated entries are logs and
+        # other small text files, so hashing them in a second read is cheap.
+        archive.write(src, name, compress_type=zipfile.ZIP_DEFLATED, compresslevel=FAST_LEVEL)
+        return _sha256(src)
+    info = zipfile.ZipInfo.from_file(src, name)
+    info.file_size = size  # lets zipfile pick zip64 up front; the stream is not seekable
+    info.compress_type = zipfile.ZIP_STORED
+    with archive.open(info, "w") as dst:
+        return _copy(src, dst)
+
+
+def _zip_bytes(archive: zipfile.ZipFile, name: str, data: bytes) -> None:
+    info = zipfile.ZipInfo(name, time.localtime()[:6])
+    archive.writestr(info, data, compress_type=zipfile.ZIP_DEFLATED, compresslevel=FAST_LEVEL)
+
+
+def _tar_bytes(archive: tarfile.TarFile, name: str, data: bytes) -> None:
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = int(time.time())
+    archive.addfile(info, io.BytesIO(data))
+
+
+def bundle_path(bundle_dir: Path, run_id: str, fmt: str) -> Path:
+    return bundle_dir / f"{run_id}.{'tgz' if fmt == 'tar.gz' else fmt}"
+
+
+@tracing.traced()
+def build_bundle(run_id: str, exports: List[Dict[str, Any]], bundle_dir: Path, fmt: str = "zip") -> Dict[str, Any]:
+    """Write `bundle_dir/<run_id>.<ext>` from export entries (`artifact`, `path`) and describe it.
+
+    zip stores PDFs and other compressed files and deflates the rest at level 1; `tar` is
+    uncompressed and `tar.gz` compresses the whole stream at level 1 (tar has no per-entry
+    compression). A `manifest.json` with per-file SHA-256 is appended as the last entry.
+    """
+    if fmt not in BUNDLE_FORMATS:
+        raise ValueError(f"unsupported bundle format: {fmt}")
+    started = time.perf_counter()
+    planned, missing = _plan(exports)
+    target = bundle_path(bundle_dir, run_id, fmt)
+    bundle_dir.mkdir(parents=True, exist_ok=True)
+    entries: List[Dict[str, Any]] = []
+
+    with tempfile.NamedTemporaryFile("wb", delete=False, dir=bundle_dir, prefix=f".{run_id}.") as tmp:
+        sink = HashingWriter(tmp)
+        try:
+            if fmt == "zip":
+                with zipfile.ZipFile(sink, "w", allowZip64=True) as archive:
+                    for artifact, src, name in planned:
+                        size = src.stat().st_size
+                        sha = _zip_entry(archive, src, name, size)
+                        entries.append(_entry(artifact, src, name, size, sha, "stored" if _stored(src) else "deflate"))
+                    manifest = _manifest(run_id, entries, missing)
+                    _zip_bytes(archive, MANIFEST_NAME, manifest)
+            else:
+                gz = gzip.GzipFile(fileobj=sink, mode="wb", compresslevel=FAST_LEVEL, mtime=0) if fmt == "tar.gz" else None
+                with tarfile.open(fileobj=gz if gz is not None else sink, mode="w|", format=tarfile.PAX_FORMAT) as archive:
+                    for artifact, src, name in planned:
+                        info = archive.gettarinfo(str(src), arcname=name)
+                        reader = _HashingReader(src)
+                        try:
+                            archive.addfile(info, reader)
+                        finally:
+                            reader.close()
+                        method = "gzip" if gz is not None else "stored"
+                        entries.append(_entry(artifact, src, name, info.size, reader.hexdigest(), method))
+                    _tar_bytes(archive, MANIFEST_NAME, _manifest(run_id, entries, missing))
+                if gz is not None:
+                    gz.close()
+            sink.flush()
+            os.fsync(tmp.fileno())
+        except BaseException:
+            tmp.close()
+            Path(tmp.name).unlink(missing_ok=True)
+            raise
+    os.chmod(tmp.name, 0o644)
+    Path(tmp.name).replace(target)
+
+    return {
+        "path": str(target),
+        "format": fmt,
+        "bytes": sink.bytes,
+        "sha256": sink.hexdigest(),
+        "file_count": len(entries),
+        "source_bytes": sum(entry["bytes"] for entry in entries),
+        "entries": entries,
+        "missing": missing,
+        "elapsed_s": round(time.perf_counter() - started, 3),
+    }
+
+
+def _entry(artifact: str, src: Path, name: str, size: int, sha: str, method: str) -> Dict[str, Any]:
+    return {"artifact": artifact, "source": str(src), "path": name, "bytes": size, "sha256": sha, "method": method}
+
+
+def _manifest(run_id: str, entries: List[Dict[str, Any]], missing: List[Dict[str, str]]) -> bytes:
+    payload = {"run_id": run_id, "file_count": len(entries), "files": entries, "missing": missing}
+    return (json.dumps(payload, ensure_ascii=False, indent=2) + "\n").encode("utf-8")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Stream files into one run archive")
+    parser.add_argument("paths", nargs="+", help="Files or directories to bundle")
+    parser.add_argument("--run-id", required=True)
+    parser.add_argument("--bundle-dir", type=Path, default=Path("bundles"))
+    parser.add_argument("--format", choices=BUNDLE_FORMATS, default="zip")
+    args = parser.parse_args()
+
+    exports = [{"artifact": Path(p).name, "path": p} for p in args.paths]
+    bundle = build_bundle(args.run_id, exports, args.bundle_dir, args.format)
+    bundle.pop("entries")
+    bundle["status"] = "PASS" if not bundle["missing"] else "FAIL"
+    print(json.dumps(bundle))
+    return 0 if not bundle["missing"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(stage_profile.run(main))
@@ -5,8 +5,20 @@ from __future__ import annotations
 
 import argparse
 import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, List
+
+import page_ranges
+from pdf_structure import inspect_pdf
+import stage_profile
+import tracing
+
+
+OUTPUT_NAME_RE = re.compile(r"^(?P<stem>.+)-[a-z]{2}_[a-z]{2}-(?P<ts>\d{8}T\d{6}Z)-bilingual\.pdf$")
 
 
 def check_record(rec: Dict[str, Any]) -> Dict[str, Any]:
@@ -17,7 +29,10 @@ def check_record(rec: Dict[str, Any]) -> Dict[str, Any]:
     overflow_mode = rec.get("overflow_mode", "none")
     overflow_reported = bool(rec.get("overflow_reported", False))
 
-    if not isinstance(src, int) or src <= 0:
+    if rec.get("invalid_page_range"):
+        # The covered source pages are unknown, so the page counts cannot be compared.
+        reasons.append("invalid_page_range")
+    elif not isinstance(src, int) or src <= 0:
         reasons.append("invalid_source_pages")
     if not isinstance(out, int) or out <= 0:
         reasons.append("invalid_output_pages")
@@ -52,25 +67,155 @@ def summarize(results: List[Dict[str, Any]]) -> Dict[str, Any]:
     }
 
 
+def _output_dir_from_argv(argv: List[str]) -> str | None:
+    for flag, value in zip(argv, argv[1:]):
+        if flag == "--output":
+            return value
+    return None
+
+
+def _index_outputs(directory: Path) -> Dict[str, Path]:
+    """Map input stem -> newest policy-named bilingual output in one directory listing."""
+    newest: Dict[str, tuple[str, Path]] = {}
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return {}
+    for entry in entries:
+        match = OUTPUT_NAME_RE.match(entry.name)
+        if match and entry.is_file():
+            stem, ts = match.group("stem"), match.group("ts")
+            if stem not in newest or ts > newest[stem][0]:
+                newest[stem] = (ts, Path(entry.path))
+    return {stem: path for stem, (_, path) in newest.items()}
+
+
+def _page_counts(paths: Iterable[str], max_workers: int) -> Dict[str, int | None]:
+    unique = sorted(set(paths))
+    if max_workers <= 1 or len(unique) <= 1:
+        infos = [inspect_pdf(Path(p)) for p in unique]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            infos = list(pool.map(inspect_pdf, map(Path, unique), chunksize=max(1, len(unique) // (max_workers * 8))))
+    return {path: info.get("page_count") for path, info in zip(unique, infos)}
+
+
+@tracing.traced()
+def records_from_results(
+    results: List[Dict[str, Any]],
+    jobs: List[Dict[str, Any]],
+    output_root: Path | None,
+    max_workers: int,
+) -> tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Build check_record inputs from execution results by locating and inspecting the PDFs.
+
+    Returns (records, skipped). The output PDF is the result's `output_file`, else the newest
+    `<stem>-xx_yy-<ts>-bilingual.pdf` in the job's `--output` directory (or `output_root`). The
+    expected source page count honours the job's `page_range`.
+    """
+    job_by_id = {job.get("job_id"): job for job in jobs}
+    indexes: Dict[Path, Dict[str, Path]] = {}
+    located: List[tuple[Dict[str, Any], Dict[str, Any], str, str]] = []
+    skipped: List[Dict[str, Any]] = []
+
+    for res in results:
+        if res.get("status") != "success":
+            skipped.append({"job_id": res.get("job_id"), "reason": "execution_not_successful"})
+            continue
+        job = job_by_id.get(res.get("job_id"), {})
+        source = str(res.get("input_file") or job.get("input_file") or "")
+        output = res.get("output_file") or job.get("output_file")
+        if not output:
+            out_dir = _output_dir_from_argv(job.get("argv", [])) or job.get("output_dir")
+            directory = Path(out_dir) if out_dir else output_root
+            if directory is not None:
+                if directory not in indexes:
+                    indexes[directory] = _index_outputs(directory)
+                found = indexes[directory].get(Path(source).stem)
+                output = str(found) if found else None
+        if not output:
+            skipped.append({"job_id": res.get("job_id"), "reason": "output_not_found"})
+            continue
+        located.append((res, job, source, str(output)))
+
+    counts = _page_counts([p for _, _, src, out in located for p in (src, out)], max_workers)
+
+    records: List[Dict[str, Any]] = []
+    for res, job, source, output in located:
+        total = counts.get(source)
+        src_pages = total
+        spec = res.get("page_range") or job.get("page_range")
+        invalid_range = False
+        if spec:
+            try:
+                intervals = page_ranges.parse(spec)
+            except ValueError:
+                src_pages, invalid_range = None, True
+            else:
+                if total and page_ranges.format_ranges(intervals) != "all":
+                    src_pages = page_ranges.page_count(page_ranges.clamp(intervals, total))
+        record = {
+            "run_id": res.get("run_id"),
+            "job_id": res.get("job_id"),
+            "file_id": res.get("file_id"),
+            "source_file": source,
+            "output_file": output,
+            "page_range": spec or "all",
+            "source_pages": src_pages,
+            "output_pages": counts.get(output),
+            "overflow_mode": res.get("overflow_mode", job.get("overflow_mode", "none")),
+            "overflow_reported": res.get("overflow_reported", job.get("overflow_reported", False)),
+        }
+        if invalid_range:
+            record["invalid_page_range"] = True
+        records.append(record)
+    return records, skipped
+
+
+def _load_list(path: Path) -> List[Dict[str, Any]]:
+    data = json.loads(path.read_text())
+    return [data] if isinstance(data, dict) else data
+
+
 def main() -> int:
     parser = argparse.ArgumentParser(description="Check page coherence and overflow handling")
-    parser.add_argument("records", type=Path, help="JSON array of page-count records")
+    parser.add_argument("records", type=Path, nargs="?", help="JSON array of page-count records")
+    parser.add_argument("--from-results", type=Path, help="Execution results JSON; page counts are read from the PDFs")
+    parser.add_argument("--jobs", type=Path, help="Command records JSON (argv/--output, overflow policy) for --from-results")
+    parser.add_argument("--output-root", type=Path, help="Directory searched for outputs when a job has no --output")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
     parser.add_argument("--output", type=Path, default=Path("logs/page-coherence.json"))
     args = parser.parse_args()
 
-    records = json.loads(args.records.read_text())
-    if isinstance(records, dict):
-        records = [records]
+    started = time.perf_counter()
+    skipped: List[Dict[str, Any]] = []
+    if args.from_results:
+        jobs = _load_list(args.jobs) if args.jobs else []
+        records, skipped = records_from_results(_load_list(args.from_results), jobs, args.output_root, args.max_workers)
+    elif args.records:
+        records = _load_list(args.records)
+    else:
+        parser.error("records or --from-results is required")
 
     results = [check_record(r) for r in records]
     summary = summarize(results)
-    payload = {"summary": summary, "results": results}
+    if args.from_results:
+        for res, rec in zip(results, records):
+            res["source_file"], res["output_file"] = rec["source_file"], rec["output_file"]
+        summary["skipped"] = len(skipped)
+        summary["outputs_not_found"] = sum(1 for s in skipped if s["reason"] == "output_not_found")
+        if summary["outputs_not_found"]:
+            summary["status"] = "FAIL"
+        summary["elapsed_s"] = round(time.perf_counter() - started, 3)
+    payload: Dict[str, Any] = {"summary": summary, "results": results}
+    if skipped:
+        payload["skipped"] = skipped
 
     args.output.parent.mkdir(parents=True, exist_ok=True)
     args.output.write_text(json.dumps(payload, indent=2) + "\n")
     print(json.dumps({"status": summary["status"], "failed": summary["failed"], "output": str(args.output)}))
-    return 0 if summary["failed"] == 0 else 1
+    return 0 if summary["status"] == "PASS" else 1
 
 
 if __name__ == "__main__":
-    raise SystemExit(main())
+    raise SystemExit(stage_profile.run(main))
@@ -1,12 +1,12 @@
 #!/usr/bin/env python3
-"""Emit structured trace logs for workflow branch boundaries."""
+"""Emit structured trace logs for workflow branch boundaries (CLI wrapper over `tracing.event`)."""
 
 from __future__ import annotations
 
 import argparse
-import json
-from datetime import datetime, timezone
-from pathlib import Path
+
+import stage_profile
+import tracing
 
 
 def main() -> int:
@@ -20,32 +20,29 @@ def main() -> int:
     parser.add_argument("--page-range")
     parser.add_argument("--details")
     parser.add_argument("--log-file", default="logs/trace/trace.jsonl")
+    parser.add_argument("--max-bytes", type=int, help="Rotate the log at this size (default PDFOR_TRACE_MAX_BYTES or 256 MiB)")
+    parser.add_argument("--rotate-s", type=float, help="Rotate the log when its segment is older than this")
+    parser.add_argument("--compress", action="store_true", default=None, help="gzip rotated segments")
     args = parser.parse_args()
 
-    event = {
-        "ts": datetime.now(timezone.utc).isoformat(),
-        "run_id": args.run_id,
-        "trace_id": args.trace_id,
-        "stage": args.stage,
-        "status": args.status,
-    }
-    if args.job_id:
-        event["job_id"] = args.job_id
-    if args.file_id:
-        event["file_id"] = args.file_id
-    if args.page_range:
-        event["page_range"] = args.page_range
-    if args.details:
-        event["details"] = args.details
-
-    log_path = Path(args.log_file)
-    log_path.parent.mkdir(parents=True, exist_ok=True)
-    with log_path.open("a", encoding="utf-8") as fh:
-        fh.write(json.dumps(event, ensure_ascii=False) + "\n")
+    tracing.get_writer(args.log_file, max_bytes=args.max_bytes, rotate_s=args.rotate_s, compress=args.compress)
+
+    tracing.event(
+        args.stage,
+        args.status,
+        run_id=args.run_id,
+        trace_id=args.trace_id,
+        log_file=args.log_file,
+        job_id=args.job_id,
+        file_id=args.file_id,
+        page_range=args.page_range,
+        details=args.details,
+    )
+    tracing.flush()
 
     print("TRACE_LOGGED")
     return 0
 
 
 if __name__ == "__main__":
-    raise SystemExit(main())
+    raise SystemExit(stage_profile.run(main))
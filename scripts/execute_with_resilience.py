@@ -12,6 +12,10 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import Any, Dict, List, Tuple
 
+from executor_metrics import ExecutorMetrics, MetricsExporter
+import stage_profile
+import tracing
+
 
 RETRYABLE_EXIT_CODES = {75}
 RETRYABLE_CLASSES = {"api_rate_limit", "transient_network"}
@@ -54,6 +58,34 @@ def _execute_one_record(
     max_attempts: int,
     base_delay_s: float,
     dry_run: bool,
+    metrics: ExecutorMetrics | None = None,
+) -> Dict[str, Any]:
+    if metrics is not None:
+        metrics.record_started()
+    with tracing.span(
+        "execute_record",
+        run_id=rec.get("run_id"),
+        job_id=rec.get("job_id"),
+        file_id=rec.get("file_id"),
+        page_range=rec.get("page_range", "all"),
+    ) as sp:
+        result = _execute_with_fallback(rec, service_config, max_attempts, base_delay_s, dry_run, metrics)
+        if metrics is not None:
+            metrics.record_finished(result["status"])
+        sp.set(final_service=result.get("final_service"), attempts=len(result["attempts"]))
+        if result["status"] != "success":
+            sp.set_status("failed")
+            sp.set(details=result.get("failure_reason"))
+        return result
+
+
+def _execute_with_fallback(
+    rec: Dict[str, Any],
+    service_config: Dict[str, Any],
+    max_attempts: int,
+    base_delay_s: float,
+    dry_run: bool,
+    metrics: ExecutorMetrics | None = None,
 ) -> Dict[str, Any]:
     flags = service_config.get("service_flags", {})
     fallback_order = service_config.get("fallback_order", [])
@@ -72,18 +104,32 @@ def _execute_one_record(
     base_service = rec.get("service", "default")
     chain = [base_service] + [s for s in fallback_order if s != base_service]
 
+    previous_service = None
     for service in chain:
+        if metrics is not None and previous_service is not None:
+            metrics.fallback(previous_service, service)
+        previous_service = service
         service_flag = flags.get(service)
         old_flag = flags.get(base_service)
         argv = _replace_service_flag(rec["argv"], old_flag, service_flag)
         command = _command_from_argv(argv)
 
         for attempt in range(1, max_attempts + 1):
-            if dry_run:
-                rc, stderr = 0, ""
-            else:
-                proc = _run(argv)
-                rc, stderr = proc.returncode, proc.stderr
+            with tracing.span("attempt", service=service, attempt=attempt) as sp:
+                if metrics is not None:
+                    metrics.attempt_started(service)
+                started = time.perf_counter()
+                if dry_run:
+                    rc, stderr = 0, ""
+                else:
+                    proc = _run(argv)
+                    rc, stderr = proc.returncode, proc.stderr
+                err_class = classify_error(rc, stderr) if rc != 0 else None
+                if metrics is not None:
+                    metrics.attempt_finished(service, time.perf_counter() - started, err_class)
+                if err_class is not None:
+                    sp.set_status("failed")
+                    sp.set(returncode=rc, error_class=err_class)
 
             attempt_row = {
                 "service": service,
@@ -99,13 +145,15 @@ def _execute_one_record(
                 result["final_service"] = service
                 return result
 
-            err_class = classify_error(rc, stderr)
             attempt_row["error_class"] = err_class
             attempt_row["stderr"] = stderr[-500:]
             result["attempts"].append(attempt_row)
 
             if err_class in RETRYABLE_CLASSES and attempt < max_attempts:
-                time.sleep(base_delay_s * (2 ** (attempt - 1)))
+                if metrics is not None:
+                    metrics.retry(service, err_class)
+                with tracing.span("backoff", service=service, attempt=attempt, error_class=err_class):
+                    time.sleep(base_delay_s * (2 ** (attempt - 1)))
                 continue
             break
 
@@ -115,6 +163,7 @@ def _execute_one_record(
     return result
 
 
+@tracing.traced()
 def execute_records(
     records: List[Dict[str, Any]],
     service_config: Dict[str, Any],
@@ -122,18 +171,22 @@ def execute_records(
     base_delay_s: float,
     dry_run: bool,
     max_workers: int,
+    metrics: ExecutorMetrics | None = None,
 ) -> List[Dict[str, Any]]:
+    if metrics is not None:
+        metrics.enqueue(len(records))
     if max_workers <= 1:
         return [
-            _execute_one_record(rec, service_config, max_attempts, base_delay_s, dry_run)
+            _execute_one_record(rec, service_config, max_attempts, base_delay_s, dry_run, metrics)
             for rec in records
         ]
 
     indexed: List[Tuple[int, Dict[str, Any]]] = list(enumerate(records))
     by_idx: Dict[int, Dict[str, Any]] = {}
+    run_one = tracing.propagate(_execute_one_record)
     with ThreadPoolExecutor(max_workers=max_workers) as pool:
         futures = {
-            pool.submit(_execute_one_record, rec, service_config, max_attempts, base_delay_s, dry_run): idx
+            pool.submit(run_one, rec, service_config, max_attempts, base_delay_s, dry_run, metrics): idx
             for idx, rec in indexed
         }
         for fut in as_completed(futures):
@@ -181,6 +234,7 @@ def atomic_write_json(path: Path, payload: Any) -> None:
     tmp_path.replace(path)
 
 
+@tracing.traced("execute_with_resilience")
 def main() -> int:
     parser = argparse.ArgumentParser(description="Execute command records with resilience policies")
     parser.add_argument("records", type=Path, help="Command records JSON from build_commands.py")
@@ -192,6 +246,9 @@ def main() -> int:
     parser.add_argument("--base-delay-s", type=float, default=0.1)
     parser.add_argument("--max-workers", type=int, default=2)
     parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics on 127.0.0.1:<port>/metrics")
+    parser.add_argument("--metrics-textfile", type=Path, help="Rewrite Prometheus metrics to this file periodically")
+    parser.add_argument("--metrics-interval-s", type=float, default=5.0)
     args = parser.parse_args()
 
     records = json.loads(args.records.read_text())
@@ -199,14 +256,24 @@ def main() -> int:
         records = [records]
 
     service_config = json.loads(args.service_config.read_text())
-    results = execute_records(
-        records,
-        service_config,
-        max_attempts=max(1, args.max_attempts),
-        base_delay_s=max(0.0, args.base_delay_s),
-        dry_run=args.dry_run,
-        max_workers=max(1, args.max_workers),
-    )
+    metrics = None
+    exporter = None
+    if args.metrics_port is not None or args.metrics_textfile is not None:
+        metrics = ExecutorMetrics(run_id=records[0].get("run_id") if records else None)
+        exporter = MetricsExporter(metrics, args.metrics_port, args.metrics_textfile, args.metrics_interval_s).start()
+    try:
+        results = execute_records(
+            records,
+            service_config,
+            max_attempts=max(1, args.max_attempts),
+            base_delay_s=max(0.0, args.base_delay_s),
+            dry_run=args.dry_run,
+            max_workers=max(1, args.max_workers),
+            metrics=metrics,
+        )
+    finally:
+        if exporter is not None:
+            exporter.stop()
 
     segments = build_problem_segments(results)
     summary = build_summary(results)
@@ -230,4 +297,4 @@ def main() -> int:
 
 
 if __name__ == "__main__":
-    raise SystemExit(main())
+    raise SystemExit(stage_profile.run(main))
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""Live executor metrics in Prometheus text format (T04.6).
+
+`ExecutorMetrics` is updated by `execute_with_resilience.py` while records run and exposed either on
+a local HTTP endpoint (`/metrics`) or as a textfile rewritten atomically every few seconds (for the
+node_exporter textfile collector or a plain `cat`). Updates are a dict lookup and an integer add
+under one lock; rendering happens only on scrape/rewrite.
+"""
+
+from __future__ import annotations
+
+import bisect
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+
+ATTEMPT_BUCKETS_S = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+PREFIX = "pdfor_executor"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(**labels: Any) -> Labels:
+    return tuple((key, str(value)) for key, value in labels.items())
+
+
+def _fmt_labels(labels: Labels, extra: Tuple[str, str] | None = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (k + '="' + v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"' for k, v in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+class ExecutorMetrics:
+    """Counters, gauges and attempt-latency histograms for one executor process."""
+
+    def __init__(self, run_id: str | None = None) -> None:
+        self.run_id = run_id
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self.queue_depth = 0
+        self.in_flight: Dict[str, int] = {}
+        self.records: Dict[Labels, int] = {}
+        self.attempts: Dict[Labels, int] = {}
+        self.retries: Dict[Labels, int] = {}
+        self.fallbacks: Dict[Labels, int] = {}
+        self.errors: Dict[Labels, int] = {}
+        # (service, outcome) -> [per-bucket counts..., +Inf count], sum seconds
+        self.histograms: Dict[Labels, Tuple[List[int], List[float]]] = {}
+
+    # -- updates (hot path) -------------------------------------------------
+
+    def enqueue(self, count: int) -> None:
+        with self._lock:
+            self.queue_depth += count
+
+    def record_started(self) -> None:
+        with self._lock:
+            self.queue_depth -= 1
+
+    def record_finished(self, status: str) -> None:
+        key = _labels(status=status)
+        with self._lock:
+            self.records[key] = self.records.get(key, 0) + 1
+
+    def attempt_started(self, service: str) -> None:
+        with self._lock:
+            self.in_flight[service] = self.in_flight.get(service, 0) + 1
+
+    def attempt_finished(self, service: str, duration_s: float, error_class: str | None) -> None:
+        outcome = "success" if error_class is None else "failure"
+        key = _labels(service=service, outcome=outcome)
+        index = bisect.bisect_left(ATTEMPT_BUCKETS_S, duration_s)
+        with self._lock:
+            self.in_flight[service] -= 1
+            self.attempts[key] = self.attempts.get(key, 0) + 1
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = ([0] * (len(ATTEMPT_BUCKETS_S) + 1), [0.0])
+            hist[0][index] += 1
+            hist[1][0] += duration_s
+            if error_class is not None:
+                err_key = _labels(service=service, error_class=error_class)
+                self.errors[err_key] = self.errors.get(err_key, 0) + 1
+
+    def retry(self, service: str, error_class: str) -> None:
+        key = _labels(service=service, error_class=error_class)
+        with self._lock:
+            self.retries[key] = self.retries.get(key, 0) + 1
+
+    def fallback(self, from_service: str, to_service: str) -> None:
+        key = _labels(**{"from": from_service, "to": to_service})
+        with self._lock:
+            self.fallbacks[key] = self.fallbacks.get(key, 0) + 1
+
+    # -- exposition ---------------------------------------------------------
+
+    def render(self) -> str:
+        with self._lock:
+            queue_depth = self.queue_depth
+            in_flight = dict(self.in_flight)
+            counters = {
+                "records_total": dict(self.records),
+                "attempts_total": dict(self.attempts),
+                "retries_total": dict(self.retries),
+                "fallbacks_total": dict(self.fallbacks),
+                "errors_total": dict(self.errors),
+            }
+            histograms = {key: (list(counts), total[0]) for key, (counts, total) in self.histograms.items()}
+
+        run = _labels(run_id=self.run_id) if self.run_id else ()
+        helps = {
+            "records_total": "Records finished, by final status.",
+            "attempts_total": "Command attempts, by service and outcome.",
+            "retries_total": "Retries scheduled after a retryable error, by service and error class.",
+            "fallbacks_total": "Switches to the next service in fallback_order.",
+            "errors_total": "Failed attempts by classify_error() class.",
+        }
+        lines = [
+            f"# HELP {PREFIX}_queue_depth Records not yet started.",
+            f"# TYPE {PREFIX}_queue_depth gauge",
+            f"{PREFIX}_queue_depth{_fmt_labels(run)} {queue_depth}",
+            f"# HELP {PREFIX}_in_flight Attempts currently running, by service.",
+            f"# TYPE {PREFIX}_in_flight gauge",
+        ]
+        for service, value in sorted(in_flight.items()):
+            lines.append(f"{PREFIX}_in_flight{_fmt_labels(run + _labels(service=service))} {value}")
+        for name, series in counters.items():
+            lines.append(f"# HELP {PREFIX}_{name} {helps[name]}")
+            lines.append(f"# TYPE {PREFIX}_{name} counter")
+            for labels, value in sorted(series.items()):
+                lines.append(f"{PREFIX}_{name}{_fmt_labels(run + labels)} {value}")
+        lines.append(f"# HELP {PREFIX}_attempt_duration_seconds Wall time of one command attempt.")
+        lines.append(f"# TYPE {PREFIX}_attempt_duration_seconds histogram")
+        for labels, (counts, total) in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(ATTEMPT_BUCKETS_S + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{PREFIX}_attempt_duration_seconds_bucket{_fmt_labels(run + labels, ('le', le))} {cumulative}")
+            lines.append(f"{PREFIX}_attempt_duration_seconds_sum{_fmt_labels(run + labels)} {total:.6f}")
+            lines.append(f"{PREFIX}_attempt_duration_seconds_count{_fmt_labels(run + labels)} {cumulative}")
+        lines.append(f"# HELP {PREFIX}_start_time_seconds Executor start (unix time).")
+        lines.append(f"# TYPE {PREFIX}_start_time_seconds gauge")
+        lines.append(f"{PREFIX}_start_time_seconds{_fmt_labels(run)} {self.started:.3f}")
+        return "\n".join(lines) + "\n"
+
+
+def write_textfile(metrics: ExecutorMetrics, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", delete=False, dir=path.parent, suffix=".tmp") as tmp:
+        tmp.write(metrics.render())
+    os.chmod(tmp.name, 0o644)
+    Path(tmp.name).replace(path)
+
+
+class MetricsExporter:
+    """Serve `/metrics` on `port` and/or rewrite `textfile` every `interval_s` until `stop()`."""
+
+    def __init__(
+        self,
+        metrics: ExecutorMetrics,
+        port: int | None = None,
+        textfile: Path | None = None,
+        interval_s: float = 5.0,
+        host: str = "127.0.0.1",
+    ) -> None:
+        self.metrics = metrics
+        self.textfile = textfile
+        self.interval_s = interval_s
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self.server: ThreadingHTTPServer | None = None
+        if port is not None:
+            self.server = ThreadingHTTPServer((host, port), _handler(metrics))
+            self.server.daemon_threads = True
+
+    @property
+    def port(self) -> int | None:
+        return self.server.server_port if self.server else None
+
+    def start(self) -> "MetricsExporter":
+        if self.server is not None:
+            self._spawn(self.server.serve_forever, "metrics-http")
+        if self.textfile is not None:
+            write_textfile(self.metrics, self.textfile)
+            self._spawn(self._rewrite, "metrics-textfile")
+        return self
+
+    def _spawn(self, target: Any, name: str) -> None:
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _rewrite(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            write_textfile(self.metrics, self.textfile)  # type: ignore[arg-type]
+
+    def stop(self) -> None:
+        """Final textfile write so the last scrape sees completed totals."""
+        self._stop.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        if self.textfile is not None:
+            write_textfile(self.metrics, self.textfile)
+
+    def __enter__(self) -> "MetricsExporter":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+
+def _handler(metrics: ExecutorMetrics) -> type:
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 - stdlib signature
+            return
+
+        def do_GET(self) -> None:
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""Materialize `handoff/<run_id>` with reflinks/hardlinks and a SHA-256 manifest (T07.3)."""
+
+from __future__ import annotations
+
+import argparse
+import ctypes
+import errno
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+import stage_profile
+import tracing
+
+
+CHUNK_BYTES = 8 << 20
+FICLONE = 0x40049409
+AT_FDCWD = -100
+RENAME_EXCHANGE = 2
+LINK_MODES = ("auto", "reflink", "hardlink", "copy")
+MANIFEST_NAME = "manifest.json"
+
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _reflink(src: Path, dst: Path) -> bool:
+    try:
+        with src.open("rb") as fin, dst.open("wb") as fout:
+            fcntl.ioctl(fout.fileno(), FICLONE, fin.fileno())
+        return True
+    except OSError:
+        dst.unlink(missing_ok=True)
+        return False
+
+
+def _copy_hashing(src: Path, dst: Path) -> str:
+    """Copy and hash in a single read pass."""
+    digest = hashlib.sha256()
+    with src.open("rb") as fin, dst.open("wb") as fout:
+        for chunk in iter(lambda: fin.read(CHUNK_BYTES), b""):
+            digest.update(chunk)
+            fout.write(chunk)
+    shutil.copystat(src, dst)
+    return digest.hexdigest()
+
+
+def place_file(src: Path, dst: Path, mode: str = "auto", sha256: str | None = None) -> Tuple[str, str]:
+    """Put `src` at `dst` as cheaply as the filesystem allows; returns (method, sha256).
+
+    Reflinks and hardlinks cost no data copy, so the file is read once for hashing only, or not at
+    all when the caller already knows its `sha256`. The copy fallback hashes while copying.
+    """
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    if mode in ("auto", "reflink") and _reflink(src, dst):
+        return "reflink", sha256 or hash_file(dst)
+    if mode in ("auto", "hardlink"):
+        try:
+            os.link(src, dst)
+            return "hardlink", sha256 or hash_file(dst)
+        except OSError:
+            pass
+    return "copy", _copy_hashing(src, dst)
+
+
+def _expand(artifact: str, source: Path) -> Iterator[Tuple[str, Path, Path]]:
+    """Yield (artifact, source file, path relative to the handoff root); directories are walked."""
+    if source.is_dir():
+        for path in sorted(p for p in source.rglob("*") if p.is_file()):
+            yield artifact, path, Path(source.name) / path.relative_to(source)
+    else:
+        yield artifact, source, Path(source.name)
+
+
+def _swap_in(staging: Path, target: Path) -> None:
+    """Replace `target` with `staging`; uses renameat2(RENAME_EXCHANGE) so readers never see a gap."""
+    if not target.exists():
+        staging.replace(target)
+        return
+    libc = ctypes.CDLL(None, use_errno=True)
+    renameat2 = getattr(libc, "renameat2", None)
+    if renameat2 is not None and renameat2(
+        AT_FDCWD, os.fsencode(staging), AT_FDCWD, os.fsencode(target), RENAME_EXCHANGE
+    ) == 0:
+        shutil.rmtree(staging)
+        return
+    if renameat2 is not None and ctypes.get_errno() not in (errno.EINVAL, errno.ENOSYS, errno.EXDEV):
+        raise OSError(ctypes.get_errno(), "renameat2 exchange failed", str(target))
+    retired = target.with_name(f".{target.name}.old-{os.getpid()}")
+    target.replace(retired)
+    staging.replace(target)
+    shutil.rmtree(retired)
+
+
+@tracing.traced()
+def build_handoff(
+    run_id: str,
+    exports: List[Dict[str, Any]],
+    handoff_root: Path,
+    mode: str = "auto",
+    max_workers: int = 4,
+    known_hashes: Dict[str, str] | None = None,
+) -> Dict[str, Any]:
+    """Create `handoff_root/run_id` from export entries (`artifact`, `path`) and return the manifest.
+
+    `known_hashes` (source path -> sha256, e.g. from the publication hash cache) skips re-reading
+    linked files.
+    """
+    known_hashes = known_hashes or {}
+    started = time.perf_counter()
+    target = handoff_root / run_id
+    handoff_root.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f".{run_id}.", dir=handoff_root))
+
+    planned: List[Tuple[str, Path, Path]] = []
+    missing: List[Dict[str, str]] = []
+    used = set()
+    for item in exports:
+        source = Path(item["path"])
+        if not source.exists():
+            missing.append({"artifact": item["artifact"], "source": item["path"]})
+            continue
+        for artifact, src, rel in _expand(item["artifact"], source):
+            if rel in used:
+                rel = Path(artifact) / rel
+            used.add(rel)
+            planned.append((artifact, src, rel))
+
+    def place(entry: Tuple[str, Path, Path]) -> Dict[str, Any]:
+        artifact, src, rel = entry
+        method, sha = place_file(src, staging / rel, mode, known_hashes.get(str(src)))
+        return {
+            "artifact": artifact,
+            "source": str(src),
+            "path": rel.as_posix(),
+            "bytes": (staging / rel).stat().st_size,
+            "sha256": sha,
+            "method": method,
+        }
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            files = list(pool.map(place, planned))
+        methods: Dict[str, int] = {}
+        for entry in files:
+            methods[entry["method"]] = methods.get(entry["method"], 0) + 1
+        manifest = {
+            "run_id": run_id,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "file_count": len(files),
+            "total_bytes": sum(entry["bytes"] for entry in files),
+            "methods": methods,
+            "files": files,
+            "missing": missing,
+        }
+        (staging / MANIFEST_NAME).write_text(json.dumps(manifest, ensure_ascii=False, indent=2) + "\n")
+        staging.chmod(0o755)
+        _swap_in(staging, target)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    manifest["directory"] = str(target)
+    manifest["manifest_path"] = str(target / MANIFEST_NAME)
+    manifest["elapsed_s"] = round(time.perf_counter() - started, 3)
+    return manifest
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Build a handoff directory with a checksum manifest")
+    parser.add_argument("paths", nargs="+", help="Files or directories to hand off")
+    parser.add_argument("--run-id", required=True)
+    parser.add_argument("--handoff-dir", type=Path, default=Path("handoff"))
+    parser.add_argument("--link-mode", choices=LINK_MODES, default="auto")
+    parser.add_argument("--max-workers", type=int, default=4)
+    args = parser.parse_args()
+
+    exports = [{"artifact": Path(p).name, "path": p} for p in args.paths]
+    manifest = build_handoff(args.run_id, exports, args.handoff_dir, args.link_mode, args.max_workers)
+    print(
+        json.dumps(
+            {
+                "status": "PASS" if not manifest["missing"] else "FAIL",
+                "directory": manifest["directory"],
+                "file_count": manifest["file_count"],
+                "total_bytes": manifest["total_bytes"],
+                "methods": manifest["methods"],
+                "elapsed_s": manifest["elapsed_s"],
+            }
+        )
+    )
+    return 0 if not manifest["missing"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(stage_profile.run(main))
@@ -8,11 +8,15 @@ import json
 from pathlib import Path
 from typing import Any, Dict, List
 
+import stage_profile
+import tracing
+
 
 def _load(path: Path) -> Any:
     return json.loads(path.read_text())
 
 
+@tracing.traced()
 def build_notification(summary: Dict[str, Any], segments: List[Dict[str, Any]], run_id: str | None) -> Dict[str, Any]:
     failed = int(summary.get("failed", 0))
     total = int(summary.get("total", 0))
@@ -61,6 +65,7 @@ def build_notification(summary: Dict[str, Any], segments: List[Dict[str, Any]],
     }
 
 
+@tracing.traced("format_error_notification")
 def main() -> int:
     parser = argparse.ArgumentParser(description="Format standardized error notification JSON")
     parser.add_argument("--summary", type=Path, required=True)
@@ -82,4 +87,4 @@ def main() -> int:
 
 
 if __name__ == "__main__":
-    raise SystemExit(main())
+    raise SystemExit(stage_profile.run(main))
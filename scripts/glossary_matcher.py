@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""Compile large glossaries into a cached Aho-Corasick matcher for OCR routing (T06.3)."""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import json
+import marshal
+import tempfile
+import time
+import unicodedata
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import stage_profile
+
+
+CACHE_VERSION = 1
+
+
+def _normalize(text: str) -> str:
+    return unicodedata.normalize("NFKC", text or "")
+
+
+def _content_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_terms(path: Path) -> List[Tuple[str, str]]:
+    """Read `source,target[,...]` rows (CSV, or TSV for .tsv); a source/target header row is skipped."""
+    delimiter = "\t" if path.suffix.lower() == ".tsv" else ","
+    terms: List[Tuple[str, str]] = []
+    seen: set[str] = set()
+    with path.open(encoding="utf-8-sig", newline="") as fh:
+        for idx, row in enumerate(csv.reader(fh, delimiter=delimiter)):
+            if len(row) < 2:
+                continue
+            source, target = _normalize(row[0].strip()), row[1].strip()
+            if idx == 0 and source.lower() in {"source", "src", "term"}:
+                continue
+            if not source or source in seen:
+                continue
+            seen.add(source)
+            terms.append((source, target))
+    return terms
+
+
+def compile_glossary(terms: List[Tuple[str, str]]) -> Dict[str, Any]:
+    """Build goto/fail/output tables.
+
+    `term_at[s]` is the term ending exactly at state `s` (-1 if none) and `dict_link[s]` is the
+    nearest state on the fail chain that ends a term, so matching walks only real outputs.
+    """
+    goto: List[Dict[str, int]] = [{}]
+    term_at: List[int] = [-1]
+
+    for term_id, (source, _) in enumerate(terms):
+        state = 0
+        for ch in source:
+            nxt = goto[state].get(ch)
+            if nxt is None:
+                nxt = len(goto)
+                goto[state][ch] = nxt
+                goto.append({})
+                term_at.append(-1)
+            state = nxt
+        term_at[state] = term_id
+
+    fail = [0] * len(goto)
+    dict_link = [-1] * len(goto)
+    queue = deque(goto[0].values())
+    while queue:
+        state = queue.popleft()
+        for ch, nxt in goto[state].items():
+            queue.append(nxt)
+            f = fail[state]
+            while f and ch not in goto[f]:
+                f = fail[f]
+            candidate = goto[f].get(ch, 0)
+            fail[nxt] = candidate if candidate != nxt else 0
+            link = fail[nxt]
+            dict_link[nxt] = link if term_at[link] >= 0 else dict_link[link]
+
+    return {
+        "version": CACHE_VERSION,
+        "goto": goto,
+        "fail": fail,
+        "term_at": term_at,
+        "dict_link": dict_link,
+        "sources": [s for s, _ in terms],
+        "targets": [t for _, t in terms],
+    }
+
+
+def load_glossary(path: str | Path, cache_dir: Path = Path("logs/cache/glossary")) -> Dict[str, Any]:
+    """Load a compiled glossary, compiling and caching it on first use of this content hash."""
+    glossary_path = Path(path)
+    cache_path = cache_dir / f"{_content_hash(glossary_path)}.marshal"
+    if cache_path.exists():
+        compiled = marshal.loads(cache_path.read_bytes())
+        if compiled.get("version") == CACHE_VERSION:
+            return compiled
+
+    compiled = compile_glossary(read_terms(glossary_path))
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile("wb", delete=False, dir=cache_dir) as tmp:
+        tmp.write(marshal.dumps(compiled))
+        tmp_path = Path(tmp.name)
+    tmp_path.replace(cache_path)
+    return compiled
+
+
+def find_terms(compiled: Dict[str, Any], text: str) -> List[Dict[str, str]]:
+    """Return unique glossary terms present in `text`, in order of first occurrence."""
+    goto, fail = compiled["goto"], compiled["fail"]
+    term_at, dict_link = compiled["term_at"], compiled["dict_link"]
+    hits: Dict[int, None] = {}
+
+    state = 0
+    for ch in _normalize(text):
+        while state and ch not in goto[state]:
+            state = fail[state]
+        state = goto[state].get(ch, 0)
+        out = state if term_at[state] >= 0 else dict_link[state]
+        while out > 0:
+            hits.setdefault(term_at[out])
+            out = dict_link[out]
+
+    return [{"source": compiled["sources"][i], "target": compiled["targets"][i]} for i in hits]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compile a glossary into a cached multi-pattern matcher")
+    parser.add_argument("glossary", type=Path, help="Glossary CSV/TSV (source,target)")
+    parser.add_argument("--cache-dir", type=Path, default=Path("logs/cache/glossary"))
+    parser.add_argument("--text", help="Optional text to match against the compiled glossary")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    compiled = load_glossary(args.glossary, args.cache_dir)
+    load_ms = (time.perf_counter() - started) * 1000
+
+    report: Dict[str, Any] = {
+        "status": "PASS",
+        "terms": len(compiled["sources"]),
+        "states": len(compiled["goto"]),
+        "load_ms": round(load_ms, 2),
+    }
+    if args.text is not None:
+        report["hits"] = find_terms(compiled, args.text)
+    print(json.dumps(report, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(stage_profile.run(main))
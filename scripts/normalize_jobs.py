@@ -9,6 +9,8 @@ import json
 from pathlib import Path
 from typing import Any, Dict, List
 
+import stage_profile
+import tracing
 from validate_input import collect_files, validate_payload
 
 
@@ -17,6 +19,7 @@ def _file_id(path: Path) -> str:
     return f"file_{digest}"
 
 
+@tracing.traced()
 def normalize(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
     result = validate_payload(payload)
     if result["errors"]:
@@ -50,6 +53,7 @@ def normalize(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
     return jobs
 
 
+@tracing.traced("normalize_jobs")
 def main() -> int:
     parser = argparse.ArgumentParser(description="Normalize intake payload into queue jobs.")
     parser.add_argument("payload", type=Path, help="Path to intake payload JSON")
@@ -69,4 +73,4 @@ def main() -> int:
 
 
 if __name__ == "__main__":
-    raise SystemExit(main())
+    raise SystemExit(stage_profile.run(main))
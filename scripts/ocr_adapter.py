@@ -4,20 +4,109 @@
 from __future__ import annotations
 
 import argparse
+import hashlib
 import json
 import shutil
 import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
+
+from ocr_normalize import normalize_output, page_from_name
+import stage_profile
+import tracing
 
 
 def _load(path: Path) -> Dict[str, Any]:
     return json.loads(path.read_text())
 
 
-def _build_command(provider_cfg: Dict[str, Any], input_path: Path, output_dir: Path) -> List[str]:
-    output_base = output_dir / input_path.stem
-    output_json = output_dir / f"{input_path.stem}.json"
+def _file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _args_hash(provider_cfg: Dict[str, Any]) -> str:
+    """Hash binary + arg template (language packs, modes); per-run paths are placeholders and excluded."""
+    spec = [provider_cfg.get("binary"), list(provider_cfg.get("args", []))]
+    return hashlib.sha256(json.dumps(spec).encode("utf-8")).hexdigest()
+
+
+def _cache_file(cache_dir: Path, input_path: Path, provider: str, provider_cfg: Dict[str, Any]) -> Path | None:
+    if not input_path.is_file():
+        return None
+    image_hash = _file_hash(input_path)
+    return cache_dir / image_hash[:2] / image_hash / f"{provider}-{_args_hash(provider_cfg)[:16]}.json"
+
+
+PAGE_FIELDS = ("segment_id", "page")
+
+
+def _cache_get(path: Path | None, page: int) -> List[Dict[str, Any]] | None:
+    """Cached rows re-stamped with the input's `page`: identical images recur under other pages."""
+    if path is None or not path.exists():
+        return None
+    rows = json.loads(path.read_text(encoding="utf-8")).get("segments")
+    if rows is None:
+        return None
+    return [
+        {"segment_id": f"p{page:05d}_s{idx:04d}", "page": page, **{k: v for k, v in row.items() if k not in PAGE_FIELDS}}
+        for idx, row in enumerate(rows, start=1)
+    ]
+
+
+def _cache_put(path: Path | None, segments: List[Dict[str, Any]]) -> bool:
+    """Store page-agnostic rows (no `segment_id`/`page`), in segment order."""
+    if path is None:
+        return False
+    rows = [{k: v for k, v in seg.items() if k not in PAGE_FIELDS} for seg in segments]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", delete=False, dir=path.parent) as tmp:
+        tmp.write(json.dumps({"segments": rows}, ensure_ascii=False))
+        tmp_path = Path(tmp.name)
+    tmp_path.replace(path)
+    return True
+
+
+def input_pages(inputs: List[Path]) -> List[int]:
+    """Page number per input: `page-NNNNN` from the names, else the 1-based position in the list.
+
+    Positions are used for the whole list as soon as one name carries no page number, so unnamed
+    images never all become page 1 and share segment ids.
+    """
+    named = [page_from_name(path, default=0) for path in inputs]
+    if all(named):
+        return named
+    return list(range(1, len(inputs) + 1))
+
+
+def _output_stem(input_path: Path, qualified: bool = False) -> str:
+    """`<stem>`, or `<stem>.<dir digest>` in batch mode, where pages of different documents share stems."""
+    if not qualified:
+        return input_path.stem
+    parent = str(input_path.resolve().parent)
+    return f"{input_path.stem}.{hashlib.sha256(parent.encode('utf-8')).hexdigest()[:8]}"
+
+
+def _write_segments(output_dir: Path, input_path: Path, segments: List[Dict[str, Any]], qualified: bool = False) -> str:
+    out = output_dir / f"{_output_stem(input_path, qualified)}.segments.jsonl"
+    with out.open("w", encoding="utf-8") as fh:
+        for seg in segments:
+            fh.write(json.dumps(seg, ensure_ascii=False) + "\n")
+    return str(out)
+
+
+def _output_paths(output_dir: Path, input_path: Path, qualified: bool = False) -> Tuple[Path, Path]:
+    stem = _output_stem(input_path, qualified)
+    return output_dir / stem, output_dir / f"{stem}.json"
+
+
+def _build_command(provider_cfg: Dict[str, Any], input_path: Path, output_dir: Path, qualified: bool = False) -> List[str]:
+    output_base, output_json = _output_paths(output_dir, input_path, qualified)
     cmd = [provider_cfg["binary"]]
     for token in provider_cfg.get("args", []):
         cmd.append(
@@ -36,13 +125,18 @@ def run_adapter(
     config: Dict[str, Any],
     output_dir: Path,
     dry_run: bool,
+    cache_dir: Path | None = None,
+    page: int | None = None,
+    qualified: bool = False,
 ) -> Dict[str, Any]:
+    """OCR one input. `page` defaults to the `page-NNNNN` name; `qualified` selects batch-mode output names."""
     providers = config.get("providers", {})
     if provider not in providers:
         return {"status": "FAIL", "reason": f"unsupported_provider:{provider}"}
 
     provider_cfg = providers[provider]
-    cmd = _build_command(provider_cfg, input_path, output_dir)
+    page = page if page is not None else page_from_name(input_path)
+    cmd = _build_command(provider_cfg, input_path, output_dir, qualified)
 
     result: Dict[str, Any] = {
         "status": "PASS",
@@ -57,6 +151,13 @@ def run_adapter(
         result["dry_run"] = True
         return result
 
+    cache_file = _cache_file(cache_dir, input_path, provider, provider_cfg) if cache_dir else None
+    cached = _cache_get(cache_file, page)
+    if cached is not None:
+        result["cache"] = {"hits": 1, "misses": 0, "stored": 0}
+        result["segments_out"] = _write_segments(output_dir, input_path, cached, qualified)
+        return result
+
     binary = provider_cfg.get("binary")
     if not shutil.which(binary):
         return {
@@ -80,24 +181,178 @@ def run_adapter(
         }
 
     result["returncode"] = proc.returncode
+    output_base, output_json = _output_paths(output_dir, input_path, qualified)
+    normalized = normalize_output(output_base, output_json, [page])
+    stored = 0
+    if normalized is not None:
+        segments = normalized.get(1, [])
+        result["segments_out"] = _write_segments(output_dir, input_path, segments, qualified)
+        stored = int(_cache_put(cache_file, segments))
+    result["cache"] = {"hits": 0, "misses": int(cache_dir is not None), "stored": stored}
     return result
 
 
+def _batch_groups(
+    inputs: List[Path], provider_cfg: Dict[str, Any], output_dir: Path
+) -> List[Tuple[List[Path], Path, List[str]]]:
+    """Split inputs into (members, command input, command) groups.
+
+    Providers with `batch.mode == "list_file"` (tesseract) get one process per group of up to
+    `batch.max_items` inputs via a list file; everything else gets one process per input. List
+    files are named `batch-<digest of members>.list`, so batches of different documents or runs
+    sharing an output dir never collide, and the provider's `<output_base>.txt`/`.tsv` output
+    can never overwrite its own list.
+    """
+    batch_cfg = provider_cfg.get("batch", {})
+    if batch_cfg.get("mode") != "list_file":
+        return [([path], path, _build_command(provider_cfg, path, output_dir, qualified=True)) for path in inputs]
+
+    size = max(1, int(batch_cfg.get("max_items", 32)))
+    groups: List[Tuple[List[Path], Path, List[str]]] = []
+    for start in range(0, len(inputs), size):
+        members = inputs[start : start + size]
+        listing = "".join(f"{path.resolve()}\n" for path in members)
+        list_path = output_dir / f"batch-{hashlib.sha256(listing.encode('utf-8')).hexdigest()[:16]}.list"
+        list_path.write_text(listing, encoding="utf-8")
+        groups.append((members, list_path, _build_command(provider_cfg, list_path, output_dir, qualified=True)))
+    return groups
+
+
+@tracing.traced()
+def run_batch(
+    inputs: List[Path],
+    provider: str,
+    config: Dict[str, Any],
+    output_dir: Path,
+    dry_run: bool,
+    max_workers: int = 2,
+    cache_dir: Path | None = None,
+    pages: List[int] | None = None,
+) -> Dict[str, Any]:
+    """OCR several inputs; `pages` (one per input) defaults to `input_pages(inputs)`."""
+    providers = config.get("providers", {})
+    if provider not in providers:
+        return {"status": "FAIL", "reason": f"unsupported_provider:{provider}"}
+
+    provider_cfg = providers[provider]
+    pages = pages if pages is not None else input_pages(inputs)
+    items_by_input: Dict[int, Dict[str, Any]] = {}
+    cache_files: Dict[int, Path | None] = {}
+    pending: List[int] = []
+    for idx, path in enumerate(inputs):
+        if dry_run or cache_dir is None:
+            pending.append(idx)
+            continue
+        cache_files[idx] = _cache_file(cache_dir, path, provider, provider_cfg)
+        cached = _cache_get(cache_files[idx], pages[idx])
+        if cached is None:
+            pending.append(idx)
+            continue
+        items_by_input[idx] = {
+            "input": str(path),
+            "status": "PASS",
+            "cache": "hit",
+            "segments_out": _write_segments(output_dir, path, cached, qualified=True),
+        }
+
+    groups = _batch_groups([inputs[idx] for idx in pending], provider_cfg, output_dir)
+    binary = provider_cfg.get("binary")
+    missing = not dry_run and bool(groups) and not shutil.which(binary)
+
+    def _run_group(group: Tuple[List[Path], Path, List[str]]) -> Dict[str, Any]:
+        _, _, cmd = group
+        if dry_run:
+            return {"status": "PASS", "command": cmd, "dry_run": True}
+        if missing:
+            return {"status": "FAIL", "command": cmd, "reason": f"missing_binary:{binary}"}
+        proc = subprocess.run(cmd, capture_output=True, text=True, check=False)
+        if proc.returncode != 0:
+            return {
+                "status": "FAIL",
+                "command": cmd,
+                "reason": "ocr_command_failed",
+                "stderr": proc.stderr[-500:],
+                "returncode": proc.returncode,
+            }
+        return {"status": "PASS", "command": cmd, "returncode": proc.returncode}
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        outcomes = list(pool.map(_run_group, groups))
+
+    stored = 0
+    offset = 0
+    for group_idx, ((members, source, _), outcome) in enumerate(zip(groups, outcomes), start=1):
+        member_idx = pending[offset : offset + len(members)]
+        offset += len(members)
+        normalized = None
+        if outcome["status"] == "PASS" and not dry_run:
+            output_base, output_json = _output_paths(output_dir, source, qualified=True)
+            normalized = normalize_output(output_base, output_json, [pages[idx] for idx in member_idx])
+        for position, (idx, path) in enumerate(zip(member_idx, members), start=1):
+            item = {"input": str(path), "group": group_idx, **outcome}
+            if cache_dir is not None and not dry_run:
+                item["cache"] = "miss"
+            if normalized is not None:
+                segments = normalized.get(position, [])
+                item["segments_out"] = _write_segments(output_dir, path, segments, qualified=True)
+                stored += int(_cache_put(cache_files.get(idx), segments))
+            items_by_input[idx] = item
+
+    items = [items_by_input[idx] for idx in range(len(inputs))]
+    failed = sum(1 for item in items if item["status"] != "PASS")
+    hits = len(inputs) - len(pending)
+    return {
+        "status": "PASS" if failed == 0 else "FAIL",
+        "provider": provider,
+        "mode": "batch",
+        "batching": provider_cfg.get("batch", {}).get("mode", "per_input"),
+        "output_dir": str(output_dir),
+        "ocr_required": True,
+        "dry_run": dry_run,
+        "summary": {"total": len(items), "passed": len(items) - failed, "failed": failed, "processes": len(groups)},
+        "cache": {
+            "hits": hits,
+            "misses": len(pending) if cache_dir is not None and not dry_run else 0,
+            "stored": stored,
+            "hit_rate": round(hits / len(inputs), 4) if inputs else 0.0,
+        },
+        "items": items,
+    }
+
+
+def read_inputs_list(path: Path) -> List[Path]:
+    text = path.read_text(encoding="utf-8")
+    if text.lstrip().startswith("["):
+        return [Path(p) for p in json.loads(text)]
+    return [Path(line.strip()) for line in text.splitlines() if line.strip()]
+
+
 def main() -> int:
     parser = argparse.ArgumentParser(description="Run OCR provider adapter")
-    parser.add_argument("input", type=Path, help="Image/PDF path for OCR preprocessing")
+    parser.add_argument("input", type=Path, nargs="*", help="Image/PDF path(s) for OCR preprocessing")
+    parser.add_argument("--inputs-list", type=Path, help="Newline list or JSON array of inputs (batch mode)")
+    parser.add_argument("--max-workers", type=int, default=2, help="Parallel provider processes in batch mode")
     parser.add_argument("--provider", type=str, help="OCR provider key")
     parser.add_argument("--config", type=Path, default=Path("configs/ocr-tools.json"))
     parser.add_argument("--output-dir", type=Path, default=Path("logs/ocr"))
     parser.add_argument("--result-out", type=Path, default=Path("logs/ocr/result.json"))
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the OCR result cache")
     parser.add_argument("--dry-run", action="store_true")
     args = parser.parse_args()
 
     cfg = _load(args.config)
+    cache_dir = None if args.no_cache else Path(cfg.get("ocr_cache", {}).get("cache_dir", "logs/cache/ocr"))
     provider = args.provider or cfg.get("default_provider", "tesseract")
 
+    inputs = list(args.input) + (read_inputs_list(args.inputs_list) if args.inputs_list else [])
+    if not inputs:
+        parser.error("at least one input or --inputs-list is required")
+
     args.output_dir.mkdir(parents=True, exist_ok=True)
-    result = run_adapter(args.input, provider, cfg, args.output_dir, args.dry_run)
+    if len(inputs) == 1 and not args.inputs_list:
+        result = run_adapter(inputs[0], provider, cfg, args.output_dir, args.dry_run, cache_dir)
+    else:
+        result = run_batch(inputs, provider, cfg, args.output_dir, args.dry_run, args.max_workers, cache_dir)
 
     args.result_out.parent.mkdir(parents=True, exist_ok=True)
     args.result_out.write_text(json.dumps(result, indent=2) + "\n")
@@ -106,4 +361,4 @@ def main() -> int:
 
 
 if __name__ == "__main__":
-    raise SystemExit(main())
+    raise SystemExit(stage_profile.run(main))
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""Confidence-cascade OCR: fast provider everywhere, heavy provider on low-confidence pages (T06.2/T06.5)."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import resource
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from ocr_adapter import input_pages, read_inputs_list, run_batch
+import stage_profile
+import tracing
+
+
+def _load(path: Path) -> Dict[str, Any]:
+    return json.loads(path.read_text())
+
+
+def _read_segments(path: str | None) -> List[Dict[str, Any]]:
+    if not path or not Path(path).exists():
+        return []
+    with open(path, encoding="utf-8") as fh:
+        return [json.loads(line) for line in fh if line.strip()]
+
+
+def _overlap(a: Any, b: Any) -> float:
+    """Intersection area over the smaller box; 0 when either bbox is missing."""
+    if not (isinstance(a, list) and isinstance(b, list) and len(a) == 4 and len(b) == 4):
+        return 0.0
+    w = min(a[2], b[2]) - max(a[0], b[0])
+    h = min(a[3], b[3]) - max(a[1], b[1])
+    if w <= 0 or h <= 0:
+        return 0.0
+    smaller = min((a[2] - a[0]) * (a[3] - a[1]), (b[2] - b[0]) * (b[3] - b[1]))
+    return (w * h) / smaller if smaller > 0 else 0.0
+
+
+def merge_page(
+    fast: List[Dict[str, Any]], heavy: List[Dict[str, Any]], threshold: float, min_overlap: float = 0.5
+) -> Tuple[List[Dict[str, Any]], int, int]:
+    """Keep the better result per segment; returns (segments, replaced, added).
+
+    Low-confidence fast segments are paired with overlapping, more confident heavy segments, best
+    overlap first; each heavy segment replaces at most one fast segment (segment_id and bbox stay
+    from the fast tier). Heavy segments that overlap no fast segment are text only the heavy tier
+    found and are appended with new segment_ids. If the fast tier found nothing on the page, the
+    heavy tier's segments are used as-is.
+    """
+    if not fast:
+        return [dict(seg, ocr_tier=2) for seg in heavy], 0, len(heavy)
+
+    overlaps = [[_overlap(seg.get("bbox"), h.get("bbox")) for h in heavy] for seg in fast]
+    pairs = []
+    for f_idx, seg in enumerate(fast):
+        conf = float(seg.get("confidence", 0.0))
+        if conf >= threshold:
+            continue
+        for h_idx, h in enumerate(heavy):
+            if overlaps[f_idx][h_idx] >= min_overlap and float(h.get("confidence", 0.0)) > conf:
+                pairs.append((overlaps[f_idx][h_idx], float(h.get("confidence", 0.0)), f_idx, h_idx))
+    chosen: Dict[int, int] = {}
+    used = set()
+    for _, _, f_idx, h_idx in sorted(pairs, reverse=True):
+        if f_idx not in chosen and h_idx not in used:
+            chosen[f_idx] = h_idx
+            used.add(h_idx)
+
+    merged: List[Dict[str, Any]] = []
+    for f_idx, seg in enumerate(fast):
+        if f_idx in chosen:
+            best = heavy[chosen[f_idx]]
+            merged.append(dict(seg, text=best["text"], confidence=best["confidence"], ocr_tier=2))
+        else:
+            merged.append(dict(seg, ocr_tier=1))
+
+    page = int(fast[0].get("page") or heavy[0].get("page") or 1) if heavy else 1
+    ids = {seg.get("segment_id") for seg in fast}
+    next_idx = len(fast)
+    added = 0
+    for h_idx, h in enumerate(heavy):
+        if any(overlaps[f_idx][h_idx] > 0 for f_idx in range(len(fast))):
+            continue
+        next_idx += 1
+        while f"p{page:05d}_s{next_idx:04d}" in ids:
+            next_idx += 1
+        merged.append(dict(h, segment_id=f"p{page:05d}_s{next_idx:04d}", page=page, ocr_tier=2))
+        added += 1
+    return merged, len(chosen), added
+
+
+def _needs_escalation(segments: List[Dict[str, Any]], threshold: float) -> bool:
+    return not segments or any(float(s.get("confidence", 0.0)) < threshold for s in segments)
+
+
+def _timed_batch(*args: Any, **kwargs: Any) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    wall = time.perf_counter()
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    result = run_batch(*args, **kwargs)
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+    return result, {"wall_s": round(time.perf_counter() - wall, 3), "cpu_s": round(cpu, 3)}
+
+
+@tracing.traced()
+def run_cascade(
+    inputs: List[Path],
+    tiers: List[str],
+    config: Dict[str, Any],
+    output_dir: Path,
+    threshold: float,
+    dry_run: bool,
+    max_workers: int,
+    cache_dir: Path | None,
+) -> Dict[str, Any]:
+    fast_provider, heavy_provider = tiers
+    pages = dict(zip(map(str, inputs), input_pages(inputs)))
+    fast, fast_time = _timed_batch(
+        inputs, fast_provider, config, output_dir / fast_provider, dry_run, max_workers, cache_dir,
+        [pages[str(p)] for p in inputs],
+    )
+    if fast.get("status") == "FAIL" and "items" not in fast:
+        return fast
+
+    fast_items = {item["input"]: item for item in fast["items"]}
+    fast_segments = {str(p): _read_segments(fast_items[str(p)].get("segments_out")) for p in inputs}
+    escalate = [
+        p
+        for p in inputs
+        if fast_items[str(p)]["status"] != "PASS" or _needs_escalation(fast_segments[str(p)], threshold)
+    ]
+
+    heavy: Dict[str, Any] = {"items": [], "status": "PASS"}
+    heavy_time = {"wall_s": 0.0, "cpu_s": 0.0}
+    if escalate:
+        heavy, heavy_time = _timed_batch(
+            escalate, heavy_provider, config, output_dir / heavy_provider, dry_run, max_workers, cache_dir,
+            [pages[str(p)] for p in escalate],
+        )
+    heavy_items = {item["input"]: item for item in heavy.get("items", [])}
+
+    pages: List[Dict[str, Any]] = []
+    segments: List[Dict[str, Any]] = []
+    replaced_total = added_total = 0
+    for path in inputs:
+        key = str(path)
+        heavy_item = heavy_items.get(key)
+        page_segments = fast_segments[key]
+        replaced = added = 0
+        if heavy_item and heavy_item["status"] == "PASS":
+            page_segments, replaced, added = merge_page(
+                page_segments, _read_segments(heavy_item.get("segments_out")), threshold
+            )
+        else:
+            page_segments = [dict(seg, ocr_tier=1) for seg in page_segments]
+        ok = fast_items[key]["status"] == "PASS" or bool(heavy_item and heavy_item["status"] == "PASS")
+        replaced_total += replaced
+        added_total += added
+        segments.extend(page_segments)
+        pages.append(
+            {
+                "input": key,
+                "status": "PASS" if ok else "FAIL",
+                "escalated": heavy_item is not None,
+                "segments": len(page_segments),
+                "replaced_by_tier2": replaced,
+                "added_by_tier2": added,
+            }
+        )
+
+    failed = sum(1 for p in pages if p["status"] != "PASS")
+    return {
+        "status": "PASS" if failed == 0 else "FAIL",
+        "mode": "cascade",
+        "tiers": tiers,
+        "low_conf_threshold": threshold,
+        "dry_run": dry_run,
+        "summary": {
+            "pages": len(pages),
+            "failed": failed,
+            "pages_tier1_only": len(pages) - len(escalate),
+            "pages_escalated": len(escalate),
+            "segments": len(segments),
+            "segments_replaced_by_tier2": replaced_total,
+            "segments_added_by_tier2": added_total,
+            "tier1": {"provider": fast_provider, **fast_time, "cache": fast.get("cache")},
+            "tier2": {"provider": heavy_provider, **heavy_time, "cache": heavy.get("cache")},
+        },
+        "pages": pages,
+        "segments": segments,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run cascaded OCR (fast tier, heavy tier on low confidence)")
+    parser.add_argument("input", type=Path, nargs="*", help="Page image path(s)")
+    parser.add_argument("--inputs-list", type=Path, help="Newline list or JSON array of page images")
+    parser.add_argument("--config", type=Path, default=Path("configs/ocr-tools.json"))
+    parser.add_argument("--tiers", nargs=2, metavar=("FAST", "HEAVY"), help="Override cascade.tiers from config")
+    parser.add_argument("--low-conf-threshold", type=float, default=0.80)
+    parser.add_argument("--output-dir", type=Path, default=Path("logs/ocr"))
+    parser.add_argument("--segments-out", type=Path, default=Path("logs/ocr/segments.jsonl"))
+    parser.add_argument("--result-out", type=Path, default=Path("logs/ocr/cascade-result.json"))
+    parser.add_argument("--max-workers", type=int, default=2)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    cfg = _load(args.config)
+    tiers = args.tiers or cfg.get("cascade", {}).get("tiers", ["tesseract", "paddleocr"])
+    inputs = list(args.input) + (read_inputs_list(args.inputs_list) if args.inputs_list else [])
+    if not inputs:
+        parser.error("at least one input or --inputs-list is required")
+    cache_dir = None if args.no_cache else Path(cfg.get("ocr_cache", {}).get("cache_dir", "logs/cache/ocr"))
+
+    for tier in tiers:
+        (args.output_dir / tier).mkdir(parents=True, exist_ok=True)
+    result = run_cascade(
+        inputs, list(tiers), cfg, args.output_dir, args.low_conf_threshold, args.dry_run, args.max_workers, cache_dir
+    )
+
+    segments = result.pop("segments", [])
+    args.segments_out.parent.mkdir(parents=True, exist_ok=True)
+    with args.segments_out.open("w", encoding="utf-8") as fh:
+        for seg in segments:
+            fh.write(json.dumps(seg, ensure_ascii=False) + "\n")
+    args.result_out.parent.mkdir(parents=True, exist_ok=True)
+    args.result_out.write_text(json.dumps(result, indent=2) + "\n")
+    print(json.dumps({"status": result.get("status"), "summary": result.get("summary"), "result": str(args.result_out)}))
+    return 0 if result.get("status") == "PASS" else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(stage_profile.run(main))
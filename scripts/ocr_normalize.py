@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""Stream provider-specific OCR output into the routing segment schema (T06.2/T06.3)."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+import stage_profile
+
+
+PAGE_NAME_RE = re.compile(r"page-(\d+)")
+BBOX_RE = re.compile(r"bbox (\d+) (\d+) (\d+) (\d+)")
+WCONF_RE = re.compile(r"x_wconf (\d+)")
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "wbr"}
+
+
+def page_from_name(path: Path, default: int = 1) -> int:
+    match = PAGE_NAME_RE.search(path.stem)
+    return int(match.group(1)) if match else default
+
+
+def _bbox_from_points(points: Any) -> List[float] | None:
+    try:
+        xs = [float(p[0]) for p in points]
+        ys = [float(p[1]) for p in points]
+    except (TypeError, ValueError, IndexError):
+        return None
+    if not xs:
+        return None
+    return [min(xs), min(ys), max(xs), max(ys)]
+
+
+def _join(parts: List[str]) -> str:
+    out = ""
+    for part in parts:
+        if out and (out[-1].isascii() or part[:1].isascii()):
+            out += " "
+        out += part
+    return out
+
+
+def _segment(page: int, idx: int, bbox: List[float] | None, text: str, confidence: float) -> Dict[str, Any]:
+    return {
+        "segment_id": f"p{page:05d}_s{idx:04d}",
+        "page": page,
+        "bbox": bbox,
+        "text": text,
+        "confidence": round(max(0.0, min(1.0, confidence)), 4),
+    }
+
+
+def iter_tesseract_tsv(lines: Iterable[str], pages: List[int] | None = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Group Tesseract TSV words into line segments.
+
+    `pages` maps Tesseract's 1-based `page_num` (list-file position) to document page numbers;
+    without it `page_num` is used as-is. Yields `(page_num, segment)` one line at a time.
+    """
+    current_key: Tuple[int, int, int, int] | None = None
+    words: List[str] = []
+    confs: List[float] = []
+    box: List[float] = []
+    counters: Dict[int, int] = {}
+
+    def flush() -> Iterator[Tuple[int, Dict[str, Any]]]:
+        if current_key is None or not words:
+            return
+        page_num = current_key[0]
+        page = pages[page_num - 1] if pages and 0 < page_num <= len(pages) else page_num
+        counters[page_num] = counters.get(page_num, 0) + 1
+        conf = sum(confs) / len(confs) / 100 if confs else 0.0
+        yield page_num, _segment(page, counters[page_num], list(box), _join(words), conf)
+
+    for raw in lines:
+        cols = raw.rstrip("\n").split("\t")
+        if len(cols) < 12 or cols[0] != "5":
+            continue
+        text = cols[11].strip()
+        if not text:
+            continue
+        key = (int(cols[1]), int(cols[2]), int(cols[3]), int(cols[4]))
+        if key != current_key:
+            yield from flush()
+            current_key, words, confs, box = key, [], [], []
+        left, top, width, height = (float(v) for v in cols[6:10])
+        if box:
+            box = [min(box[0], left), min(box[1], top), max(box[2], left + width), max(box[3], top + height)]
+        else:
+            box = [left, top, left + width, top + height]
+        words.append(text)
+        conf = float(cols[10])
+        if conf >= 0:
+            confs.append(conf)
+    yield from flush()
+
+
+def _is_paddle_row(row: Any) -> bool:
+    return (
+        isinstance(row, list)
+        and len(row) == 2
+        and isinstance(row[0], list)
+        and bool(row[0])
+        and isinstance(row[0][0], (list, tuple))
+        and isinstance(row[1], (list, tuple))
+    )
+
+
+def iter_json_output(data: Any, page: int) -> Iterator[Dict[str, Any]]:
+    """Accept easyocr `[points, text, conf]` rows, paddleocr `[points, [text, conf]]` rows (optionally
+    nested per page) or `{bbox|points, text, confidence}` objects."""
+    if isinstance(data, dict):
+        data = data.get("results") or data.get("segments") or []
+    if data and isinstance(data[0], list) and data[0] and _is_paddle_row(data[0][0]):
+        data = [row for page_rows in data for row in page_rows or []]
+
+    idx = 0
+    for row in data or []:
+        if isinstance(row, dict):
+            bbox = row.get("bbox")
+            if bbox and isinstance(bbox[0], (list, tuple)):
+                bbox = _bbox_from_points(bbox)
+            if bbox is None and row.get("points"):
+                bbox = _bbox_from_points(row["points"])
+            text, conf = row.get("text", ""), row.get("confidence", row.get("score", 0.0))
+        elif _is_paddle_row(row):
+            bbox, (text, conf) = _bbox_from_points(row[0]), row[1][:2]
+        elif isinstance(row, list) and len(row) >= 3:
+            bbox, text, conf = _bbox_from_points(row[0]), row[1], row[2]
+        else:
+            continue
+        if not str(text).strip():
+            continue
+        idx += 1
+        yield _segment(page, idx, bbox, str(text), float(conf or 0.0))
+
+
+class _HocrLines(HTMLParser):
+    """Incremental hOCR reader: collects `ocr_line` spans and their `ocrx_word` children."""
+
+    def __init__(self, page: int) -> None:
+        super().__init__(convert_charrefs=True)
+        self.page = page
+        self.ready: List[Dict[str, Any]] = []
+        self._depth = 0
+        self._line_depth: int | None = None
+        self._word_depth: int | None = None
+        self._line_bbox: List[float] | None = None
+        self._words: List[str] = []
+        self._confs: List[float] = []
+        self._count = 0
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, str | None]]) -> None:
+        if tag in VOID_TAGS:
+            return
+        self._depth += 1
+        attr = dict(attrs)
+        classes = (attr.get("class") or "").split()
+        title = attr.get("title") or ""
+        if self._line_depth is None and ("ocr_line" in classes or "ocrx_line" in classes):
+            match = BBOX_RE.search(title)
+            self._line_depth = self._depth
+            self._line_bbox = [float(v) for v in match.groups()] if match else None
+            self._words, self._confs = [], []
+        elif self._line_depth is not None and "ocrx_word" in classes:
+            self._word_depth = self._depth
+            self._words.append("")
+            conf = WCONF_RE.search(title)
+            if conf:
+                self._confs.append(float(conf.group(1)))
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in VOID_TAGS:
+            return
+        if self._word_depth == self._depth:
+            self._word_depth = None
+        if self._line_depth == self._depth:
+            words = [w.strip() for w in self._words if w.strip()]
+            if words:
+                self._count += 1
+                conf = sum(self._confs) / len(self._confs) / 100 if self._confs else 0.0
+                self.ready.append(_segment(self.page, self._count, self._line_bbox, _join(words), conf))
+            self._line_depth = None
+        self._depth -= 1
+
+    def handle_data(self, data: str) -> None:
+        if self._word_depth is not None and self._words:
+            self._words[-1] += data
+
+
+def iter_hocr(lines: Iterable[str], page: int) -> Iterator[Dict[str, Any]]:
+    parser = _HocrLines(page)
+    for chunk in lines:
+        parser.feed(chunk)
+        yield from parser.ready
+        parser.ready.clear()
+    parser.close()
+    yield from parser.ready
+
+
+def iter_segments_file(path: Path, page: int | None = None) -> Iterator[Dict[str, Any]]:
+    """Stream segments from any supported OCR output, chosen by suffix.
+
+    `.tsv` (Tesseract), `.hocr`/`.html` (hOCR), `.jsonl` (already normalized rows) are read line
+    by line; `.json` (easyocr/paddleocr, one file per image) is parsed per file.
+    """
+    page = page if page is not None else page_from_name(path)
+    suffix = path.suffix.lower()
+    with path.open(encoding="utf-8") as fh:
+        if suffix == ".tsv":
+            for _, seg in iter_tesseract_tsv(fh, [page]):
+                yield seg
+        elif suffix in (".hocr", ".html"):
+            yield from iter_hocr(fh, page)
+        elif suffix == ".jsonl":
+            for line in fh:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            data = json.load(fh)
+            if isinstance(data, list) and data and isinstance(data[0], dict) and "segment_id" in data[0]:
+                yield from data
+            else:
+                yield from iter_json_output(data, page)
+
+
+def normalize_output(output_base: Path, output_json: Path, pages: List[int]) -> Dict[int, List[Dict[str, Any]]] | None:
+    """Read one provider invocation's output and return segments per input position (1-based).
+
+    Returns None when the invocation left no recognizable output file.
+    """
+    by_position: Dict[int, List[Dict[str, Any]]] = {pos: [] for pos in range(1, len(pages) + 1)}
+    tsv = Path(f"{output_base}.tsv")
+    hocr = Path(f"{output_base}.hocr")
+    if tsv.exists():
+        with tsv.open(encoding="utf-8") as fh:
+            for page_num, seg in iter_tesseract_tsv(fh, pages):
+                by_position.setdefault(page_num, []).append(seg)
+    elif hocr.exists() and len(pages) == 1:
+        by_position[1] = list(iter_segments_file(hocr, pages[0]))
+    elif output_json.exists():
+        data = json.loads(output_json.read_text(encoding="utf-8"))
+        by_position[1] = list(iter_json_output(data, pages[0] if pages else 1))
+    else:
+        return None
+    return by_position
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Stream OCR provider outputs into segment JSONL")
+    parser.add_argument("inputs", type=Path, nargs="+", help="Tesseract .tsv/.hocr, easyocr/paddleocr .json or .jsonl")
+    parser.add_argument("--output", type=Path, default=Path("logs/ocr/segments.jsonl"))
+    args = parser.parse_args()
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    count = 0
+    with args.output.open("w", encoding="utf-8") as out:
+        for path in args.inputs:
+            for seg in iter_segments_file(path):
+                out.write(json.dumps(seg, ensure_ascii=False) + "\n")
+                count += 1
+
+    print(json.dumps({"status": "PASS", "files": len(args.inputs), "segments": count, "output": str(args.output)}))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(stage_profile.run(main))
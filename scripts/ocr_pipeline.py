@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""Pipelined OCR -> routing -> translation submission over bounded queues (T06.2/T06.3)."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import queue
+import shlex
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from batch_translation_payloads import pack_batches, unpack_batch
+from execute_with_resilience import RETRYABLE_CLASSES, classify_error
+from glossary_matcher import load_glossary
+from ocr_adapter import input_pages, read_inputs_list, run_adapter
+from route_ocr_segments import route_segments
+import stage_profile
+import tracing
+from translation_memory import fan_out, load_memory, record_translations, save_memory
+
+
+_DONE = object()
+
+
+def _load(path: Path) -> Any:
+    return json.loads(path.read_text())
+
+
+def _read_segments(path: str | None) -> List[Dict[str, Any]]:
+    if not path or not Path(path).exists():
+        return []
+    with open(path, encoding="utf-8") as fh:
+        return [json.loads(line) for line in fh if line.strip()]
+
+
+class StageStats:
+    """Thread-safe busy-time and item counters for one stage."""
+
+    def __init__(self, name: str, workers: int) -> None:
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.busy_s = 0.0
+        self.errors: List[str] = []
+        self._lock = threading.Lock()
+
+    def add(self, elapsed: float) -> None:
+        with self._lock:
+            self.items += 1
+            self.busy_s += elapsed
+
+    def fail(self, exc: BaseException) -> None:
+        with self._lock:
+            self.errors.append(f"{type(exc).__name__}: {exc}")
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "items": self.items,
+            "busy_s": round(self.busy_s, 3),
+            "errors": len(self.errors),
+        }
+
+
+def _run_stage(
+    inbox: "queue.Queue[Any]",
+    outbox: "queue.Queue[Any] | None",
+    workers: int,
+    handler: Callable[[Any], Any],
+    stats: StageStats,
+) -> List[threading.Thread]:
+    """Start `workers` threads draining `inbox`; the last worker to finish forwards the sentinel."""
+    remaining = [workers]
+    lock = threading.Lock()
+
+    def worker() -> None:
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                inbox.put(_DONE)
+                break
+            started = time.perf_counter()
+            try:
+                out = handler(item)
+            except Exception as exc:  # keep the pipeline draining; the error is reported in stats
+                stats.fail(exc)
+                out = None
+            stats.add(time.perf_counter() - started)
+            if outbox is not None and out is not None:
+                outbox.put(out)
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last and outbox is not None:
+            outbox.put(_DONE)
+
+    threads = [threading.Thread(target=worker, daemon=True, name=f"{stats.name}-{n}") for n in range(workers)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def _submit_batch(
+    batch: Dict[str, Any], translate_cmd: str | None, outbox_dir: Path, max_attempts: int, base_delay_s: float
+) -> Dict[str, Any]:
+    if not translate_cmd:
+        outbox_dir.mkdir(parents=True, exist_ok=True)
+        (outbox_dir / f"{batch['batch_id']}.json").write_text(json.dumps(batch, ensure_ascii=False, indent=2) + "\n")
+        return {"batch_id": batch["batch_id"], "status": "submitted", "rows": []}
+
+    argv = shlex.split(translate_cmd)
+    last: Dict[str, Any] = {}
+    for attempt in range(1, max_attempts + 1):
+        proc = subprocess.run(argv, input=json.dumps(batch, ensure_ascii=False), capture_output=True, text=True, check=False)
+        if proc.returncode == 0:
+            try:
+                response = json.loads(proc.stdout)
+                items = response.get("items", []) if isinstance(response, dict) else response
+                return {"batch_id": batch["batch_id"], "status": "translated", "rows": unpack_batch(batch, items)}
+            except ValueError as exc:
+                return {"batch_id": batch["batch_id"], "status": "failed", "error_class": "validation_error", "reason": str(exc)}
+        err_class = classify_error(proc.returncode, proc.stderr)
+        last = {"batch_id": batch["batch_id"], "status": "failed", "error_class": err_class, "attempts": attempt}
+        if err_class not in RETRYABLE_CLASSES or attempt == max_attempts:
+            break
+        time.sleep(base_delay_s * (2 ** (attempt - 1)))
+    return last
+
+
+@tracing.traced()
+def run_pipeline(args: argparse.Namespace, inputs: List[Path]) -> Dict[str, Any]:
+    ocr_cfg = _load(args.ocr_config)
+    service_cfg = _load(args.services_config)
+    provider = args.provider or ocr_cfg.get("default_provider", "tesseract")
+    cache_dir = None if args.no_cache else Path(ocr_cfg.get("ocr_cache", {}).get("cache_dir", "logs/cache/ocr"))
+    memory = load_memory(args.memory_path)
+    glossary = None
+    if args.glossary_path and Path(args.glossary_path).is_file():
+        glossary = load_glossary(args.glossary_path)
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+
+    pages_q: "queue.Queue[Any]" = queue.Queue()
+    ocr_q: "queue.Queue[Any]" = queue.Queue(maxsize=args.queue_size)
+    route_q: "queue.Queue[Any]" = queue.Queue(maxsize=args.queue_size)
+    result_q: "queue.Queue[Any]" = queue.Queue(maxsize=args.queue_size)
+
+    stats = {
+        "ocr": StageStats("ocr", args.ocr_workers),
+        "route": StageStats("route", 1),
+        "translate": StageStats("translate", args.translate_workers),
+    }
+    submitted: Dict[str, str] = {}
+    duplicates: Dict[str, List[str]] = {}
+    memory_hits: List[Dict[str, Any]] = []
+    warnings: List[Dict[str, Any]] = []
+    ocr_failures: List[Dict[str, Any]] = []
+    routed_payloads: List[Dict[str, Any]] = []
+
+    def ocr_page(item: Tuple[Path, int]) -> Dict[str, Any]:
+        path, page = item
+        res = run_adapter(path, provider, ocr_cfg, args.output_dir, args.dry_run, cache_dir, page=page, qualified=True)
+        if res.get("status") != "PASS":
+            ocr_failures.append({"input": str(path), "reason": res.get("reason")})
+        return {"page": page, "segments": _read_segments(res.get("segments_out"))}
+
+    def route_page(item: Dict[str, Any]) -> Dict[str, Any]:
+        routed = route_segments(
+            segments=item["segments"],
+            service_cfg=service_cfg,
+            run_id=args.run_id,
+            file_id=args.file_id,
+            service=args.service,
+            prompt_path=args.prompt_path,
+            glossary_path=args.glossary_path,
+            primary_font=args.primary_font,
+            low_conf_threshold=args.low_conf_threshold,
+            memory=memory,
+            glossary=glossary,
+        )
+        fresh: List[Dict[str, Any]] = []
+        page_dups = dict(routed["fanout"]["duplicates"])
+        for payload in routed["translation_payloads"]:
+            seg_id = payload["segment_id"]
+            first = submitted.setdefault(payload["memory_key"], seg_id)
+            if first == seg_id:
+                fresh.append(payload)
+                routed_payloads.append(payload)
+            else:
+                # Submitted on an earlier page: this payload and its in-page repeats follow that one.
+                duplicates.setdefault(first, []).extend([seg_id] + page_dups.pop(seg_id, []))
+        for first, dups in page_dups.items():
+            duplicates.setdefault(first, []).extend(dups)
+        memory_hits.extend(routed["fanout"]["memory_hits"])
+        warnings.extend(routed["warnings"])
+        return {"page": item["page"], "payloads": fresh}
+
+    def translate_page(item: Dict[str, Any]) -> Dict[str, Any]:
+        outcomes = []
+        for batch in pack_batches(item["payloads"], service_cfg):
+            batch["batch_id"] = f"p{item['page']:05d}_{batch['batch_id']}"
+            outcomes.append(
+                _submit_batch(batch, args.translate_cmd, args.outbox_dir, args.max_attempts, args.base_delay_s)
+            )
+        return {"page": item["page"], "outcomes": outcomes, "done_at": time.perf_counter()}
+
+    started = time.perf_counter()
+    threads = _run_stage(pages_q, ocr_q, args.ocr_workers, ocr_page, stats["ocr"])
+    threads += _run_stage(ocr_q, route_q, 1, route_page, stats["route"])
+    threads += _run_stage(route_q, result_q, args.translate_workers, translate_page, stats["translate"])
+    for item in zip(inputs, input_pages(inputs)):
+        pages_q.put(item)
+    pages_q.put(_DONE)
+
+    translations: Dict[str, str] = {}
+    failed_batches: List[Dict[str, Any]] = []
+    batches = 0
+    first_page_s = None
+    args.translations_out.parent.mkdir(parents=True, exist_ok=True)
+    with args.translations_out.open("w", encoding="utf-8") as out:
+        while True:
+            item = result_q.get()
+            if item is _DONE:
+                break
+            if first_page_s is None:
+                first_page_s = item["done_at"] - started
+            for outcome in item["outcomes"]:
+                batches += 1
+                if outcome["status"] == "failed":
+                    failed_batches.append(outcome)
+                for row in outcome.get("rows", []):
+                    translations[row["segment_id"]] = row["translated_text"]
+                    out.write(json.dumps(row, ensure_ascii=False) + "\n")
+        for thread in threads:
+            thread.join()
+        # Deduplicated segments and memory hits are only complete once routing has finished.
+        expanded = fan_out(translations, {"duplicates": duplicates, "memory_hits": memory_hits})
+        for seg_id, text in expanded.items():
+            if seg_id not in translations:
+                out.write(json.dumps({"segment_id": seg_id, "translated_text": text}, ensure_ascii=False) + "\n")
+
+    stored = 0
+    if args.memory_path and translations:
+        stored = record_translations(memory, routed_payloads, translations)
+        save_memory(args.memory_path, memory)
+
+    stage_errors = {name: stage.errors for name, stage in stats.items() if stage.errors}
+    return {
+        "status": "PASS" if not (failed_batches or ocr_failures or stage_errors) else "FAIL",
+        "mode": "pipeline",
+        "provider": provider,
+        "service": args.service,
+        "dry_run": args.dry_run,
+        "summary": {
+            "pages": len(inputs),
+            "ocr_failures": len(ocr_failures),
+            "payloads_submitted": len(submitted),
+            "deduplicated_segments": sum(len(v) for v in duplicates.values()),
+            "memory_hits": len(memory_hits),
+            "batches": batches,
+            "failed_batches": len(failed_batches),
+            "translated_segments": len(expanded),
+            "memory_stored": stored,
+            "low_confidence_segments": len(warnings),
+            "first_page_s": round(first_page_s, 3) if first_page_s is not None else None,
+            "wall_s": round(time.perf_counter() - started, 3),
+            "queue_size": args.queue_size,
+            "stages": {name: stage.as_dict() for name, stage in stats.items()},
+        },
+        "ocr_failures": ocr_failures,
+        "failed_batches": failed_batches,
+        "stage_errors": stage_errors,
+        "fanout": {"duplicates": duplicates, "memory_hits": memory_hits},
+        "warnings": warnings,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run OCR, routing and translation submission as a pipeline")
+    parser.add_argument("input", type=Path, nargs="*", help="Page image path(s), in page order")
+    parser.add_argument("--inputs-list", type=Path, help="Newline list or JSON array of page images")
+    parser.add_argument("--run-id", required=True)
+    parser.add_argument("--file-id", required=True)
+    parser.add_argument("--provider", help="OCR provider key (default from OCR config)")
+    parser.add_argument("--ocr-config", type=Path, default=Path("configs/ocr-tools.json"))
+    parser.add_argument("--services-config", type=Path, default=Path("configs/services.json"))
+    parser.add_argument("--service", default="openai")
+    parser.add_argument("--prompt-path")
+    parser.add_argument("--glossary-path")
+    parser.add_argument("--primary-font")
+    parser.add_argument("--memory-path", type=Path)
+    parser.add_argument("--low-conf-threshold", type=float, default=0.80)
+    parser.add_argument("--translate-cmd", help="Command reading a batch JSON on stdin and printing response items")
+    parser.add_argument("--outbox-dir", type=Path, default=Path("logs/ocr/outbox"))
+    parser.add_argument("--ocr-workers", type=int, default=2)
+    parser.add_argument("--translate-workers", type=int, default=2)
+    parser.add_argument("--queue-size", type=int, default=4, help="Bound for each inter-stage queue")
+    parser.add_argument("--max-attempts", type=int, default=3)
+    parser.add_argument("--base-delay-s", type=float, default=0.1)
+    parser.add_argument("--output-dir", type=Path, default=Path("logs/ocr"))
+    parser.add_argument("--translations-out", type=Path, default=Path("logs/ocr/translations.jsonl"))
+    parser.add_argument("--result-out", type=Path, default=Path("logs/ocr/pipeline-result.json"))
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    inputs = list(args.input) + (read_inputs_list(args.inputs_list) if args.inputs_list else [])
+    if not inputs:
+        parser.error("at least one input or --inputs-list is required")
+    args.ocr_workers = max(1, args.ocr_workers)
+    args.translate_workers = max(1, args.translate_workers)
+    args.queue_size = max(1, args.queue_size)
+    args.max_attempts = max(1, args.max_attempts)
+
+    result = run_pipeline(args, inputs)
+    args.result_out.parent.mkdir(parents=True, exist_ok=True)
+    args.result_out.write_text(json.dumps(result, ensure_ascii=False, indent=2) + "\n")
+    print(json.dumps({"status": result["status"], "summary": result["summary"], "result": str(args.result_out)}))
+    return 0 if result["status"] == "PASS" else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(stage_profile.run(main))
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""Page-range interval sets shared by chunking, rerun and command building (T03/T04.4)."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from typing import List, Tuple
+
+import stage_profile
+
+
+OPEN_END = sys.maxsize
+Interval = Tuple[int, int]
+
+
+def normalize(intervals: List[Interval]) -> List[Interval]:
+    """Sort and merge overlapping or adjacent inclusive intervals."""
+    merged: List[Interval] = []
+    for start, end in sorted(intervals):
+        if start > end:
+            continue
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def parse(spec: str | None) -> List[Interval]:
+    """Parse `all`, `5`, `5-10`, `5-` and comma-separated mixes into a normalized interval list."""
+    text = (spec or "all").strip().lower()
+    if text in ("", "all"):
+        return [(1, OPEN_END)]
+
+    intervals: List[Interval] = []
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            lo, hi = part.split("-", 1)
+            start = int(lo) if lo.strip() else 1
+            end = int(hi) if hi.strip() else OPEN_END
+        else:
+            start = end = int(part)
+        if start < 1 or end < start:
+            raise ValueError(f"Invalid page range segment: {part!r}")
+        intervals.append((start, end))
+    if not intervals:
+        raise ValueError(f"Empty page range: {spec!r}")
+    return normalize(intervals)
+
+
+def format_ranges(intervals: List[Interval]) -> str:
+    if intervals == [(1, OPEN_END)]:
+        return "all"
+    parts: List[str] = []
+    for start, end in intervals:
+        if end == OPEN_END:
+            parts.append(f"{start}-")
+        elif start == end:
+            parts.append(str(start))
+        else:
+            parts.append(f"{start}-{end}")
+    return ",".join(parts)
+
+
+def canonical(spec: str | None) -> str:
+    return format_ranges(parse(spec))
+
+
+def union(a: List[Interval], b: List[Interval]) -> List[Interval]:
+    return normalize(list(a) + list(b))
+
+
+def intersect(a: List[Interval], b: List[Interval]) -> List[Interval]:
+    out: List[Interval] = []
+    i = j = 0
+    while i < len(a) and j < len(b):
+        start = max(a[i][0], b[j][0])
+        end = min(a[i][1], b[j][1])
+        if start <= end:
+            out.append((start, end))
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return out
+
+
+def subtract(a: List[Interval], b: List[Interval]) -> List[Interval]:
+    out: List[Interval] = []
+    j = 0
+    for start, end in a:
+        while j < len(b) and b[j][1] < start:
+            j += 1
+        k = j
+        cursor = start
+        while k < len(b) and b[k][0] <= end:
+            if b[k][0] > cursor:
+                out.append((cursor, b[k][0] - 1))
+            cursor = max(cursor, b[k][1] + 1)
+            k += 1
+        if cursor <= end:
+            out.append((cursor, end))
+    return out
+
+
+def clamp(intervals: List[Interval], total_pages: int) -> List[Interval]:
+    return intersect(intervals, [(1, total_pages)]) if total_pages > 0 else []
+
+
+def chunk(intervals: List[Interval], max_pages: int) -> List[List[Interval]]:
+    """Split a bounded interval set into consecutive parts of at most `max_pages` pages."""
+    parts: List[List[Interval]] = []
+    current: List[Interval] = []
+    room = max_pages
+    for start, end in intervals:
+        if end == OPEN_END:
+            raise ValueError("Cannot chunk an open-ended page range; clamp it to the page count first")
+        while start <= end:
+            take = min(end, start + room - 1)
+            current.append((start, take))
+            room -= take - start + 1
+            start = take + 1
+            if room == 0:
+                parts.append(current)
+                current, room = [], max_pages
+    if current:
+        parts.append(current)
+    return parts
+
+
+def page_count(intervals: List[Interval]) -> int | None:
+    if any(end == OPEN_END for _, end in intervals):
+        return None
+    return sum(end - start + 1 for start, end in intervals)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Normalize and combine page-range specs")
+    parser.add_argument("op", choices=["normalize", "union", "intersect", "subtract"])
+    parser.add_argument("ranges", nargs="+", help="Page range specs, e.g. 1-5,7 or all")
+    args = parser.parse_args()
+
+    result = parse(args.ranges[0])
+    for spec in args.ranges[1:]:
+        other = parse(spec)
+        if args.op == "union":
+            result = union(result, other)
+        elif args.op == "intersect":
+            result = intersect(result, other)
+        elif args.op == "subtract":
+            result = subtract(result, other)
+    print(json.dumps({"op": args.op, "page_range": format_ranges(result), "pages": page_count(result)}))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(stage_profile.run(main))
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Compact shared-header storage for OCR translation payloads (T06.3)."""
+
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List
+
+import stage_profile
+
+
+FORMAT_VERSION = 1
+SHARED_FIELDS = (
+    "run_id",
+    "file_id",
+    "lang_in",
+    "lang_out",
+    "service",
+    "fallback_order",
+    "prompt_path",
+    "glossary_path",
+    "primary_font",
+    "translation_controls",
+)
+HEADER_NAME = "header.json"
+ROWS_NAME = "rows.jsonl"
+
+
+def compact_dir(path: Path) -> Path:
+    """`logs/ocr/translation-payloads.json` -> `logs/ocr/translation-payloads/` for compact output."""
+    return path.with_suffix("") if path.suffix == ".json" else path
+
+
+def write_compact(directory: Path, payloads: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Write one run-level header plus one JSONL row per payload.
+
+    Rows hold only fields that vary per segment. A payload whose shared field differs from the
+    header keeps that value in the row, so reconstruction is always exact.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    header: Dict[str, Any] | None = None
+    count = 0
+    with (directory / ROWS_NAME).open("w", encoding="utf-8") as rows:
+        for payload in payloads:
+            if header is None:
+                header = {key: payload.get(key) for key in SHARED_FIELDS}
+            row = {
+                key: value
+                for key, value in payload.items()
+                if key not in SHARED_FIELDS or value != header.get(key)
+            }
+            rows.write(json.dumps(row, ensure_ascii=False, separators=(",", ":")) + "\n")
+            count += 1
+
+    meta = {"format": "compact-payloads", "version": FORMAT_VERSION, "rows": count, "shared": header or {}}
+    (directory / HEADER_NAME).write_text(json.dumps(meta, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    return meta
+
+
+def iter_payloads(path: Path) -> Iterator[Dict[str, Any]]:
+    """Yield full payload dicts from a compact directory (lazily) or a legacy JSON array."""
+    directory = compact_dir(path)
+    header_path = directory / HEADER_NAME
+    if not path.is_file() and header_path.exists():
+        shared = json.loads(header_path.read_text(encoding="utf-8")).get("shared", {})
+        with (directory / ROWS_NAME).open(encoding="utf-8") as rows:
+            for line in rows:
+                if line.strip():
+                    payload = dict(shared)
+                    payload.update(json.loads(line))
+                    yield payload
+        return
+
+    data = json.loads(path.read_text(encoding="utf-8"))
+    yield from [data] if isinstance(data, dict) else data
+
+
+def load_payloads(path: Path) -> List[Dict[str, Any]]:
+    return list(iter_payloads(path))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Convert translation payloads between JSON and compact format")
+    parser.add_argument("source", type=Path, help="Payload JSON array or compact payload directory")
+    parser.add_argument("--to", choices=["compact", "json"], required=True)
+    parser.add_argument("--output", type=Path, required=True)
+    args = parser.parse_args()
+
+    if args.to == "compact":
+        meta = write_compact(compact_dir(args.output), iter_payloads(args.source))
+        print(json.dumps({"status": "PASS", "rows": meta["rows"], "output": str(compact_dir(args.output))}))
+        return 0
+
+    payloads = load_payloads(args.source)
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(payloads, indent=2) + "\n")
+    print(json.dumps({"status": "PASS", "rows": len(payloads), "output": str(args.output)}))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(stage_profile.run(main))
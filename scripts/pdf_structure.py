@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+"""Lightweight structural inspection of PDF files via mmap (T05.2/T05.3).
+
+Only the header, the tail (startxref/%%EOF), the cross-reference sections and the few objects
+needed to reach `/Root -> /Pages -> /Count` are read; page content is never parsed. PDF 1.5+
+cross-reference streams (`/W`, `/Index`, PNG predictors) and object streams are decoded, so the
+page tree is reachable even when it lives inside a compressed object stream.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import re
+import tempfile
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import stage_profile
+
+
+TAIL_BYTES = 2048
+MAX_XREF_SECTIONS = 64
+MAX_REPORTED_ERRORS = 5
+
+STARTXREF_RE = re.compile(rb"startxref\s+(\d+)")
+OBJ_HEADER_RE = re.compile(rb"\s*(\d+)\s+(\d+)\s+obj\b")
+SUBSECTION_RE = re.compile(rb"\s*(\d+)\s+(\d+)[ \t]*\r?\n")
+ENTRY_RE = re.compile(rb"\s*(\d{10})\s(\d{5})\s([nf])")
+ROOT_RE = re.compile(rb"/Root\s+(\d+)\s+(\d+)\s+R")
+PAGES_REF_RE = re.compile(rb"/Pages\s+(\d+)\s+(\d+)\s+R")
+PREV_RE = re.compile(rb"/Prev\s+(\d+)")
+SIZE_RE = re.compile(rb"/Size\s+(\d+)")
+COUNT_RE = re.compile(rb"/Count\s+(\d+)")
+TYPE_PAGES_RE = re.compile(rb"/Type\s*/Pages\b")
+XREFSTM_RE = re.compile(rb"/XRefStm\s+(\d+)")
+W_RE = re.compile(rb"/W\s*\[\s*(\d+)\s+(\d+)\s+(\d+)\s*\]")
+INDEX_RE = re.compile(rb"/Index\s*\[([\d\s]*)\]")
+LENGTH_RE = re.compile(rb"/Length\s+(\d+)(?!\s+\d+\s+R)")
+FILTER_RE = re.compile(rb"/Filter\s*\[?\s*/(\w+)")
+PREDICTOR_RE = re.compile(rb"/Predictor\s+(\d+)")
+COLUMNS_RE = re.compile(rb"/Columns\s+(\d+)")
+N_RE = re.compile(rb"/N\s+(\d+)")
+FIRST_RE = re.compile(rb"/First\s+(\d+)")
+STREAM_RE = re.compile(rb"stream\r?\n")
+
+
+def content_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _object_slice(mm: mmap.mmap, offset: int) -> bytes | None:
+    end = mm.find(b"endobj", offset)
+    if end < 0:
+        return None
+    return mm[offset:end]
+
+
+def _read_xref_table(mm: mmap.mmap, offset: int, entries: Dict[int, int]) -> Tuple[bytes, List[str]]:
+    """Parse one classic `xref` section into `entries` (older sections never override newer ones)."""
+    errors: List[str] = []
+    pos = offset + 4
+    size = len(mm)
+    while True:
+        sub = SUBSECTION_RE.match(mm, pos)
+        if not sub:
+            break
+        start, count = int(sub.group(1)), int(sub.group(2))
+        pos = sub.end()
+        for num in range(start, start + count):
+            entry = ENTRY_RE.match(mm, pos)
+            if not entry:
+                errors.append(f"xref_entry_unreadable:{num}")
+                return b"", errors
+            pos = entry.end()
+            if entry.group(3) == b"n" and num not in entries:
+                entries[num] = int(entry.group(1))
+    trailer_at = mm.find(b"trailer", pos, min(size, pos + 64))
+    if trailer_at < 0:
+        errors.append("trailer_missing")
+        return b"", errors
+    end = mm.find(b"startxref", trailer_at)
+    return mm[trailer_at : end if end > 0 else size], errors
+
+
+def _stream(mm: mmap.mmap, offset: int) -> Tuple[bytes, bytes | None]:
+    """(dictionary, decoded data) of the stream object at `offset`; data is None when undecodable."""
+    start = mm.find(b"stream", offset, min(len(mm), offset + 4096))
+    if start < 0:
+        return b"", None
+    head = mm[offset:start]
+    body = STREAM_RE.match(mm, start)
+    if body is None:
+        return head, None
+    length = LENGTH_RE.search(head)
+    if length:
+        raw = mm[body.end() : body.end() + int(length.group(1))]
+    else:  # indirect /Length: fall back to the endstream marker
+        end = mm.find(b"endstream", body.end())
+        raw = mm[body.end() : end].rstrip(b"\r\n") if end > 0 else b""
+    filt = FILTER_RE.search(head)
+    if filt:
+        if filt.group(1) != b"FlateDecode":
+            return head, None
+        try:
+            raw = zlib.decompressobj().decompress(raw)
+        except zlib.error:
+            return head, None
+    predictor = PREDICTOR_RE.search(head)
+    if predictor and int(predictor.group(1)) >= 10:
+        columns = COLUMNS_RE.search(head)
+        raw = _png_unpredict(raw, int(columns.group(1)) if columns else 1)
+    return head, raw
+
+
+def _png_unpredict(data: bytes, columns: int) -> bytes | None:
+    """Undo PNG row predictors (one filter byte per row, 1 byte per pixel) as used by xref streams."""
+    row_len = columns + 1
+    if columns <= 0 or len(data) % row_len:
+        return None
+    out = bytearray()
+    prev = bytearray(columns)
+    for pos in range(0, len(data), row_len):
+        kind, row = data[pos], bytearray(data[pos + 1 : pos + row_len])
+        for i in range(columns):
+            left = row[i - 1] if i else 0
+            up = prev[i]
+            if kind == 1:
+                row[i] = (row[i] + left) & 0xFF
+            elif kind == 2:
+                row[i] = (row[i] + up) & 0xFF
+            elif kind == 3:
+                row[i] = (row[i] + (left + up) // 2) & 0xFF
+            elif kind == 4:
+                corner = prev[i - 1] if i else 0
+                p = left + up - corner
+                pa, pb, pc = abs(p - left), abs(p - up), abs(p - corner)
+                row[i] = (row[i] + (left if pa <= pb and pa <= pc else up if pb <= pc else corner)) & 0xFF
+            elif kind != 0:
+                return None
+        out += row
+        prev = row
+    return bytes(out)
+
+
+def _read_xref_stream(
+    mm: mmap.mmap, offset: int, entries: Dict[int, int], compressed: Dict[int, Tuple[int, int]]
+) -> Tuple[bytes, List[str]]:
+    """Parse one cross-reference stream into `entries` (offsets) and `compressed` (objstm, index)."""
+    head, data = _stream(mm, offset)
+    if b"/XRef" not in head:
+        return b"", ["startxref_not_at_xref"]
+    widths = W_RE.search(head)
+    declared = SIZE_RE.search(head)
+    if data is None or not widths or not declared:
+        return head, ["xref_stream_undecodable"]
+    w = [int(widths.group(i)) for i in (1, 2, 3)]
+    row = sum(w)
+    index = INDEX_RE.search(head)
+    numbers = [int(n) for n in index.group(1).split()] if index else [0, int(declared.group(1))]
+    if row == 0 or len(numbers) % 2:
+        return head, ["xref_stream_bad_w_or_index"]
+    expected = sum(numbers[1::2])
+    if len(data) < expected * row:
+        return head, ["xref_stream_truncated"]
+
+    def field(pos: int, width: int, default: int) -> int:
+        return int.from_bytes(data[pos : pos + width], "big") if width else default
+
+    pos = 0
+    for start, count in zip(numbers[0::2], numbers[1::2]):
+        for num in range(start, start + count):
+            kind = field(pos, w[0], 1)
+            second = field(pos + w[0], w[1], 0)
+            third = field(pos + w[0] + w[1], w[2], 0)
+            pos += row
+            if num in entries or num in compressed:
+                continue  # newer sections win
+            if kind == 1:
+                entries[num] = second
+            elif kind == 2:
+                compressed[num] = (second, third)
+    return head, []
+
+
+def _check_compressed(entries: Dict[int, int], compressed: Dict[int, Tuple[int, int]]) -> List[str]:
+    """Every compressed object must live in an object stream that has a direct xref entry."""
+    errors = [f"xref_objstm_missing:{num}" for num, (stream, _) in compressed.items() if stream not in entries]
+    return errors[:MAX_REPORTED_ERRORS]
+
+
+def _check_entries(mm: mmap.mmap, entries: Dict[int, int]) -> List[str]:
+    errors: List[str] = []
+    size = len(mm)
+    for num, offset in entries.items():
+        if num == 0:
+            continue
+        header = OBJ_HEADER_RE.match(mm, offset) if offset < size else None
+        if header is None or int(header.group(1)) != num:
+            errors.append(f"xref_offset_mismatch:{num}")
+            if len(errors) >= MAX_REPORTED_ERRORS:
+                break
+    return errors
+
+
+class _Objects:
+    """Resolve object bodies by number, directly or from (decoded, memoized) object streams."""
+
+    def __init__(self, mm: mmap.mmap, entries: Dict[int, int], compressed: Dict[int, Tuple[int, int]]) -> None:
+        self.mm = mm
+        self.entries = entries
+        self.compressed = compressed
+        self._streams: Dict[int, Dict[int, bytes] | None] = {}
+
+    def get(self, num: int) -> bytes | None:
+        if num in self.entries:
+            return _object_slice(self.mm, self.entries[num])
+        if num in self.compressed:
+            members = self._object_stream(self.compressed[num][0])
+            return members.get(num) if members else None
+        return None
+
+    def _object_stream(self, num: int) -> Dict[int, bytes] | None:
+        if num not in self._streams:
+            self._streams[num] = self._decode(num)
+        return self._streams[num]
+
+    def _decode(self, num: int) -> Dict[int, bytes] | None:
+        if num not in self.entries:
+            return None
+        head, data = _stream(self.mm, self.entries[num])
+        count, first = N_RE.search(head), FIRST_RE.search(head)
+        if data is None or not count or not first:
+            return None
+        first_at = int(first.group(1))
+        pairs = [int(n) for n in data[:first_at].split()]
+        if len(pairs) < 2 * int(count.group(1)):
+            return None
+        numbers, offsets = pairs[0::2], [first_at + off for off in pairs[1::2]]
+        ends = offsets[1:] + [len(data)]
+        return {n: data[start:end] for n, start, end in zip(numbers, offsets, ends)}
+
+
+def _count_from_root(objects: _Objects, root: int) -> int | None:
+    root_obj = objects.get(root)
+    ref = PAGES_REF_RE.search(root_obj or b"")
+    if not ref:
+        return None
+    pages_obj = objects.get(int(ref.group(1)))
+    count = COUNT_RE.search(pages_obj or b"")
+    return int(count.group(1)) if count else None
+
+
+def _count_by_scan(mm: mmap.mmap) -> int | None:
+    """Fallback for xref streams: the root page tree node carries the largest /Count."""
+    best = None
+    for match in TYPE_PAGES_RE.finditer(mm):
+        start = mm.rfind(b"obj", 0, match.start())
+        end = mm.find(b"endobj", match.end())
+        if start < 0 or end < 0:
+            continue
+        count = COUNT_RE.search(mm, start, end)
+        if count:
+            best = max(best or 0, int(count.group(1)))
+    return best
+
+
+def inspect_pdf(path: Path) -> Dict[str, Any]:
+    """Return structural facts for one file; never raises for malformed PDFs."""
+    info: Dict[str, Any] = {
+        "bytes": 0,
+        "header_ok": False,
+        "eof_ok": False,
+        "startxref": None,
+        "xref_kind": None,
+        "xref_ok": False,
+        "xref_errors": [],
+        "trailer_ok": False,
+        "page_count": None,
+        "page_count_method": None,
+    }
+    try:
+        size = path.stat().st_size
+    except OSError:
+        info["xref_errors"].append("unreadable")
+        return info
+    info["bytes"] = size
+    if size == 0:
+        return info
+
+    with path.open("rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        info["header_ok"] = mm[:5] == b"%PDF-"
+        tail_start = max(0, size - TAIL_BYTES)
+        tail = mm[tail_start:]
+        info["eof_ok"] = b"%%EOF" in tail[-1024:]
+        marks = list(STARTXREF_RE.finditer(tail))
+        if not marks:
+            info["xref_errors"].append("startxref_missing")
+            info["page_count"] = _count_by_scan(mm)
+            info["page_count_method"] = "scan" if info["page_count"] is not None else None
+            return info
+
+        offset = int(marks[-1].group(1))
+        info["startxref"] = offset
+        entries: Dict[int, int] = {}
+        compressed: Dict[int, Tuple[int, int]] = {}
+        errors: List[str] = []
+        root = None
+        declared_size = None
+        seen = set()
+        while offset is not None and offset not in seen and len(seen) < MAX_XREF_SECTIONS:
+            seen.add(offset)
+            if offset >= size:
+                errors.append("startxref_out_of_range")
+                break
+            if mm[offset : offset + 4] == b"xref":
+                info["xref_kind"] = info["xref_kind"] or "table"
+                trailer, section_errors = _read_xref_table(mm, offset, entries)
+                errors.extend(section_errors)
+                hybrid = XREFSTM_RE.search(trailer)
+                if hybrid and int(hybrid.group(1)) < size and OBJ_HEADER_RE.match(mm, int(hybrid.group(1))):
+                    errors.extend(_read_xref_stream(mm, int(hybrid.group(1)), entries, compressed)[1])
+            else:
+                if OBJ_HEADER_RE.match(mm, offset) is None:
+                    errors.append("startxref_not_at_xref")
+                    break
+                trailer, section_errors = _read_xref_stream(mm, offset, entries, compressed)
+                errors.extend(section_errors)
+                if "startxref_not_at_xref" in section_errors:
+                    break
+                info["xref_kind"] = info["xref_kind"] or "stream"
+            if not trailer:
+                break
+            info["trailer_ok"] = True
+            if root is None:
+                ref = ROOT_RE.search(trailer)
+                root = int(ref.group(1)) if ref else None
+            if declared_size is None:
+                found = SIZE_RE.search(trailer)
+                declared_size = int(found.group(1)) if found else None
+            prev = PREV_RE.search(trailer)
+            offset = int(prev.group(1)) if prev else None
+
+        if info["trailer_ok"] and root is None:
+            errors.append("trailer_root_missing")
+        numbered = list(entries) + list(compressed)
+        if declared_size is not None and numbered and max(numbered) >= declared_size:
+            errors.append("xref_size_mismatch")
+        errors.extend(_check_entries(mm, entries))
+        errors.extend(_check_compressed(entries, compressed))
+        info["xref_errors"] = errors[:MAX_REPORTED_ERRORS]
+        info["xref_ok"] = info["trailer_ok"] and not errors
+
+        count = _count_from_root(_Objects(mm, entries, compressed), root) if root is not None else None
+        if count is not None:
+            info["page_count"], info["page_count_method"] = count, "xref"
+        else:
+            info["page_count"] = _count_by_scan(mm)
+            info["page_count_method"] = "scan" if info["page_count"] is not None else None
+    return info
+
+
+def structure_reasons(info: Dict[str, Any]) -> List[str]:
+    reasons: List[str] = []
+    if not info.get("eof_ok"):
+        reasons.append("output_missing_eof_marker")
+    if info.get("startxref") is None:
+        reasons.append("output_missing_startxref")
+    elif not info.get("xref_ok"):
+        reasons.append("output_xref_inconsistent")
+    if info.get("page_count") is None:
+        reasons.append("output_page_count_unknown")
+    return reasons
+
+
+def _read_cached(path: Path) -> Dict[str, Any] | None:
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cached(path: Path, payload: Dict[str, Any]) -> None:
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", delete=False, dir=path.parent) as tmp:
+            tmp.write(json.dumps(payload) + "\n")
+        Path(tmp.name).replace(path)
+    except OSError:
+        pass
+
+
+def cached_inspect(path: Path, cache_dir: Path | None) -> Tuple[Dict[str, Any], bool]:
+    """inspect_pdf cached by (path, size, mtime), falling back to content hash; returns (info, cache_hit).
+
+    An unchanged file costs one `stat` and one small read. Only when size or mtime changed is the
+    file hashed, so an identical copy under another name or a touched file still reuses the result.
+    """
+    if cache_dir is None:
+        return inspect_pdf(path), False
+    try:
+        st = os.stat(path)
+    except OSError:
+        return inspect_pdf(path), False
+    stat_key = hashlib.sha256(f"{os.path.abspath(path)}\0{st.st_size}\0{st.st_mtime_ns}".encode("utf-8")).hexdigest()
+    stat_file = cache_dir / "by-stat" / stat_key[:2] / f"{stat_key}.json"
+    known = _read_cached(stat_file)
+    if known and "sha256" in known:
+        info = _read_cached(cache_dir / known["sha256"][:2] / f"{known['sha256']}.json")
+        if info is not None:
+            return info, True
+
+    try:
+        digest = content_hash(path)
+    except OSError:
+        return inspect_pdf(path), False
+    cache_file = cache_dir / digest[:2] / f"{digest}.json"
+    info = _read_cached(cache_file)
+    hit = info is not None
+    if info is None:
+        info = inspect_pdf(path)
+        info["sha256"] = digest
+        _write_cached(cache_file, info)
+    _write_cached(stat_file, {"sha256": digest})
+    return info, hit
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Inspect PDF structure (xref, trailer, page count)")
+    parser.add_argument("pdf", type=Path, nargs="+")
+    args = parser.parse_args()
+
+    results = {str(path): inspect_pdf(path) for path in args.pdf}
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(stage_profile.run(main))
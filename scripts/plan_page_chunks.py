@@ -8,17 +8,17 @@ import json
 from pathlib import Path
 from typing import Any, Dict, List
 
+import page_ranges
+import stage_profile
+import tracing
+
 
 def _chunks(total_pages: int, max_pages_per_part: int) -> List[str]:
-    ranges: List[str] = []
-    start = 1
-    while start <= total_pages:
-        end = min(total_pages, start + max_pages_per_part - 1)
-        ranges.append(f"{start}-{end}")
-        start = end + 1
-    return ranges
+    intervals = page_ranges.clamp(page_ranges.parse("all"), total_pages)
+    return [page_ranges.format_ranges(part) for part in page_ranges.chunk(intervals, max_pages_per_part)]
 
 
+@tracing.traced()
 def expand_jobs(
     jobs: List[Dict[str, Any]], page_counts: Dict[str, int], max_pages_per_part: int
 ) -> List[Dict[str, Any]]:
@@ -61,4 +61,4 @@ def main() -> int:
 
 
 if __name__ == "__main__":
-    raise SystemExit(main())
+    raise SystemExit(stage_profile.run(main))
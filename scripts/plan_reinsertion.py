@@ -5,69 +5,304 @@ from __future__ import annotations
 
 import argparse
 import json
+import math
+from collections import defaultdict
 from pathlib import Path
-from typing import Any, Dict, List
+from statistics import median
+from typing import Any, Dict, Iterator, List, Tuple
 
+import stage_profile
+import tracing
 
-def decide_mode(seg: Dict[str, Any], min_conf: float, max_expand_ratio: float) -> str:
-    confidence = float(seg.get("confidence", 0.0))
-    source_len = max(1, len(str(seg.get("source_text", ""))))
-    translated_len = len(str(seg.get("translated_text", "")))
-    expansion = translated_len / source_len
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; planning falls back to the per-segment rule
+    np = None
+
+
+Box = Tuple[float, float, float, float]
+
+
+def _bbox(seg: Dict[str, Any]) -> Box | None:
     bbox = seg.get("bbox") or []
-    bbox_ok = isinstance(bbox, list) and len(bbox) == 4
+    if not (isinstance(bbox, list) and len(bbox) == 4):
+        return None
+    try:
+        x0, y0, x1, y1 = map(float, bbox)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(x0 + y0 + x1 + y1):
+        return None  # NaN/inf from a broken OCR row: no usable position
+    return (min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+
+
+def _expansion(seg: Dict[str, Any]) -> float:
+    source_len = max(1, len(str(seg.get("source_text", ""))))
+    return len(str(seg.get("translated_text", ""))) / source_len
+
+
+def expanded_box(box: Box, expansion: float, margin: float) -> Box:
+    """Footprint of the translated text: same width, height grown by the expansion ratio, plus margin."""
+    x0, y0, x1, y1 = box
+    height = (y1 - y0) * max(1.0, expansion)
+    return (x0 - margin, y0 - margin, x1 + margin, y0 + height + margin)
+
+
+def _intersects(a: Box, b: Box) -> bool:
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+class PageGrid:
+    """Uniform-grid spatial index over one page's segment boxes.
+
+    Cell width and height follow the page's median box width and height separately, so wide text
+    lines give wide, short cells and a query touches a handful of cells; a page with thousands of
+    segments is checked in roughly linear time. The few boxes spanning more than `MAX_BOX_CELLS`
+    cells (page frames, stray giant boxes) are kept in a side list checked by every query instead
+    of being copied into every cell. Boxes must be finite (see `_bbox`).
+    """
 
-    if confidence >= min_conf and expansion <= max_expand_ratio and bbox_ok:
+    MAX_BOX_CELLS = 64
+
+    def __init__(self, boxes: List[Tuple[int, Box]]) -> None:
+        widths = [b[2] - b[0] for _, b in boxes]
+        heights = [b[3] - b[1] for _, b in boxes]
+        self.cell_w = max(1.0, 2 * median(widths)) if widths else 1.0
+        self.cell_h = max(1.0, 2 * median(heights)) if heights else 1.0
+        self.boxes = dict(boxes)
+        self.cells: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        self.large: List[int] = []
+        spans = []
+        for idx, box in boxes:
+            span = self._span(box)
+            if (span[2] - span[0] + 1) * (span[3] - span[1] + 1) > self.MAX_BOX_CELLS:
+                self.large.append(idx)
+            else:
+                spans.append((idx, span))
+        self.bounds = (
+            min((s[0] for _, s in spans), default=0),
+            min((s[1] for _, s in spans), default=0),
+            max((s[2] for _, s in spans), default=-1),
+            max((s[3] for _, s in spans), default=-1),
+        )
+        for idx, span in spans:
+            for key in self._keys(span):
+                self.cells[key].append(idx)
+
+    def _span(self, box: Box) -> Tuple[int, int, int, int]:
+        w, h = self.cell_w, self.cell_h
+        return (math.floor(box[0] / w), math.floor(box[1] / h), math.floor(box[2] / w), math.floor(box[3] / h))
+
+    def _keys(self, span: Tuple[int, int, int, int]) -> List[Tuple[int, int]]:
+        """Cells under a cell span, clipped to the occupied part of the grid."""
+        min_cx, min_cy, max_cx, max_cy = self.bounds
+        return [
+            (cx, cy)
+            for cx in range(max(min_cx, span[0]), min(max_cx, span[2]) + 1)
+            for cy in range(max(min_cy, span[1]), min(max_cy, span[3]) + 1)
+        ]
+
+    def query(self, box: Box, exclude: int) -> List[int]:
+        seen: set[int] = set()
+        hits: List[int] = []
+        for key in self._keys(self._span(box)):
+            for idx in self.cells.get(key, ()):
+                if idx == exclude or idx in seen:
+                    continue
+                seen.add(idx)
+                if _intersects(box, self.boxes[idx]):
+                    hits.append(idx)
+        hits.extend(idx for idx in self.large if idx != exclude and _intersects(box, self.boxes[idx]))
+        return sorted(hits)
+
+
+def find_collisions(
+    segments: List[Dict[str, Any]], margin: float, boxes: List[Box | None] | None = None
+) -> Dict[int, List[int]]:
+    """Map segment index -> indexes of same-page neighbours its expanded translation would overlap.
+
+    `boxes` are the already-parsed `_bbox` values (one per segment), computed here when omitted.
+    """
+    by_page: Dict[Any, List[Tuple[int, Box]]] = defaultdict(list)
+    for idx, seg in enumerate(segments):
+        box = boxes[idx] if boxes is not None else _bbox(seg)
+        if box is not None:
+            by_page[seg.get("page")].append((idx, box))
+
+    collisions: Dict[int, List[int]] = {}
+    for boxes in by_page.values():
+        grid = PageGrid(boxes)
+        for idx, box in boxes:
+            hits = grid.query(expanded_box(box, _expansion(segments[idx]), margin), exclude=idx)
+            if hits:
+                collisions[idx] = hits
+    return collisions
+
+
+def decide_mode(seg: Dict[str, Any], min_conf: float, max_expand_ratio: float, collides: bool = False) -> str:
+    confidence = float(seg.get("confidence", 0.0))
+    expansion = _expansion(seg)
+    bbox_ok = _bbox(seg) is not None
+
+    if confidence >= min_conf and expansion <= max_expand_ratio and bbox_ok and not collides:
         return "replace"
     return "annotation"
 
 
+COLUMN_DTYPE = [("confidence", "f8"), ("source_len", "i8"), ("translated_len", "i8"), ("bbox_ok", "?")]
+
+
+def load_columns(
+    segments: List[Dict[str, Any]], collisions: Dict[int, List[int]], boxes: List[Box | None] | None = None
+) -> Dict[str, Any]:
+    """Columnar view of the fields `decide_mode` reads, filled in one streaming pass (needs numpy).
+
+    Rows go straight from the segments into one structured array via `np.fromiter`; no per-field
+    Python lists are built. `boxes` (from `find_collisions`) avoids parsing every bbox twice.
+    """
+    n = len(segments)
+    if boxes is None:
+        rows = (
+            (
+                float(seg.get("confidence", 0.0)),
+                len(str(seg.get("source_text", ""))),
+                len(str(seg.get("translated_text", ""))),
+                _bbox(seg) is not None,
+            )
+            for seg in segments
+        )
+    else:
+        rows = (
+            (
+                float(seg.get("confidence", 0.0)),
+                len(str(seg.get("source_text", ""))),
+                len(str(seg.get("translated_text", ""))),
+                box is not None,
+            )
+            for seg, box in zip(segments, boxes)
+        )
+    table = np.fromiter(rows, dtype=COLUMN_DTYPE, count=n)
+    collides = np.zeros(n, dtype=bool)
+    if collisions:
+        collides[np.fromiter(collisions, dtype=np.int64, count=len(collisions))] = True
+    columns = {name: table[name] for name, _ in COLUMN_DTYPE}
+    columns["collides"] = collides
+    return columns
+
+
+def compute_replace_mask(
+    segments: List[Dict[str, Any]],
+    min_conf: float,
+    max_expand_ratio: float,
+    collisions: Dict[int, List[int]],
+    boxes: List[Box | None] | None = None,
+) -> List[bool]:
+    """Vectorized `decide_mode` over all segments; falls back to the per-segment rule without numpy."""
+    if np is None or not segments:
+        return [
+            decide_mode(seg, min_conf, max_expand_ratio, collides=idx in collisions) == "replace"
+            for idx, seg in enumerate(segments)
+        ]
+    cols = load_columns(segments, collisions, boxes)
+    expansion = cols["translated_len"] / np.maximum(cols["source_len"], 1)
+    mask = (
+        (cols["confidence"] >= min_conf)
+        & (expansion <= max_expand_ratio)
+        & cols["bbox_ok"]
+        & ~cols["collides"]
+    )
+    return mask.tolist()
+
+
+def iter_plans(
+    segments: List[Dict[str, Any]],
+    replace_mask: List[bool],
+    ids: List[str],
+    collisions: Dict[int, List[int]],
+) -> Iterator[Dict[str, Any]]:
+    for idx, seg in enumerate(segments):
+        mode = "replace" if replace_mask[idx] else "annotation"
+        plan = {
+            "segment_id": ids[idx],
+            "page": seg.get("page"),
+            "bbox": seg.get("bbox"),
+            "mode": mode,
+            "position_fidelity": "bbox-aligned" if mode == "replace" else "anchor-annotation",
+            "translated_text": seg.get("translated_text", ""),
+            "confidence": seg.get("confidence"),
+        }
+        if idx in collisions:
+            plan["collides_with"] = [ids[n] for n in collisions[idx]]
+        yield plan
+
+
+def _prepare(
+    segments: List[Dict[str, Any]],
+    min_conf: float,
+    max_expand_ratio: float,
+    margin: float | None,
+) -> Tuple[Dict[str, Any], List[bool], List[str], Dict[int, List[int]], List[Dict[str, Any]]]:
+    ids = [seg.get("segment_id") or f"seg_{idx:04d}" for idx, seg in enumerate(segments, start=1)]
+    boxes = [_bbox(seg) for seg in segments] if margin is not None else None
+    collisions = find_collisions(segments, margin, boxes) if margin is not None else {}
+    replace_mask = compute_replace_mask(segments, min_conf, max_expand_ratio, collisions, boxes)
+    replace_count = sum(replace_mask)
+    collision_report = [
+        {"segment_id": ids[idx], "page": segments[idx].get("page"), "collides_with": [ids[n] for n in hits]}
+        for idx, hits in sorted(collisions.items())
+    ]
+    summary = {
+        "total_segments": len(segments),
+        "replace": replace_count,
+        "annotation": len(segments) - replace_count,
+        "min_conf_for_replace": min_conf,
+        "max_expand_ratio_for_replace": max_expand_ratio,
+        "collision_margin": margin,
+        "colliding_segments": len(collision_report),
+    }
+    return summary, replace_mask, ids, collisions, collision_report
+
+
+@tracing.traced()
 def plan_reinsertion(
     segments: List[Dict[str, Any]],
     min_conf: float,
     max_expand_ratio: float,
+    margin: float | None = 2.0,
 ) -> Dict[str, Any]:
-    plans: List[Dict[str, Any]] = []
-    replace_count = 0
-    annotation_count = 0
-
-    for idx, seg in enumerate(segments, start=1):
-        segment_id = seg.get("segment_id") or f"seg_{idx:04d}"
-        mode = decide_mode(seg, min_conf=min_conf, max_expand_ratio=max_expand_ratio)
-        if mode == "replace":
-            replace_count += 1
-        else:
-            annotation_count += 1
-
-        plans.append(
-            {
-                "segment_id": segment_id,
-                "page": seg.get("page"),
-                "bbox": seg.get("bbox"),
-                "mode": mode,
-                "position_fidelity": "bbox-aligned" if mode == "replace" else "anchor-annotation",
-                "translated_text": seg.get("translated_text", ""),
-                "confidence": seg.get("confidence"),
-            }
-        )
-
+    summary, replace_mask, ids, collisions, collision_report = _prepare(segments, min_conf, max_expand_ratio, margin)
     return {
-        "summary": {
-            "total_segments": len(segments),
-            "replace": replace_count,
-            "annotation": annotation_count,
-            "min_conf_for_replace": min_conf,
-            "max_expand_ratio_for_replace": max_expand_ratio,
-        },
-        "plans": plans,
+        "summary": summary,
+        "plans": list(iter_plans(segments, replace_mask, ids, collisions)),
+        "collisions": collision_report,
     }
 
 
+def write_plan_stream(
+    path: Path,
+    segments: List[Dict[str, Any]],
+    min_conf: float,
+    max_expand_ratio: float,
+    margin: float | None = 2.0,
+) -> Dict[str, Any]:
+    """Write the same JSON document as `plan_reinsertion`, one plan at a time, and return the summary."""
+    summary, replace_mask, ids, collisions, collision_report = _prepare(segments, min_conf, max_expand_ratio, margin)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as fh:
+        fh.write('{\n  "summary": ' + json.dumps(summary) + ',\n  "plans": [')
+        for n, plan in enumerate(iter_plans(segments, replace_mask, ids, collisions)):
+            fh.write(("," if n else "") + "\n    " + json.dumps(plan))
+        fh.write('\n  ],\n  "collisions": ' + json.dumps(collision_report) + "\n}\n")
+    return summary
+
+
 def main() -> int:
     parser = argparse.ArgumentParser(description="Plan reinsertion mode for OCR translated segments")
     parser.add_argument("segments", type=Path, help="JSON array of translated OCR segments")
     parser.add_argument("--min-conf-for-replace", type=float, default=0.85)
     parser.add_argument("--max-expand-ratio", type=float, default=1.8)
+    parser.add_argument("--collision-margin", type=float, default=2.0, help="Clearance around expanded text boxes")
+    parser.add_argument("--no-collision-check", action="store_true")
     parser.add_argument("--output", type=Path, default=Path("logs/ocr/reinsertion-plan.json"))
     args = parser.parse_args()
 
@@ -77,17 +312,16 @@ def main() -> int:
     if not isinstance(segments, list):
         raise ValueError("segments must be JSON array/object")
 
-    result = plan_reinsertion(
+    summary = write_plan_stream(
+        args.output,
         segments,
         min_conf=args.min_conf_for_replace,
         max_expand_ratio=args.max_expand_ratio,
+        margin=None if args.no_collision_check else args.collision_margin,
     )
-
-    args.output.parent.mkdir(parents=True, exist_ok=True)
-    args.output.write_text(json.dumps(result, indent=2) + "\n")
-    print(json.dumps({"status": "PASS", "summary": result["summary"], "output": str(args.output)}))
+    print(json.dumps({"status": "PASS", "summary": summary, "output": str(args.output)}))
     return 0
 
 
 if __name__ == "__main__":
-    raise SystemExit(main())
+    raise SystemExit(stage_profile.run(main))
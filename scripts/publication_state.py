@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Per-run publication manifests and a size/mtime-keyed hash cache for incremental publication (T07.3)."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+
+from folder_handoff import hash_file
+import stage_profile
+import tracing
+
+
+STATE_VERSION = 1
+
+
+def _read(path: Path) -> Dict[str, Any]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_atomic(path: Path, payload: Any) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", delete=False, dir=path.parent) as tmp:
+        tmp.write(json.dumps(payload, ensure_ascii=False, indent=2) + "\n")
+    Path(tmp.name).replace(path)
+
+
+def expand_exports(exports: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """File-level entries; directory artifacts are walked, missing paths are dropped."""
+    files: List[Dict[str, str]] = []
+    for item in exports:
+        source = Path(item["path"])
+        if source.is_dir():
+            files.extend(
+                {"artifact": item["artifact"], "path": str(p)} for p in sorted(source.rglob("*")) if p.is_file()
+            )
+        elif source.is_file():
+            files.append({"artifact": item["artifact"], "path": str(source)})
+    return files
+
+
+@tracing.traced()
+def hash_files(files: List[Dict[str, str]], cache_path: Path, max_workers: int = 4) -> Dict[str, Any]:
+    """Attach `bytes`/`sha256` to each entry, re-hashing only files whose size or mtime changed."""
+    cache = _read(cache_path).get("entries", {})
+
+    def one(entry: Dict[str, str]) -> Dict[str, Any]:
+        st = os.stat(entry["path"])
+        known = cache.get(os.path.abspath(entry["path"]))
+        hit = bool(known and known["size"] == st.st_size and known["mtime_ns"] == st.st_mtime_ns)
+        sha = known["sha256"] if hit else hash_file(Path(entry["path"]))
+        return {**entry, "bytes": st.st_size, "sha256": sha, "_mtime_ns": st.st_mtime_ns, "_hit": hit}
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        hashed = list(pool.map(one, files))
+    hits = 0
+    for entry in hashed:
+        hits += entry.pop("_hit")
+        cache[os.path.abspath(entry["path"])] = {
+            "size": entry["bytes"],
+            "mtime_ns": entry.pop("_mtime_ns"),
+            "sha256": entry["sha256"],
+        }
+    _write_atomic(cache_path, {"version": STATE_VERSION, "entries": cache})
+    return {"files": hashed, "cache_hits": hits, "hashed": len(hashed) - hits}
+
+
+def state_path(state_dir: Path, run_id: str) -> Path:
+    return state_dir / f"{run_id}.json"
+
+
+def load_last(state_dir: Path, run_id: str) -> Dict[str, Any]:
+    return _read(state_path(state_dir, run_id))
+
+
+def save_last(state_dir: Path, run_id: str, files: List[Dict[str, Any]]) -> Path:
+    target = state_path(state_dir, run_id)
+    _write_atomic(
+        target,
+        {
+            "version": STATE_VERSION,
+            "run_id": run_id,
+            "published_at": datetime.now(timezone.utc).isoformat(),
+            "files": files,
+        },
+    )
+    return target
+
+
+def diff_manifests(previous: List[Dict[str, Any]], current: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Classify current files against the last published manifest, keyed by path."""
+    before = {entry["path"]: entry for entry in previous}
+    now = {entry["path"]: entry for entry in current}
+    out: Dict[str, List[Dict[str, Any]]] = {"added": [], "changed": [], "unchanged": [], "removed": []}
+    for path, entry in now.items():
+        old = before.get(path)
+        if old is None:
+            out["added"].append(entry)
+        elif old.get("sha256") != entry["sha256"]:
+            out["changed"].append(entry)
+        else:
+            out["unchanged"].append(entry)
+    out["removed"] = [entry for path, entry in before.items() if path not in now]
+    return out
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Show what an incremental publication would send")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--run-id", required=True)
+    parser.add_argument("--state-dir", type=Path, default=Path("logs/publication/state"))
+    parser.add_argument("--hash-cache", type=Path, default=Path("logs/cache/publication-hashes.json"))
+    args = parser.parse_args()
+
+    files = expand_exports([{"artifact": Path(p).name, "path": p} for p in args.paths])
+    hashed = hash_files(files, args.hash_cache)
+    delta = diff_manifests(load_last(args.state_dir, args.run_id).get("files", []), hashed["files"])
+    print(json.dumps({key: len(value) for key, value in delta.items()} | {"cache_hits": hashed["cache_hits"]}))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(stage_profile.run(main))
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""HTTP publication client: keep-alive connection pool, concurrent chunked resumable uploads (T07.3).
+
+Upload protocol (served by `scripts/publish_stub_server.py` for local testing):
+- `POST <base>/<run_id>/uploads` with `{artifact, name, size, fingerprint}` -> `{upload_id, offset}`;
+  `name` is the file name, or `<dir>/<relative path>` for files of a directory artifact;
+  `offset` is how many bytes the server already holds for that fingerprint (resume point).
+- `PUT <base>/<run_id>/uploads/<upload_id>` with `Content-Range: bytes a-b/total` -> `{offset}`;
+  a chunk that does not start at the server offset gets `409 {offset}` and the client jumps there.
+- `POST <base>/<run_id>/uploads/<upload_id>/complete` with `{sha256}` -> `{bytes, sha256}`.
+- `POST <base>/<run_id>` with the publication payload once all files are in.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import http.client
+import json
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+from urllib.parse import urlsplit
+
+from publication_state import expand_exports
+import stage_profile
+import tracing
+
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+DEFAULT_CHUNK_BYTES = 8 << 20
+
+
+class UploadError(RuntimeError):
+    pass
+
+
+class ConnectionPool:
+    """At most `size` keep-alive connections to one host, reused across threads."""
+
+    def __init__(self, base_url: str, size: int = 4, timeout: float = 60.0) -> None:
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme or "http"
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port
+        self.base_path = parts.path.rstrip("/")
+        self.timeout = timeout
+        self.opened = 0
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max(1, size))
+        self._lock = threading.Lock()
+
+    def _connect(self) -> http.client.HTTPConnection:
+        cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        with self._lock:
+            self.opened += 1
+        return cls(self.host, self.port, timeout=self.timeout)
+
+    def request(
+        self, method: str, path: str, body: bytes | None = None, headers: Dict[str, str] | None = None
+    ) -> Tuple[int, Dict[str, Any]]:
+        """Send one request; returns (status, decoded JSON body or {})."""
+        with self._slots:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            try:
+                conn.request(method, self.base_path + path, body=body, headers=headers or {})
+                resp = conn.getresponse()
+                raw = resp.read()
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                raise
+            if resp.will_close:
+                conn.close()
+            else:
+                self._idle.put(conn)
+        try:
+            data = json.loads(raw) if raw else {}
+        except ValueError:
+            data = {"raw": raw[:200].decode("utf-8", "replace")}
+        return resp.status, data
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class UploadStats:
+    def __init__(self) -> None:
+        self.retries = 0
+        self.chunks = 0
+        self.bytes_sent = 0
+        self.resumed_bytes = 0
+        self._lock = threading.Lock()
+
+    def add(self, **counts: int) -> None:
+        with self._lock:
+            for key, value in counts.items():
+                setattr(self, key, getattr(self, key) + value)
+
+
+def _send(
+    pool: ConnectionPool,
+    stats: UploadStats,
+    method: str,
+    path: str,
+    body: bytes | None,
+    headers: Dict[str, str],
+    max_attempts: int,
+    base_delay_s: float,
+    ok: Tuple[int, ...] = (200, 201),
+) -> Tuple[int, Dict[str, Any]]:
+    """Request with retry on connection errors and retryable statuses; `ok` statuses are returned."""
+    for attempt in range(1, max_attempts + 1):
+        try:
+            status, data = pool.request(method, path, body, headers)
+            if status in ok:
+                return status, data
+            if status not in RETRY_STATUSES:
+                raise UploadError(f"{method} {path}: HTTP {status} {data}")
+            reason = f"HTTP {status}"
+        except (OSError, http.client.HTTPException) as exc:
+            reason = f"{type(exc).__name__}: {exc}"
+        if attempt == max_attempts:
+            raise UploadError(f"{method} {path}: gave up after {attempt} attempts ({reason})")
+        stats.add(retries=1)
+        time.sleep(base_delay_s * (2 ** (attempt - 1)))
+    raise AssertionError("unreachable")
+
+
+def _hash_prefix(fh: Any, digest: Any, length: int) -> None:
+    """Feed the next `length` bytes of `fh` into `digest` (bytes the server already has)."""
+    while length > 0:
+        block = fh.read(min(length, 1 << 20))
+        if not block:
+            raise UploadError("file shorter than server offset")
+        digest.update(block)
+        length -= len(block)
+
+
+def _json_body(payload: Dict[str, Any]) -> Tuple[bytes, Dict[str, str]]:
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8"), {"Content-Type": "application/json"}
+
+
+def upload_file(
+    pool: ConnectionPool,
+    stats: UploadStats,
+    run_id: str,
+    artifact: str,
+    path: Path,
+    chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+    max_attempts: int = 5,
+    base_delay_s: float = 0.2,
+    name: str | None = None,
+) -> Dict[str, Any]:
+    st = path.stat()
+    size = st.st_size
+    name = name or path.name
+    fingerprint = hashlib.sha256(f"{name}\x1f{size}\x1f{st.st_mtime_ns}".encode()).hexdigest()
+    body, headers = _json_body({"artifact": artifact, "name": name, "size": size, "fingerprint": fingerprint})
+    _, init = _send(pool, stats, "POST", f"/{run_id}/uploads", body, headers, max_attempts, base_delay_s)
+    upload_id = init["upload_id"]
+    offset = int(init.get("offset", 0))
+    stats.add(resumed_bytes=offset)
+
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        _hash_prefix(fh, digest, offset)
+        while offset < size:
+            data = fh.read(min(chunk_bytes, size - offset))
+            end = offset + len(data) - 1
+            headers = {"Content-Range": f"bytes {offset}-{end}/{size}", "Content-Type": "application/octet-stream"}
+            status, resp = _send(
+                pool, stats, "PUT", f"/{run_id}/uploads/{upload_id}", data, headers, max_attempts, base_delay_s,
+                ok=(200, 201, 409),
+            )
+            server_offset = int(resp.get("offset", -1))
+            if status == 409 or server_offset != offset + len(data):
+                # The server holds a different prefix (lost ack, parallel resume): continue from its offset.
+                if not offset < server_offset <= size:
+                    raise UploadError(f"{path}: unexpected server offset {server_offset} (local {offset})")
+                fh.seek(offset)
+                _hash_prefix(fh, digest, server_offset - offset)
+                offset = server_offset
+                continue
+            digest.update(data)
+            offset = server_offset
+            stats.add(chunks=1, bytes_sent=len(data))
+
+    body, headers = _json_body({"sha256": digest.hexdigest()})
+    _, done = _send(
+        pool, stats, "POST", f"/{run_id}/uploads/{upload_id}/complete", body, headers, max_attempts, base_delay_s
+    )
+    if done.get("sha256") != digest.hexdigest() or int(done.get("bytes", -1)) != size:
+        raise UploadError(f"{path}: server checksum/size mismatch")
+    return {
+        "artifact": artifact,
+        "path": str(path),
+        "name": name,
+        "bytes": size,
+        "sha256": digest.hexdigest(),
+        "upload_id": upload_id,
+    }
+
+
+@tracing.traced("publish_api")
+def publish(
+    endpoint: str,
+    run_id: str,
+    exports: List[Dict[str, Any]],
+    payload: Dict[str, Any],
+    connections: int = 4,
+    chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+    max_attempts: int = 5,
+    base_delay_s: float = 0.2,
+) -> Dict[str, Any]:
+    """Upload every export concurrently, then POST the publication payload.
+
+    Directory artifacts are expanded to their files (as in folder and bundle modes) and uploaded
+    as `<dir>/<relative path>`; a path that is neither a file nor a directory fails the publication.
+    A name already taken by an earlier file is prefixed with the artifact key, as in folder and
+    bundle modes, so same-named files of different artifacts never overwrite each other.
+    """
+    pool = ConnectionPool(endpoint, size=connections)
+    stats = UploadStats()
+    started = time.perf_counter()
+    uploaded: List[Dict[str, Any]] = []
+    failed: List[Dict[str, Any]] = []
+    files: List[Tuple[str, Path, str]] = []
+    used = set()
+    for item in exports:
+        source = Path(item["path"])
+        if source.is_dir():
+            entries = [
+                (entry["artifact"], Path(entry["path"]), Path(source.name) / Path(entry["path"]).relative_to(source))
+                for entry in expand_exports([item])
+            ]
+        else:
+            entries = [(item["artifact"], source, Path(source.name))]
+        for artifact, path, rel in entries:
+            if rel in used:
+                rel = Path(artifact) / rel
+            used.add(rel)
+            files.append((artifact, path, rel.as_posix()))
+
+    def run(entry: Tuple[str, Path, str]) -> Dict[str, Any]:
+        artifact, path, name = entry
+        if not path.is_file():
+            return {"artifact": artifact, "path": str(path), "error": "not_a_file"}
+        try:
+            return upload_file(pool, stats, run_id, artifact, path, chunk_bytes, max_attempts, base_delay_s, name)
+        except (UploadError, OSError, ValueError, KeyError) as exc:
+            return {"artifact": artifact, "path": str(path), "error": str(exc)}
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, connections)) as executor:
+            for result in executor.map(run, files):
+                (failed if "error" in result else uploaded).append(result)
+        response_status = None
+        if not failed:
+            body, headers = _json_body({**payload, "uploads": uploaded})
+            response_status, _ = _send(pool, stats, "POST", f"/{run_id}", body, headers, max_attempts, base_delay_s)
+    except UploadError as exc:
+        failed.append({"artifact": None, "path": None, "error": str(exc)})
+        response_status = None
+    finally:
+        pool.close()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "status": "PASS" if not failed else "FAIL",
+        "files": len(uploaded),
+        "bytes": sum(item["bytes"] for item in uploaded),
+        "bytes_sent": stats.bytes_sent,
+        "resumed_bytes": stats.resumed_bytes,
+        "chunks": stats.chunks,
+        "retries": stats.retries,
+        "connections_opened": pool.opened,
+        "elapsed_s": round(elapsed, 3),
+        "mb_per_s": round(stats.bytes_sent / 1e6 / elapsed, 2) if elapsed > 0 else None,
+        "publish_status": response_status,
+        "uploaded": uploaded,
+        "failed": failed,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Upload files to the publication API")
+    parser.add_argument("paths", nargs="+", type=Path)
+    parser.add_argument("--run-id", required=True)
+    parser.add_argument("--api-endpoint", required=True)
+    parser.add_argument("--connections", type=int, default=4)
+    parser.add_argument("--chunk-bytes", type=int, default=DEFAULT_CHUNK_BYTES)
+    parser.add_argument("--max-attempts", type=int, default=5)
+    args = parser.parse_args()
+
+    exports = [{"artifact": p.name, "path": str(p)} for p in args.paths]
+    result = publish(
+        args.api_endpoint, args.run_id, exports, {"run_id": args.run_id}, args.connections, args.chunk_bytes, args.max_attempts
+    )
+    result.pop("uploaded")
+    print(json.dumps(result))
+    return 0 if result["status"] == "PASS" else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(stage_profile.run(main))
@@ -8,6 +8,13 @@ import json
 from pathlib import Path
 from typing import Any, Dict, List
 
+from bundle_export import BUNDLE_FORMATS, build_bundle
+from folder_handoff import LINK_MODES, build_handoff
+from publication_state import diff_manifests, expand_exports, hash_files, load_last, save_last
+from publish_client import DEFAULT_CHUNK_BYTES, publish
+import stage_profile
+import tracing
+
 
 def _read_json(path: Path) -> Dict[str, Any]:
     return json.loads(path.read_text(encoding="utf-8"))
@@ -52,23 +59,60 @@ def _merge_artifact_inputs(args: argparse.Namespace) -> Dict[str, Any]:
     return merged
 
 
+@tracing.traced("publish_outputs")
 def main() -> int:
     parser = argparse.ArgumentParser(description="Build output publication payload")
     parser.add_argument("--artifacts", help="Path to collected artifacts JSON")
     parser.add_argument("--run-id", required=True, help="Run identifier")
-    parser.add_argument("--publication-mode", choices=["link", "api", "folder"], default="link")
+    parser.add_argument("--publication-mode", choices=["link", "api", "folder", "bundle"], default="link")
     parser.add_argument("--public-base-url", default="https://files.local")
     parser.add_argument("--api-endpoint", default="https://api.local/v1/pdfor/runs")
+    parser.add_argument("--api-upload", action="store_true", help="In api mode, upload artifacts and POST the payload")
+    parser.add_argument("--api-connections", type=int, default=4, help="Keep-alive connections / concurrent uploads")
+    parser.add_argument("--chunk-bytes", type=int, default=DEFAULT_CHUNK_BYTES)
+    parser.add_argument("--max-attempts", type=int, default=5, help="Per-request attempts for API uploads")
     parser.add_argument("--handoff-dir", default="handoff")
+    parser.add_argument("--link-mode", choices=LINK_MODES, default="auto", help="How folder mode places files")
+    parser.add_argument("--bundle-dir", default="bundles")
+    parser.add_argument("--bundle-format", choices=BUNDLE_FORMATS, default="zip")
+    parser.add_argument("--max-workers", type=int, default=4)
+    parser.add_argument("--incremental", action="store_true", help="Publish only artifacts changed since the last publication")
+    parser.add_argument("--state-dir", default="logs/publication/state", help="Last published manifest per run_id")
+    parser.add_argument("--hash-cache", default="logs/cache/publication-hashes.json")
     parser.add_argument("--results-path")
     parser.add_argument("--summary-path")
     parser.add_argument("--notification-path")
     parser.add_argument("--publication-path")
     parser.add_argument("--output", required=True)
     args = parser.parse_args()
+    if args.incremental and args.publication_mode == "bundle":
+        parser.error("--incremental is not supported with --publication-mode bundle (a bundle always holds the full run)")
 
+    status = "PASS"
+    delivered = False
     artifacts = _merge_artifact_inputs(args)
     exports = _collect_exports(artifacts, args.public_base_url)
+    all_exports = exports
+    incremental: Dict[str, Any] | None = None
+    known_hashes: Dict[str, str] = {}
+    if args.incremental:
+        hashed = hash_files(expand_exports(exports), Path(args.hash_cache), args.max_workers)
+        previous = load_last(Path(args.state_dir), args.run_id)
+        delta = diff_manifests(previous.get("files", []), hashed["files"])
+        known_hashes = {entry["path"]: entry["sha256"] for entry in hashed["files"]}
+        exports = [
+            {"artifact": e["artifact"], "path": e["path"], "link": _build_direct_link(args.public_base_url, e["path"])}
+            for e in delta["added"] + delta["changed"]
+        ]
+        incremental = {
+            "previous_published_at": previous.get("published_at"),
+            "added": [e["path"] for e in delta["added"]],
+            "changed": [e["path"] for e in delta["changed"]],
+            "removed": [e["path"] for e in delta["removed"]],
+            "skipped": [{k: e[k] for k in ("artifact", "path", "sha256")} for e in delta["unchanged"]],
+            "hash_cache_hits": hashed["cache_hits"],
+            "hashed_files": hashed["hashed"],
+        }
 
     publication: Dict[str, Any] = {
         "run_id": args.run_id,
@@ -88,18 +132,69 @@ def main() -> int:
             "method": "POST",
             "payload": {"run_id": args.run_id, "artifacts": exports},
         }
+        if incremental is not None:
+            publication["delivery"]["payload"]["incremental"] = incremental
+        if args.api_upload:
+            upload = publish(
+                args.api_endpoint,
+                args.run_id,
+                exports,
+                publication["delivery"]["payload"],
+                args.api_connections,
+                args.chunk_bytes,
+                args.max_attempts,
+            )
+            publication["delivery"]["upload"] = upload
+            status = upload["status"]
+            delivered = status == "PASS"
+    elif args.publication_mode == "bundle":
+        bundle = build_bundle(args.run_id, all_exports, Path(args.bundle_dir), args.bundle_format)
+        publication["delivery"] = {
+            "type": "bundle",
+            "path": bundle["path"],
+            "link": _build_direct_link(args.public_base_url, bundle["path"]),
+            "format": bundle["format"],
+            "bytes": bundle["bytes"],
+            "sha256": bundle["sha256"],
+            "file_count": bundle["file_count"],
+            "source_bytes": bundle["source_bytes"],
+            "missing": bundle["missing"],
+            "elapsed_s": bundle["elapsed_s"],
+        }
     else:
+        manifest = build_handoff(
+            args.run_id, all_exports, Path(args.handoff_dir), args.link_mode, args.max_workers, known_hashes
+        )
         publication["delivery"] = {
             "type": "folder_handoff",
             "directory": f"{args.handoff_dir.rstrip('/')}/{args.run_id}",
-            "files": [item["path"] for item in exports],
+            "files": [item["path"] for item in all_exports],
+            "manifest": manifest["manifest_path"],
+            "handoff_files": [entry["path"] for entry in manifest["files"]],
+            "total_bytes": manifest["total_bytes"],
+            "methods": manifest["methods"],
+            "missing": manifest["missing"],
+            "elapsed_s": manifest["elapsed_s"],
         }
+        delivered = True
+
+    if incremental is not None:
+        # Only a finished upload or handoff counts as published; link and describe-only api runs
+        # leave the last manifest untouched so the next run still sends these files.
+        incremental["state_saved"] = delivered
+        publication["delivery"]["incremental"] = incremental
+        if delivered:
+            save_last(Path(args.state_dir), args.run_id, hashed["files"])
 
     Path(args.output).parent.mkdir(parents=True, exist_ok=True)
     Path(args.output).write_text(json.dumps(publication, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    if status != "PASS":
+        print("PUBLICATION_FAILED")
+        return 1
     print("PUBLICATION_READY")
     return 0
 
 
 if __name__ == "__main__":
-    raise SystemExit(main())
+    raise SystemExit(stage_profile.run(main))
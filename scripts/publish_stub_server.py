@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""Local stand-in for the publication API (see `publish_client.py` for the protocol).
+
+Stores uploads under `--storage/<run_id>/`, keeps connections alive (HTTP/1.1) and can inject
+failures (`--fail-rate`) to exercise client retries and resume.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict
+
+import stage_profile
+
+
+RANGE_RE = re.compile(r"bytes (\d+)-(\d+)/(\d+)")
+
+
+def _safe_name(name: str) -> str:
+    """Keep `<dir>/<relative path>` names but drop absolute and parent components."""
+    parts = [part for part in Path(name).parts if part not in ("", ".", "..", "/")]
+    return "/".join(parts) or "upload"
+
+
+class UploadState:
+    def __init__(self, storage: Path, fail_rate: float) -> None:
+        self.storage = storage
+        self.fail_rate = fail_rate
+        self.lock = threading.Lock()
+        self.uploads: Dict[str, Dict[str, Any]] = {}
+        self.by_fingerprint: Dict[str, str] = {}
+        self.connections = 0
+        self.requests = 0
+        self.injected_failures = 0
+        self.publications: Dict[str, Dict[str, Any]] = {}
+
+
+def make_handler(state: UploadState, base_path: str) -> type:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self) -> None:
+            super().setup()
+            with state.lock:
+                state.connections += 1
+
+        def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 - stdlib signature
+            return
+
+        def _reply(self, status: int, payload: Dict[str, Any]) -> None:
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self) -> bytes:
+            return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        def _route(self) -> list[str] | None:
+            if not self.path.startswith(base_path + "/"):
+                return None
+            return self.path[len(base_path) + 1 :].strip("/").split("/")
+
+        def _inject_failure(self) -> bool:
+            with state.lock:
+                state.requests += 1
+                fail = random.random() < state.fail_rate
+                state.injected_failures += int(fail)
+            if fail:
+                self._reply(503, {"error": "injected"})
+            return fail
+
+        def do_GET(self) -> None:
+            if self.path == "/_stats":
+                with state.lock:
+                    stats = {
+                        "connections": state.connections,
+                        "requests": state.requests,
+                        "injected_failures": state.injected_failures,
+                        "publications": sorted(state.publications),
+                    }
+                self._reply(200, stats)
+                return
+            self._reply(404, {"error": "not_found"})
+
+        def do_POST(self) -> None:
+            parts = self._route()
+            body = self._body()
+            if parts is None or self._inject_failure():
+                if parts is None:
+                    self._reply(404, {"error": "not_found"})
+                return
+            payload = json.loads(body or b"{}")
+            if len(parts) == 1:
+                with state.lock:
+                    state.publications[parts[0]] = payload
+                self._reply(200, {"run_id": parts[0], "status": "published"})
+            elif len(parts) == 2 and parts[1] == "uploads":
+                self._init_upload(parts[0], payload)
+            elif len(parts) == 4 and parts[1] == "uploads" and parts[3] == "complete":
+                self._complete(parts[2], payload)
+            else:
+                self._reply(404, {"error": "not_found"})
+
+        def do_PUT(self) -> None:
+            parts = self._route()
+            data = self._body()
+            if parts is None or len(parts) != 3 or parts[1] != "uploads":
+                self._reply(404, {"error": "not_found"})
+                return
+            if self._inject_failure():
+                return
+            match = RANGE_RE.fullmatch(self.headers.get("Content-Range", ""))
+            with state.lock:
+                upload = state.uploads.get(parts[2])
+            if upload is None or match is None:
+                self._reply(400 if upload else 404, {"error": "bad_upload"})
+                return
+            start = int(match.group(1))
+            with upload["lock"]:
+                if start != upload["offset"]:
+                    self._reply(409, {"offset": upload["offset"]})
+                    return
+                with upload["path"].open("ab") as fh:
+                    fh.write(data)
+                upload["offset"] += len(data)
+                offset = upload["offset"]
+            self._reply(200, {"offset": offset})
+
+        def _init_upload(self, run_id: str, payload: Dict[str, Any]) -> None:
+            key = f"{run_id}/{payload.get('fingerprint')}"
+            with state.lock:
+                upload_id = state.by_fingerprint.get(key)
+                if upload_id is None:
+                    upload_id = uuid.uuid4().hex
+                    target = state.storage / run_id / ".partial" / upload_id
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    target.write_bytes(b"")
+                    state.uploads[upload_id] = {
+                        "run_id": run_id,
+                        "name": _safe_name(str(payload.get("name"))),
+                        "size": int(payload.get("size", 0)),
+                        "path": target,
+                        "offset": 0,
+                        "lock": threading.Lock(),
+                    }
+                    state.by_fingerprint[key] = upload_id
+                offset = state.uploads[upload_id]["offset"]
+            self._reply(201, {"upload_id": upload_id, "offset": offset})
+
+        def _complete(self, upload_id: str, payload: Dict[str, Any]) -> None:
+            with state.lock:
+                upload = state.uploads.get(upload_id)
+            if upload is None:
+                self._reply(404, {"error": "unknown_upload"})
+                return
+            digest = hashlib.sha256()
+            with upload["lock"], upload["path"].open("rb") as fh:
+                for chunk in iter(lambda: fh.read(1 << 20), b""):
+                    digest.update(chunk)
+                size = upload["offset"]
+            if size != upload["size"] or digest.hexdigest() != payload.get("sha256"):
+                self._reply(422, {"error": "checksum_mismatch", "bytes": size, "sha256": digest.hexdigest()})
+                return
+            final = state.storage / upload["run_id"] / upload["name"]
+            final.parent.mkdir(parents=True, exist_ok=True)
+            upload["path"].replace(final)
+            upload["path"] = final
+            self._reply(200, {"bytes": size, "sha256": digest.hexdigest()})
+
+    return Handler
+
+
+def serve(host: str, port: int, storage: Path, base_path: str, fail_rate: float) -> ThreadingHTTPServer:
+    storage.mkdir(parents=True, exist_ok=True)
+    state = UploadState(storage, fail_rate)
+    server = ThreadingHTTPServer((host, port), make_handler(state, base_path.rstrip("/")))
+    server.daemon_threads = True
+    server.state = state  # type: ignore[attr-defined]
+    return server
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run a local stand-in publication API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--base-path", default="/v1/pdfor/runs")
+    parser.add_argument("--storage", type=Path, default=Path("logs/publication/stub-storage"))
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of upload requests answered with 503")
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, args.storage, args.base_path, args.fail_rate)
+    print(json.dumps({"status": "LISTENING", "endpoint": f"http://{args.host}:{server.server_port}{args.base_path}"}), flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(stage_profile.run(main))
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""Render scanned PDF pages once into a content-addressed image cache for OCR (T06.2)."""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List
+
+import page_ranges
+from pdf_structure import inspect_pdf
+import stage_profile
+
+
+def _load(path: Path) -> Dict[str, Any]:
+    return json.loads(path.read_text())
+
+
+def _pdf_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_path(cache_dir: Path, pdf_hash: str, page: int, dpi: int, ext: str = "png") -> Path:
+    return cache_dir / pdf_hash[:2] / pdf_hash / f"{dpi}dpi" / f"page-{page:05d}.{ext}"
+
+
+def _build_command(raster_cfg: Dict[str, Any], pdf: Path, page: int, dpi: int, output_base: Path) -> List[str]:
+    cmd = [raster_cfg["binary"]]
+    for token in raster_cfg.get("args", []):
+        cmd.append(token.format(input=str(pdf), page=page, dpi=dpi, output_base=str(output_base)))
+    return cmd
+
+
+def _render(raster_cfg: Dict[str, Any], pdf: Path, page: int, dpi: int, target: Path) -> Dict[str, Any]:
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=target.parent) as tmp:
+        output_base = Path(tmp) / "render"
+        cmd = _build_command(raster_cfg, pdf, page, dpi, output_base)
+        proc = subprocess.run(cmd, capture_output=True, text=True, check=False)
+        rendered = output_base.with_suffix(target.suffix)
+        if proc.returncode != 0 or not rendered.exists():
+            return {
+                "page": page,
+                "status": "FAIL",
+                "reason": "render_command_failed",
+                "stderr": proc.stderr[-500:],
+                "returncode": proc.returncode,
+            }
+        rendered.replace(target)
+    return {"page": page, "status": "PASS", "path": str(target), "cache": "miss"}
+
+
+def evict_lru(cache_dir: Path, max_bytes: int, keep: set[Path]) -> Dict[str, int]:
+    """Drop least recently used images (by mtime, refreshed on every hit) until under `max_bytes`."""
+    files = [(p.stat().st_mtime, p.stat().st_size, p) for p in cache_dir.rglob("page-*.*")]
+    total = sum(size for _, size, _ in files)
+    evicted = freed = 0
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        if path in keep:
+            continue
+        path.unlink(missing_ok=True)
+        total -= size
+        freed += size
+        evicted += 1
+    return {"cache_bytes": total, "evicted_files": evicted, "freed_bytes": freed}
+
+
+def rasterize(
+    pdf: Path,
+    pages: str | None,
+    config: Dict[str, Any],
+    dpi: int | None = None,
+    dry_run: bool = False,
+    max_workers: int = 2,
+    section: str = "rasterizer",
+) -> Dict[str, Any]:
+    """Render `pages` of `pdf` using `config[section]` (binary, args, dpi, format, cache limits)."""
+    raster_cfg = config.get(section, {})
+    dpi = int(dpi or raster_cfg.get("dpi", 300))
+    ext = str(raster_cfg.get("format", "png"))
+    cache_dir = Path(raster_cfg.get("cache_dir", "logs/cache/raster"))
+    max_bytes = int(raster_cfg.get("max_cache_bytes", 5 * 1024**3))
+
+    if not pdf.is_file():
+        return {"status": "FAIL", "input": str(pdf), "reason": "input_missing"}
+
+    pdf_hash = _pdf_hash(pdf)
+    # Every range is clamped to the real page count, so pages past the end are never rendered; a 0 or
+    # unknown count must not pass as "nothing to render".
+    total = inspect_pdf(pdf).get("page_count")
+    if not total:
+        return {"status": "FAIL", "input": str(pdf), "pdf_sha256": pdf_hash, "reason": "page_count_unknown", "items": []}
+    requested = page_ranges.parse(pages)
+    intervals = page_ranges.clamp(requested, total)
+    if not intervals:
+        return {
+            "status": "FAIL",
+            "input": str(pdf),
+            "pdf_sha256": pdf_hash,
+            "page_count": total,
+            "reason": "pages_out_of_range",
+            "items": [],
+        }
+    wanted = [p for start, end in intervals for p in range(start, end + 1)]
+
+    items: List[Dict[str, Any]] = []
+    misses: List[int] = []
+    for page in wanted:
+        target = cache_path(cache_dir, pdf_hash, page, dpi, ext)
+        if target.exists():
+            os.utime(target)
+            items.append({"page": page, "status": "PASS", "path": str(target), "cache": "hit"})
+        else:
+            misses.append(page)
+
+    binary = raster_cfg.get("binary")
+    if dry_run:
+        for page in misses:
+            target = cache_path(cache_dir, pdf_hash, page, dpi, ext)
+            items.append(
+                {
+                    "page": page,
+                    "status": "PASS",
+                    "path": str(target),
+                    "cache": "miss",
+                    "command": _build_command(raster_cfg, pdf, page, dpi, target.with_suffix("")),
+                    "dry_run": True,
+                }
+            )
+    elif misses and not shutil.which(binary or ""):
+        items.extend({"page": p, "status": "FAIL", "reason": f"missing_binary:{binary}"} for p in misses)
+    elif misses:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            items.extend(
+                pool.map(lambda p: _render(raster_cfg, pdf, p, dpi, cache_path(cache_dir, pdf_hash, p, dpi, ext)), misses)
+            )
+
+    items.sort(key=lambda item: item["page"])
+    cache_stats = {"hits": len(wanted) - len(misses), "misses": len(misses)}
+    if not dry_run and cache_dir.exists():
+        keep = {Path(item["path"]) for item in items if item.get("path")}
+        cache_stats.update(evict_lru(cache_dir, max_bytes, keep))
+
+    failed = sum(1 for item in items if item["status"] != "PASS")
+    return {
+        "status": "PASS" if failed == 0 else "FAIL",
+        "input": str(pdf),
+        "pdf_sha256": pdf_hash,
+        "dpi": dpi,
+        "page_count": total,
+        "pages": page_ranges.format_ranges(intervals),
+        "cache": cache_stats,
+        "items": items,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Rasterize PDF pages into the OCR image cache")
+    parser.add_argument("input", type=Path, help="Scanned PDF")
+    parser.add_argument("--pages", default="all", help="Page range spec (see page_ranges.py)")
+    parser.add_argument("--config", type=Path, default=Path("configs/ocr-tools.json"))
+    parser.add_argument("--dpi", type=int, help="Override rasterizer.dpi from config")
+    parser.add_argument("--max-workers", type=int, default=2)
+    parser.add_argument("--result-out", type=Path, default=Path("logs/ocr/raster-result.json"))
+    parser.add_argument("--inputs-list-out", type=Path, default=Path("logs/ocr/pages.txt"))
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    result = rasterize(args.input, args.pages, _load(args.config), args.dpi, args.dry_run, args.max_workers)
+
+    args.result_out.parent.mkdir(parents=True, exist_ok=True)
+    args.result_out.write_text(json.dumps(result, indent=2) + "\n")
+    args.inputs_list_out.parent.mkdir(parents=True, exist_ok=True)
+    args.inputs_list_out.write_text(
+        "".join(f"{item['path']}\n" for item in result.get("items", []) if item["status"] == "PASS")
+    )
+    print(
+        json.dumps(
+            {
+                "status": result.get("status"),
+                "cache": result.get("cache"),
+                "result": str(args.result_out),
+                "inputs_list": str(args.inputs_list_out),
+            }
+        )
+    )
+    return 0 if result.get("status") == "PASS" else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(stage_profile.run(main))
@@ -6,7 +6,14 @@ from __future__ import annotations
 import argparse
 import json
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, Iterator, List
+
+from glossary_matcher import find_terms, load_glossary
+from ocr_normalize import iter_segments_file
+from payload_store import compact_dir, write_compact
+import stage_profile
+import tracing
+from translation_memory import file_hash, load_memory, memory_key
 
 
 def _load(path: Path) -> Any:
@@ -18,8 +25,22 @@ def _fallback_order(service_cfg: Dict[str, Any], primary: str) -> List[str]:
     return [primary] + [s for s in order if s != primary]
 
 
+def _iter_segments(path: Path) -> Iterator[Dict[str, Any]]:
+    """Yield segments from a JSON array/object, or lazily from JSONL / raw OCR provider output."""
+    if path.suffix.lower() != ".json":
+        yield from iter_segments_file(path)
+        return
+    segments = _load(path)
+    if isinstance(segments, dict):
+        segments = [segments]
+    if not isinstance(segments, list):
+        raise ValueError("segments must be a JSON array/object")
+    yield from segments
+
+
+@tracing.traced()
 def route_segments(
-    segments: List[Dict[str, Any]],
+    segments: Iterable[Dict[str, Any]],
     service_cfg: Dict[str, Any],
     run_id: str,
     file_id: str,
@@ -28,24 +49,53 @@ def route_segments(
     glossary_path: str | None,
     primary_font: str | None,
     low_conf_threshold: float,
+    memory: Dict[str, Dict[str, Any]] | None = None,
+    glossary: Dict[str, Any] | None = None,
 ) -> Dict[str, Any]:
     payloads: List[Dict[str, Any]] = []
     warnings: List[Dict[str, Any]] = []
+    duplicates: Dict[str, List[str]] = {}
+    memory_hits: List[Dict[str, Any]] = []
+    first_by_key: Dict[str, str] = {}
+    chars_saved = 0
+    glossary_hits_total = 0
 
     chain = _fallback_order(service_cfg, service)
+    prompt_hash = file_hash(prompt_path)
+    glossary_hash = file_hash(glossary_path)
+    memory = memory or {}
+    total = 0
 
     for idx, seg in enumerate(segments, start=1):
+        total = idx
         seg_id = seg.get("segment_id") or f"seg_{idx:04d}"
         confidence = float(seg.get("confidence", 1.0))
+        source_text = seg.get("text", "")
+        key = memory_key(source_text, "ja", "ru", service, prompt_hash, glossary_hash)
 
-        payloads.append(
-            {
+        cached = memory.get(key)
+        if cached is not None:
+            memory_hits.append(
+                {
+                    "segment_id": seg_id,
+                    "page": seg.get("page"),
+                    "memory_key": key,
+                    "translated_text": cached.get("translated_text", ""),
+                }
+            )
+            chars_saved += len(source_text)
+        elif key in first_by_key:
+            duplicates.setdefault(first_by_key[key], []).append(seg_id)
+            chars_saved += len(source_text)
+        else:
+            first_by_key[key] = seg_id
+            payload: Dict[str, Any] = {
                 "run_id": run_id,
                 "file_id": file_id,
                 "segment_id": seg_id,
                 "page": seg.get("page"),
                 "bbox": seg.get("bbox"),
-                "source_text": seg.get("text", ""),
+                "source_text": source_text,
                 "lang_in": "ja",
                 "lang_out": "ru",
                 "service": service,
@@ -53,13 +103,17 @@ def route_segments(
                 "prompt_path": prompt_path,
                 "glossary_path": glossary_path,
                 "primary_font": primary_font,
+                "memory_key": key,
                 "translation_controls": {
                     "use_prompt": bool(prompt_path),
                     "use_glossary": bool(glossary_path),
                     "use_font_override": bool(primary_font),
                 },
             }
-        )
+            if glossary is not None:
+                payload["glossary_hits"] = find_terms(glossary, source_text)
+                glossary_hits_total += len(payload["glossary_hits"])
+            payloads.append(payload)
 
         if confidence < low_conf_threshold:
             warnings.append(
@@ -74,18 +128,34 @@ def route_segments(
                 }
             )
 
+    deduplicated = sum(len(ids) for ids in duplicates.values())
     summary = {
-        "total_segments": len(payloads),
+        "total_segments": total,
+        "translation_payloads": len(payloads),
+        "deduplicated_segments": deduplicated,
+        "memory_hits": len(memory_hits),
+        "memory_hit_rate": round(len(memory_hits) / total, 4) if total else 0.0,
+        "chars_saved": chars_saved,
+        "glossary_hits": glossary_hits_total,
         "low_confidence_segments": len(warnings),
         "low_conf_threshold": low_conf_threshold,
     }
 
-    return {"summary": summary, "translation_payloads": payloads, "warnings": warnings}
+    return {
+        "summary": summary,
+        "translation_payloads": payloads,
+        "warnings": warnings,
+        "fanout": {"duplicates": duplicates, "memory_hits": memory_hits},
+    }
 
 
 def main() -> int:
     parser = argparse.ArgumentParser(description="Route OCR segments into translation payloads")
-    parser.add_argument("segments", type=Path, help="OCR segments JSON array")
+    parser.add_argument(
+        "segments",
+        type=Path,
+        help="OCR segments JSON array, segments JSONL (streamed) or raw .tsv/.hocr provider output",
+    )
     parser.add_argument("--services-config", type=Path, default=Path("configs/services.json"))
     parser.add_argument("--run-id", type=str, required=True)
     parser.add_argument("--file-id", type=str, required=True)
@@ -97,21 +167,28 @@ def main() -> int:
     parser.add_argument("--payloads-out", type=Path, default=Path("logs/ocr/translation-payloads.json"))
     parser.add_argument("--warnings-out", type=Path, default=Path("logs/ocr/warnings.json"))
     parser.add_argument("--summary-out", type=Path, default=Path("logs/ocr/summary.json"))
+    parser.add_argument("--fanout-out", type=Path, default=Path("logs/ocr/fanout.json"))
+    parser.add_argument("--memory-path", type=Path, help="Translation memory JSON to consult for cached results")
+    parser.add_argument(
+        "--payload-format",
+        choices=["json", "compact"],
+        default="json",
+        help="compact: shared header + per-segment JSONL rows in a directory named after --payloads-out",
+    )
+    parser.add_argument("--glossary-cache-dir", type=Path, default=Path("logs/cache/glossary"))
     args = parser.parse_args()
 
-    segments = _load(args.segments)
-    if isinstance(segments, dict):
-        segments = [segments]
-    if not isinstance(segments, list):
-        raise ValueError("segments must be a JSON array/object")
-
     service_cfg = _load(args.services_config)
     flags = service_cfg.get("service_flags", {})
     if args.service not in flags:
         raise ValueError(f"Unsupported service: {args.service}")
 
+    glossary = None
+    if args.glossary_path and Path(args.glossary_path).is_file():
+        glossary = load_glossary(args.glossary_path, args.glossary_cache_dir)
+
     routed = route_segments(
-        segments=segments,
+        segments=_iter_segments(args.segments),
         service_cfg=service_cfg,
         run_id=args.run_id,
         file_id=args.file_id,
@@ -120,19 +197,36 @@ def main() -> int:
         glossary_path=args.glossary_path,
         primary_font=args.primary_font,
         low_conf_threshold=args.low_conf_threshold,
+        memory=load_memory(args.memory_path),
+        glossary=glossary,
     )
 
-    for out, key in [
-        (args.payloads_out, "translation_payloads"),
+    payloads_out: Path | str = args.payloads_out
+    if args.payload_format == "compact":
+        payloads_out = compact_dir(args.payloads_out)
+        write_compact(payloads_out, routed["translation_payloads"])
+
+    outputs = [] if args.payload_format == "compact" else [(args.payloads_out, "translation_payloads")]
+    for out, key in outputs + [
         (args.warnings_out, "warnings"),
         (args.summary_out, "summary"),
+        (args.fanout_out, "fanout"),
     ]:
         out.parent.mkdir(parents=True, exist_ok=True)
         out.write_text(json.dumps(routed[key], indent=2) + "\n")
 
-    print(json.dumps({"status": "PASS", "summary": routed["summary"], "warnings_out": str(args.warnings_out)}))
+    print(
+        json.dumps(
+            {
+                "status": "PASS",
+                "summary": routed["summary"],
+                "payloads_out": str(payloads_out),
+                "warnings_out": str(args.warnings_out),
+            }
+        )
+    )
     return 0
 
 
 if __name__ == "__main__":
-    raise SystemExit(main())
+    raise SystemExit(stage_profile.run(main))
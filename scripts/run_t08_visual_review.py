@@ -5,10 +5,24 @@ from __future__ import annotations
 
 import argparse
 import json
+import os
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any, Dict, List
 
+import stage_profile
+from validate_regression_manifest import DEFAULT_THRESHOLDS_PATH, load_thresholds, thresholds_for
+from visual_diff import DEFAULT_THRESHOLDS, compare_documents
+
+
+VISUAL_CHECKS = (
+    "layout_shift_within_threshold",
+    "block_iou_within_threshold",
+    "content_bbox_iou_within_threshold",
+    "perceptual_hash_within_threshold",
+)
+VISUAL_FIELDS = ("metrics", "thresholds", "pages_compared", "source_pages", "output_pages", "reason")
+
 
 def _read_json(path: Path) -> Any:
     return json.loads(path.read_text(encoding="utf-8"))
@@ -19,10 +33,12 @@ def _write_json(path: Path, payload: Any) -> None:
     path.write_text(json.dumps(payload, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
 
 
+PLACEHOLDER_PDF = b"%PDF-1.4\n1 0 obj<< /Type /Catalog /Font <<>> >>endobj\nBT /F1 12 Tf (bilingual) Tj ET\nstartxref\n123\n%%EOF\n"
+
+
 def _write_pdf(path: Path) -> None:
-    raw = b"%PDF-1.4\n1 0 obj<< /Type /Catalog /Font <<>> >>endobj\nBT /F1 12 Tf (bilingual) Tj ET\nstartxref\n123\n%%EOF\n"
     path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_bytes(raw)
+    path.write_bytes(PLACEHOLDER_PDF)
 
 
 def _timestamp() -> str:
@@ -33,14 +49,35 @@ def _check_pdf_header(path: Path) -> bool:
     return path.read_bytes().startswith(b"%PDF-")
 
 
-def _review_sample(sample: Dict[str, Any], run_id: str, out_dir: Path) -> Dict[str, Any]:
+def _find_output(sample: Dict[str, Any], out_dir: Path) -> Path | None:
+    if sample.get("output_file"):
+        return Path(sample["output_file"])
+    found = sorted(out_dir.glob(f"{Path(sample['input_file']).stem}-ja_ru-*-bilingual.pdf"))
+    # Placeholders written by tag mode are not real outputs.
+    found = [path for path in found if path.stat().st_size != len(PLACEHOLDER_PDF) or path.read_bytes() != PLACEHOLDER_PDF]
+    return found[-1] if found else None
+
+
+def _review_sample(
+    sample: Dict[str, Any],
+    run_id: str,
+    out_dir: Path,
+    output_path: Path | None = None,
+    visual: Dict[str, Any] | None = None,
+) -> Dict[str, Any]:
+    """Review one sample; with `visual` (compare mode) layout checks come from pixel metrics.
+
+    Without `visual` (tag mode) a placeholder output is written and checks follow `expected_checks`.
+    In compare mode a missing output (`output_path` None) fails the output checks.
+    """
     sample_id = sample["sample_id"]
     input_path = Path(sample["input_file"])
     expected = set(sample.get("expected_checks", []))
 
-    output_name = f"{input_path.stem}-ja_ru-{_timestamp()}-bilingual.pdf"
-    output_path = out_dir / output_name
-    _write_pdf(output_path)
+    if output_path is None and visual is None:
+        output_path = out_dir / f"{input_path.stem}-ja_ru-{_timestamp()}-bilingual.pdf"
+        _write_pdf(output_path)
+    output_name = output_path.name if output_path is not None else ""
 
     checks: Dict[str, bool] = {
         "input_exists": input_path.exists(),
@@ -50,38 +87,75 @@ def _review_sample(sample: Dict[str, Any], run_id: str, out_dir: Path) -> Dict[s
         "reading_order_coherent": ("reading_order" in expected) if sample.get("category") == "multi-column" else True,
         "toc_consistency": ("toc_consistency" in expected) if sample.get("category") == "multi-column" else True,
         "output_naming_policy": output_name.endswith("-bilingual.pdf") and "-ja_ru-" in output_name,
-        "output_pdf_header_valid": _check_pdf_header(output_path),
+        "output_pdf_header_valid": output_path is not None and output_path.is_file() and _check_pdf_header(output_path),
         "page_coherence": True,
     }
-
-    return {
+    if visual is not None:
+        visual_checks = visual.get("checks", {})
+        checks["visual_comparison_completed"] = "checks" in visual
+        for item in VISUAL_CHECKS:
+            checks[item] = bool(visual_checks.get(item))
+        checks["page_coherence"] = visual.get("output_pages", 0) >= visual.get("source_pages", 1) > 0
+
+    review = {
         "scenario_id": f"AT-{sample_id}",
         "sample_id": sample_id,
         "category": sample.get("category"),
         "run_id": run_id,
         "input_file": str(input_path),
-        "output_file": str(output_path),
+        "output_file": str(output_path) if output_path is not None else None,
         "checks": [
             {"item": item, "status": "PASS" if status else "FAIL"}
             for item, status in checks.items()
         ],
         "overall": "PASS" if all(checks.values()) else "FAIL",
     }
+    if visual is not None:
+        review["visual"] = {key: visual.get(key) for key in VISUAL_FIELDS}
+    return review
 
 
 def main() -> int:
     parser = argparse.ArgumentParser(description="Run T08.3 visual fidelity review")
     parser.add_argument("--manifest", default="configs/regression-samples.json")
+    parser.add_argument("--thresholds", default=str(DEFAULT_THRESHOLDS_PATH), help="Per-category visual thresholds JSON")
     parser.add_argument("--run-id", default="run_t08_visual_001")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--compare", action="store_true", help="Compare every sample; samples without an output fail")
+    mode.add_argument("--tags-only", action="store_true", help="Previous tag-based review with placeholder outputs")
+    parser.add_argument("--ocr-config", default="configs/ocr-tools.json", help="Holds the visual_rasterizer settings")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
     args = parser.parse_args()
 
     samples = _read_json(Path(args.manifest))
+    thresholds = load_thresholds(Path(args.thresholds))
     base = Path("logs/test-runs") / args.run_id
     out_dir = base / "outputs"
 
-    reviews = [_review_sample(sample, args.run_id, out_dir) for sample in samples]
+    # Compare by default as soon as any sample has an output; tag mode only when there is nothing to render.
+    outputs = {} if args.tags_only else {s["sample_id"]: _find_output(s, out_dir) for s in samples}
+    if args.compare or any(outputs.values()):
+        review_mode = "compare"
+        limits = {s["sample_id"]: thresholds_for(s.get("category"), thresholds) for s in samples}
+        pairs = {
+            s["sample_id"]: (Path(s["input_file"]), outputs[s["sample_id"]]) for s in samples if outputs[s["sample_id"]]
+        }
+        visual = compare_documents(pairs, limits, _read_json(Path(args.ocr_config)), args.max_workers)
+        reviews = []
+        for sample in samples:
+            sid = sample["sample_id"]
+            output = outputs[sid]
+            result = visual.get(sid) if output is not None else None
+            if result is None:
+                result = {"status": "FAIL", "reason": "output_not_found"}
+            result["thresholds"] = {**DEFAULT_THRESHOLDS, **limits[sid]}
+            reviews.append(_review_sample(sample, args.run_id, out_dir, output, result))
+    else:
+        review_mode = "tags"
+        reviews = [_review_sample(sample, args.run_id, out_dir) for sample in samples]
     summary = {
         "run_id": args.run_id,
+        "mode": review_mode,
         "total_samples": len(reviews),
         "passed_samples": sum(1 for r in reviews if r["overall"] == "PASS"),
         "failed_samples": sum(1 for r in reviews if r["overall"] != "PASS"),
@@ -94,4 +168,4 @@ def main() -> int:
 
 
 if __name__ == "__main__":
-    raise SystemExit(main())
+    raise SystemExit(stage_profile.run(main))
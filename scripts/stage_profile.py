@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""Opt-in profiling for pipeline scripts, plus a per-run merge helper.
+
+Every script ends with `raise SystemExit(stage_profile.run(main))`. Profiling is enabled by the
+`--profile` flag (removed before the script parses its own arguments) or `PDFOR_PROFILE=1`;
+`--profile-memory` / `PDFOR_PROFILE_MEMORY=1` also tracks allocations with tracemalloc. When neither is
+set, `run()` just calls `main()`.
+
+Output goes to `<PDFOR_PROFILE_DIR or logs/profiles>/<run_id>/`, where `run_id` comes from
+`PDFOR_RUN_ID` or the script's own `--run-id` argument (`adhoc` otherwise):
+
+- `<stage>-<pid>.prof`: cProfile stats (`python -m pstats`, snakeviz, ...),
+- `<stage>-<pid>.json`: wall and CPU time, exit code, top functions and, with memory tracking,
+  the tracemalloc peak and top allocation sites.
+
+Threads started while `main()` runs (thread pools, pipeline stages) get their own profiler through
+`threading.setprofile`, merged into the stage's stats at exit. Only the main process is profiled;
+process-pool workers are not.
+"""
+
+from __future__ import annotations
+
+import argparse
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+
+DEFAULT_PROFILE_DIR = "logs/profiles"
+TOP_FUNCTIONS = 25
+TOP_ALLOCATIONS = 15
+
+
+def _enabled(flag: str, env: str) -> bool:
+    return flag in sys.argv[1:] or os.environ.get(env, "").lower() in ("1", "true", "yes")
+
+
+def _argv_run_id(argv: List[str]) -> str | None:
+    for i, arg in enumerate(argv):
+        if arg == "--run-id" and i + 1 < len(argv):
+            return argv[i + 1]
+        if arg.startswith("--run-id="):
+            return arg.split("=", 1)[1]
+    return None
+
+
+def run_dir(run_id: str, profile_dir: str | Path | None = None) -> Path:
+    root = Path(profile_dir or os.environ.get("PDFOR_PROFILE_DIR") or DEFAULT_PROFILE_DIR)
+    return root / run_id
+
+
+def _top_functions(profiler: cProfile.Profile | pstats.Stats, limit: int = TOP_FUNCTIONS) -> List[Dict[str, Any]]:
+    stats = profiler if isinstance(profiler, pstats.Stats) else pstats.Stats(profiler, stream=io.StringIO())
+    rows = []
+    for (filename, line, name), (cc, nc, tt, ct, _callers) in stats.stats.items():  # type: ignore[attr-defined]
+        rows.append(
+            {
+                "function": f"{Path(filename).name}:{line}({name})" if line else name,
+                "calls": nc,
+                "primitive_calls": cc,
+                "tottime_s": round(tt, 6),
+                "cumtime_s": round(ct, 6),
+            }
+        )
+    rows.sort(key=lambda row: row["cumtime_s"], reverse=True)
+    return rows[:limit]
+
+
+def _top_allocations(snapshot: tracemalloc.Snapshot, limit: int = TOP_ALLOCATIONS) -> List[Dict[str, Any]]:
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+    return [
+        {"location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}", "size_bytes": stat.size, "count": stat.count}
+        for stat in snapshot.statistics("lineno")[:limit]
+    ]
+
+
+class _ThreadProfilers:
+    """Starts one cProfile profiler in every new thread (installed with `threading.setprofile`)."""
+
+    def __init__(self) -> None:
+        self.profilers: List[cProfile.Profile] = []
+        self.lock = threading.Lock()
+
+    def __call__(self, frame: Any, event: str, arg: Any) -> None:
+        sys.setprofile(None)
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            return  # Python 3.12+: the main profiler already sees every thread
+        with self.lock:
+            self.profilers.append(profiler)
+
+    def merge_into(self, stats: pstats.Stats) -> int:
+        merged = 0
+        with self.lock:
+            profilers, self.profilers = self.profilers, []
+        for profiler in profilers:
+            try:
+                stats.add(profiler)
+            except TypeError:
+                continue  # thread recorded no calls
+            merged += 1
+        return merged
+
+
+def run(main: Callable[[], int], stage: str | None = None) -> int:
+    """Call `main()`, profiling it when `--profile`/`--profile-memory` or the env switches are on."""
+    memory = _enabled("--profile-memory", "PDFOR_PROFILE_MEMORY")
+    if not (memory or _enabled("--profile", "PDFOR_PROFILE")):
+        return main()
+    sys.argv = [sys.argv[0]] + [a for a in sys.argv[1:] if a not in ("--profile", "--profile-memory")]
+
+    stage = stage or Path(sys.argv[0]).stem
+    run_id = os.environ.get("PDFOR_RUN_ID") or _argv_run_id(sys.argv[1:]) or "adhoc"
+    profiler = cProfile.Profile()
+    threads = _ThreadProfilers()
+    if memory:
+        tracemalloc.start(1)
+    exit_code: Any = None
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        threading.setprofile(threads)
+        profiler.enable()
+        exit_code = main()
+        return exit_code
+    except SystemExit as exc:
+        exit_code = exc.code
+        raise
+    except BaseException as exc:
+        exit_code = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        profiler.disable()
+        threading.setprofile(None)
+        wall_s, cpu_s = time.perf_counter() - wall_start, time.process_time() - cpu_start
+        report: Dict[str, Any] = {
+            "stage": stage,
+            "run_id": run_id,
+            "pid": os.getpid(),
+            "argv": sys.argv[1:],
+            "started": time.time() - wall_s,
+            "wall_s": round(wall_s, 6),
+            "cpu_s": round(cpu_s, 6),
+            "exit_code": exit_code,
+        }
+        if memory:
+            _, peak = tracemalloc.get_traced_memory()
+            report["memory"] = {"peak_bytes": peak, "top_allocations": _top_allocations(tracemalloc.take_snapshot())}
+            tracemalloc.stop()
+        stats = pstats.Stats(profiler, stream=io.StringIO())
+        report["threads_profiled"] = threads.merge_into(stats)
+        _write(report, stats, run_dir(run_id))
+
+
+def _write(report: Dict[str, Any], stats: pstats.Stats, out_dir: Path) -> None:
+    try:
+        out_dir.mkdir(parents=True, exist_ok=True)
+        base = out_dir / f"{report['stage']}-{report['pid']}"
+        stats.dump_stats(str(base) + ".prof")
+        report["profile_path"] = str(base) + ".prof"
+        report["top_functions"] = _top_functions(stats)
+        Path(str(base) + ".json").write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    except OSError as exc:
+        print(f"stage_profile: could not write profile to {out_dir}: {exc}", file=sys.stderr)
+
+
+def merge_run(run_id: str, profile_dir: str | Path | None = None, top: int = TOP_FUNCTIONS) -> Dict[str, Any]:
+    """Combine every stage profile of a run into `merged.prof` and a per-stage time summary."""
+    directory = run_dir(run_id, profile_dir)
+    profiles = sorted(p for p in directory.glob("*.prof") if p.name != "merged.prof")
+    if not profiles:
+        raise FileNotFoundError(f"no profiles under {directory}")
+    stats = pstats.Stats(str(profiles[0]), stream=io.StringIO())
+    for path in profiles[1:]:
+        stats.add(str(path))
+    merged_path = directory / "merged.prof"
+    stats.dump_stats(str(merged_path))
+
+    stages: Dict[str, Dict[str, Any]] = {}
+    for path in profiles:
+        sidecar = path.with_suffix(".json")
+        if not sidecar.exists():
+            continue
+        report = json.loads(sidecar.read_text(encoding="utf-8"))
+        row = stages.setdefault(report["stage"], {"runs": 0, "wall_s": 0.0, "cpu_s": 0.0, "peak_bytes": 0})
+        row["runs"] += 1
+        row["wall_s"] = round(row["wall_s"] + report["wall_s"], 6)
+        row["cpu_s"] = round(row["cpu_s"] + report["cpu_s"], 6)
+        row["peak_bytes"] = max(row["peak_bytes"], report.get("memory", {}).get("peak_bytes", 0))
+    summary = {
+        "run_id": run_id,
+        "profiles": len(profiles),
+        "merged_profile": str(merged_path),
+        "stages": dict(sorted(stages.items(), key=lambda item: item[1]["wall_s"], reverse=True)),
+        "top_functions": _top_functions(stats, top),
+    }
+    (directory / "merged.json").write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8")
+    return summary
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Merge the stage profiles of one run")
+    parser.add_argument("run_id")
+    parser.add_argument("--profile-dir", help=f"Profile root (default PDFOR_PROFILE_DIR or {DEFAULT_PROFILE_DIR})")
+    parser.add_argument("--top", type=int, default=TOP_FUNCTIONS)
+    args = parser.parse_args()
+
+    try:
+        summary = merge_run(args.run_id, args.profile_dir, args.top)
+    except FileNotFoundError as exc:
+        print(json.dumps({"status": "FAIL", "error": str(exc)}))
+        return 1
+    print(json.dumps({"status": "PASS", **{k: summary[k] for k in ("run_id", "profiles", "merged_profile", "stages")}}))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""Rotated, indexed trace segments and fast per-run lookup (T07.4).
+
+Layout next to the active log `logs/trace/trace.jsonl`:
+
+- `trace.jsonl` + `trace.jsonl.idx`: active segment and its index,
+- `trace-<UTC stamp>.jsonl[.gz]` + `.idx`: rotated segments (optionally gzip-compressed).
+
+Every written batch adds one index line per `(run_id, trace_id)` it contains:
+`{"run_id", "trace_id", "offset", "length", "lines", "ts"}`, where `offset`/`length` is the batch's
+byte range in the uncompressed segment. Compression writes each batch as its own gzip member and adds
+`gz_offset`/`gz_length`, so a lookup still reads only the members holding that run. Appends and
+rotation run under an `flock` on `<log>.lock`, so several processes can share one log.
+"""
+
+from __future__ import annotations
+
+import argparse
+import fcntl
+import gzip
+import json
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+import stage_profile
+
+
+INDEX_SUFFIX = ".idx"
+REINDEX_BATCH_LINES = 1000
+
+
+def index_path(segment: Path) -> Path:
+    return segment.with_name(segment.name + INDEX_SUFFIX)
+
+
+@contextmanager
+def locked(log_file: Path) -> Iterator[None]:
+    log_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(log_file.with_name(log_file.name + ".lock"), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _index_lines(batch: List[Tuple[str, str | None, str | None]], offset: int, length: int) -> str:
+    counts: Dict[Tuple[str | None, str | None], int] = {}
+    for _, run_id, trace_id in batch:
+        key = (run_id, trace_id)
+        counts[key] = counts.get(key, 0) + 1
+    now = round(time.time(), 3)
+    return "".join(
+        json.dumps({"run_id": r, "trace_id": t, "offset": offset, "length": length, "lines": n, "ts": now}) + "\n"
+        for (r, t), n in counts.items()
+    )
+
+
+def _segment_started(log_file: Path) -> float | None:
+    try:
+        with index_path(log_file).open("r", encoding="utf-8") as fh:
+            return float(json.loads(fh.readline())["ts"])
+    except (OSError, ValueError, KeyError):
+        try:
+            return log_file.stat().st_mtime
+        except OSError:
+            return None
+
+
+def append_batch(
+    log_file: Path,
+    batch: List[Tuple[str, str | None, str | None]],
+    max_bytes: int | None = None,
+    rotate_s: float | None = None,
+    index: bool = True,
+) -> Path | None:
+    """Append `(line, run_id, trace_id)` rows as one write; returns the rotated segment, if any.
+
+    The active segment is rotated first when it has reached `max_bytes` or is older than `rotate_s`.
+    """
+    data = ("\n".join(line for line, _, _ in batch) + "\n").encode("utf-8")
+    rotated = None
+    with locked(log_file):
+        size = log_file.stat().st_size if log_file.exists() else 0
+        if size and (
+            (max_bytes and size + len(data) > max_bytes)
+            or (rotate_s and time.time() - (_segment_started(log_file) or time.time()) >= rotate_s)
+        ):
+            rotated = _rotate_locked(log_file)
+            size = 0
+        with log_file.open("ab") as fh:
+            fh.write(data)
+        if index:
+            with index_path(log_file).open("a", encoding="utf-8") as fh:
+                fh.write(_index_lines(batch, size, len(data)))
+    return rotated
+
+
+def _rotate_locked(log_file: Path) -> Path:
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    target = log_file.with_name(f"{log_file.stem}-{stamp}{log_file.suffix}")
+    log_file.replace(target)
+    if index_path(log_file).exists():
+        index_path(log_file).replace(index_path(target))
+    return target
+
+
+def read_index(path: Path) -> List[Dict[str, Any]]:
+    entries = []
+    with path.open("r", encoding="utf-8") as fh:
+        for line in fh:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue  # torn line from a crash mid-append
+    return entries
+
+
+def _write_atomic_text(path: Path, text: str) -> None:
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", delete=False, dir=path.parent, prefix=f".{path.name}.") as tmp:
+        tmp.write(text)
+    Path(tmp.name).replace(path)
+
+
+def compress_segment(segment: Path, level: int = 6) -> Path:
+    """gzip a rotated segment batch by batch (one member per indexed range) and rewrite its index."""
+    entries = read_index(index_path(segment)) if index_path(segment).exists() else []
+    size = segment.stat().st_size
+    ranges = sorted({(e["offset"], e["length"]) for e in entries})
+    # Cover the whole file: bytes outside indexed ranges (pre-index data) become their own members.
+    regions: List[Tuple[int, int]] = []
+    cursor = 0
+    for offset, length in ranges:
+        if offset > cursor:
+            regions.append((cursor, offset - cursor))
+        if offset >= cursor:
+            regions.append((offset, length))
+            cursor = offset + length
+    if cursor < size:
+        regions.append((cursor, size - cursor))
+
+    target = segment.with_name(segment.name + ".gz")
+    members: Dict[Tuple[int, int], Tuple[int, int]] = {}
+    with segment.open("rb") as src, tempfile.NamedTemporaryFile("wb", delete=False, dir=segment.parent) as tmp:
+        for offset, length in regions:
+            src.seek(offset)
+            member = gzip.compress(src.read(length), compresslevel=level, mtime=0)
+            members[(offset, length)] = (tmp.tell(), len(member))
+            tmp.write(member)
+    Path(tmp.name).replace(target)
+    for entry in entries:
+        entry["gz_offset"], entry["gz_length"] = members[(entry["offset"], entry["length"])]
+    _write_atomic_text(index_path(target), "".join(json.dumps(e) + "\n" for e in entries))
+    index_path(segment).unlink(missing_ok=True)
+    segment.unlink()
+    return target
+
+
+def build_index(segment: Path, batch_lines: int = REINDEX_BATCH_LINES) -> int:
+    """Index an existing (unindexed, uncompressed) segment in ranges of `batch_lines` lines."""
+    out: List[str] = []
+    batch: List[Tuple[str, str | None, str | None]] = []
+    offset = start = 0
+    with segment.open("rb") as fh:
+        for raw in fh:
+            try:
+                record = json.loads(raw)
+                batch.append(("", record.get("run_id"), record.get("trace_id")))
+            except ValueError:
+                pass
+            offset += len(raw)
+            if len(batch) >= batch_lines:
+                out.append(_index_lines(batch, start, offset - start))
+                batch, start = [], offset
+    if offset > start:
+        out.append(_index_lines(batch, start, offset - start))
+    _write_atomic_text(index_path(segment), "".join(out))
+    return len(out)
+
+
+def segments(log_file: Path) -> List[Path]:
+    """Indexed segments for `log_file`, oldest first, active last; compressed copies win."""
+    pattern = f"{log_file.stem}-*{log_file.suffix}*{INDEX_SUFFIX}"
+    found = sorted(p.with_name(p.name[: -len(INDEX_SUFFIX)]) for p in log_file.parent.glob(pattern))
+    rotated = [p for p in found if not (p.suffix != ".gz" and p.with_name(p.name + ".gz") in found)]
+    if index_path(log_file).exists():
+        rotated.append(log_file)
+    return rotated
+
+
+def query_segment(segment: Path, run_id: str, trace_id: str | None = None) -> Iterator[str]:
+    """Yield raw JSON lines of one run from one indexed segment, reading only its ranges."""
+    try:
+        entries = read_index(index_path(segment))
+        fh = segment.open("rb")
+    except FileNotFoundError:
+        return  # compressed or rotated away between listing and reading
+    wanted = sorted(
+        {
+            (e.get("gz_offset", e["offset"]), e.get("gz_length", e["length"]))
+            for e in entries
+            if e.get("run_id") == run_id and (trace_id is None or e.get("trace_id") == trace_id)
+        }
+    )
+    compressed = segment.suffix == ".gz"
+    with fh:
+        for offset, length in wanted:
+            fh.seek(offset)
+            data = fh.read(length)
+            if compressed:
+                data = gzip.decompress(data)
+            for raw in data.splitlines():
+                if run_id.encode() not in raw:
+                    continue
+                try:
+                    record = json.loads(raw)
+                except ValueError:
+                    continue
+                if record.get("run_id") == run_id and (trace_id is None or record.get("trace_id") == trace_id):
+                    yield raw.decode("utf-8")
+
+
+def query(log_file: Path, run_id: str, trace_id: str | None = None) -> Iterator[str]:
+    """Yield one run's lines (optionally one trace) across all segments of `log_file`, oldest first."""
+    for segment in segments(log_file):
+        yield from query_segment(segment, run_id, trace_id)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Look up one run's trace events via the segment index")
+    parser.add_argument("--log-file", type=Path, default=Path(os.environ.get("PDFOR_TRACE_LOG") or "logs/trace/trace.jsonl"))
+    parser.add_argument("--run-id", help="Print this run's events (JSONL)")
+    parser.add_argument("--trace-id")
+    parser.add_argument("--reindex", nargs="*", type=Path, metavar="SEGMENT", help="Build indexes for unindexed segments")
+    parser.add_argument("--compress", nargs="*", type=Path, metavar="SEGMENT", help="gzip rotated segments")
+    args = parser.parse_args()
+
+    if args.reindex is not None:
+        for segment in args.reindex or [args.log_file]:
+            with locked(args.log_file):
+                print(json.dumps({"segment": str(segment), "index_entries": build_index(segment)}))
+    if args.compress:
+        for segment in args.compress:
+            print(json.dumps({"segment": str(compress_segment(segment))}))
+    if args.run_id:
+        started = time.perf_counter()
+        count = 0
+        for line in query(args.log_file, args.run_id, args.trace_id):
+            sys.stdout.write(line + "\n")
+            count += 1
+        print(json.dumps({"run_id": args.run_id, "events": count, "elapsed_s": round(time.perf_counter() - started, 4)}), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(stage_profile.run(main))
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""In-process trace spans written as JSONL to `logs/trace/trace.jsonl` (T07.4).
+
+Stage functions are wrapped with `@tracing.traced(stage)` or `with tracing.span(stage):`. Tracing
+is off unless `configure()` is called or `PDFOR_TRACE_LOG` is set; when off, a decorated call
+costs one global lookup. When on, finished spans go to a buffered writer (lock-protected, flushed
+every `flush_interval_s`, when the buffer fills, and at exit), so no per-event process or open().
+
+Span records keep the `emit_trace_log.py` event fields (`ts`, `run_id`, `trace_id`, `stage`,
+`status`, optional `job_id`/`file_id`/`page_range`/`details`) and add `span_id`, `parent_id`,
+`end_ts`, `duration_ms` and free-form `attrs`. Environment:
+
+- `PDFOR_TRACE_LOG`: trace file; enables tracing,
+- `PDFOR_RUN_ID` / `PDFOR_TRACE_ID`: defaults for spans without their own (trace_id falls back
+  to run_id),
+- `PDFOR_TRACE_FLUSH_S`: flush interval (default 1.0),
+- `PDFOR_TRACE_MAX_BYTES` / `PDFOR_TRACE_ROTATE_S`: rotate the log by size (default 256 MiB, `0`
+  disables) and/or age, `PDFOR_TRACE_COMPRESS=1`: gzip rotated segments (see `trace_store.py`).
+"""
+
+from __future__ import annotations
+
+import atexit
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple, TypeVar
+
+import trace_store
+
+
+DEFAULT_LOG_FILE = "logs/trace/trace.jsonl"
+CORRELATION_FIELDS = ("job_id", "file_id", "page_range", "details")
+DEFAULT_MAX_BYTES = 256 << 20
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class TraceWriter:
+    """Append JSON lines to one file from many threads, batching writes; rotates and indexes segments."""
+
+    def __init__(
+        self,
+        path: Path,
+        flush_interval_s: float = 1.0,
+        max_buffer: int = 1000,
+        max_bytes: int | None = DEFAULT_MAX_BYTES,
+        rotate_s: float | None = None,
+        compress: bool = False,
+    ) -> None:
+        self.path = Path(path)
+        self.flush_interval_s = flush_interval_s
+        self.max_buffer = max_buffer
+        self.max_bytes = max_bytes
+        self.rotate_s = rotate_s
+        self.compress = compress
+        self._buffer: List[Tuple[str, str | None, str | None]] = []
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._buffer.append((line, record.get("run_id"), record.get("trace_id")))
+            full = len(self._buffer) >= self.max_buffer
+            if self._thread is None and self.flush_interval_s > 0:
+                self._thread = threading.Thread(target=self._run, name="trace-flush", daemon=True)
+                self._thread.start()
+        if full:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._io_lock:
+            with self._lock:
+                lines, self._buffer = self._buffer, []
+            if lines:
+                self._append(lines)
+
+    def _append(self, lines: List[Tuple[str, str | None, str | None]]) -> None:
+        # One write() per batch under the log's flock keeps lines from concurrent processes whole.
+        rotated = trace_store.append_batch(self.path, lines, self.max_bytes, self.rotate_s)
+        if rotated is not None and self.compress:
+            trace_store.compress_segment(rotated)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval_s):
+            self.flush()
+
+    def close(self) -> None:
+        self._stop.set()
+        self.flush()
+
+    def _after_fork(self) -> None:
+        # The parent flushes its own buffer; the child must not write it a second time.
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+
+class Tracer:
+    def __init__(self, writer: TraceWriter, run_id: str | None = None, trace_id: str | None = None) -> None:
+        self.writer = writer
+        self.run_id = run_id
+        self.trace_id = trace_id
+
+
+class Span:
+    """One timed stage; fields set via `set()` end up in the record (correlation fields top-level)."""
+
+    __slots__ = ("tracer", "stage", "span_id", "parent", "fields", "status", "_start", "_start_ts", "_token")
+
+    def __init__(self, tracer: Tracer, stage: str, parent: "Span | None", fields: Dict[str, Any]) -> None:
+        self.tracer = tracer
+        self.stage = stage
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent = parent
+        self.fields = fields
+        self.status = "ok"
+
+    def set(self, **fields: Any) -> None:
+        self.fields.update(fields)
+
+    def set_status(self, status: str) -> None:
+        self.status = status
+
+    def _inherited(self, key: str) -> Any:
+        span: Span | None = self
+        while span is not None:
+            if span.fields.get(key) is not None:
+                return span.fields[key]
+            span = span.parent
+        return None
+
+    def __enter__(self) -> "Span":
+        self._start_ts = time.time()
+        self._start = time.perf_counter()
+        self._token = _CURRENT.set(self)
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        duration_ms = (time.perf_counter() - self._start) * 1000
+        _CURRENT.reset(self._token)
+        if exc_type is not None and self.status == "ok":
+            self.status = "error"
+            self.fields.setdefault("details", f"{exc_type.__name__}: {exc}"[:500])
+        run_id = self._inherited("run_id") or self.tracer.run_id
+        record: Dict[str, Any] = {
+            "ts": _iso(self._start_ts),
+            "run_id": run_id,
+            "trace_id": self._inherited("trace_id") or self.tracer.trace_id or run_id,
+            "stage": self.stage,
+            "status": self.status,
+        }
+        attrs: Dict[str, Any] = {}
+        for key, value in self.fields.items():
+            if key in ("run_id", "trace_id") or value is None:
+                continue
+            if key in CORRELATION_FIELDS:
+                record[key] = value
+            else:
+                attrs[key] = value
+        record["span_id"] = self.span_id
+        record["parent_id"] = self.parent.span_id if self.parent is not None else None
+        record["end_ts"] = _iso(self._start_ts + duration_ms / 1000)
+        record["duration_ms"] = round(duration_ms, 3)
+        if attrs:
+            record["attrs"] = attrs
+        self.tracer.writer.write(record)
+
+
+class _NullSpan:
+    """Stand-in when tracing is off; accepts the same calls and does nothing."""
+
+    span_id = None
+
+    def set(self, **fields: Any) -> None:
+        pass
+
+    def set_status(self, status: str) -> None:
+        pass
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+_CURRENT: contextvars.ContextVar[Span | None] = contextvars.ContextVar("pdfor_trace_span", default=None)
+_TRACER: Tracer | None = None
+_WRITERS: Dict[str, TraceWriter] = {}
+_STATE_LOCK = threading.Lock()
+
+
+def _iso(epoch_s: float) -> str:
+    return datetime.fromtimestamp(epoch_s, timezone.utc).isoformat()
+
+
+def _env_float(name: str) -> float | None:
+    value = os.environ.get(name)
+    return float(value) if value else None
+
+
+def get_writer(
+    log_file: str | Path,
+    flush_interval_s: float = 1.0,
+    max_bytes: int | None = None,
+    rotate_s: float | None = None,
+    compress: bool | None = None,
+) -> TraceWriter:
+    """Shared writer per file path so several tracers never interleave partial batches.
+
+    Rotation settings default to the `PDFOR_TRACE_*` environment and apply when the writer is created.
+    """
+    key = os.path.abspath(log_file)
+    with _STATE_LOCK:
+        writer = _WRITERS.get(key)
+        if writer is None:
+            if max_bytes is None:
+                env_bytes = _env_float("PDFOR_TRACE_MAX_BYTES")
+                max_bytes = DEFAULT_MAX_BYTES if env_bytes is None else int(env_bytes)
+            if rotate_s is None:
+                rotate_s = _env_float("PDFOR_TRACE_ROTATE_S")
+            if compress is None:
+                compress = os.environ.get("PDFOR_TRACE_COMPRESS", "").lower() in ("1", "true", "yes")
+            writer = _WRITERS[key] = TraceWriter(
+                Path(log_file), flush_interval_s, max_bytes=max_bytes or None, rotate_s=rotate_s or None, compress=compress
+            )
+        return writer
+
+
+def configure(
+    log_file: str | Path | None = None,
+    run_id: str | None = None,
+    trace_id: str | None = None,
+    flush_interval_s: float | None = None,
+) -> Tracer:
+    """Enable tracing for this process; arguments default to the `PDFOR_TRACE_*` environment."""
+    global _TRACER
+    interval = flush_interval_s if flush_interval_s is not None else float(os.environ.get("PDFOR_TRACE_FLUSH_S", 1.0))
+    writer = get_writer(log_file or os.environ.get("PDFOR_TRACE_LOG") or DEFAULT_LOG_FILE, interval)
+    _TRACER = Tracer(
+        writer,
+        run_id or os.environ.get("PDFOR_RUN_ID") or None,
+        trace_id or os.environ.get("PDFOR_TRACE_ID") or None,
+    )
+    return _TRACER
+
+
+def enabled() -> bool:
+    return _TRACER is not None
+
+
+def span(stage: str, **fields: Any) -> Span | _NullSpan:
+    """Context manager timing `stage`; nested spans record the enclosing one as parent."""
+    if _TRACER is None:
+        return _NULL_SPAN
+    return Span(_TRACER, stage, _CURRENT.get(), fields)
+
+
+def current() -> Span | _NullSpan:
+    return _CURRENT.get() or _NULL_SPAN
+
+
+def traced(stage: str | None = None, **fields: Any) -> Callable[[F], F]:
+    """Decorator form of `span()`. A non-zero int return (a CLI exit code) marks the span `error`."""
+
+    def decorate(fn: F) -> F:
+        name = stage or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if _TRACER is None:
+                return fn(*args, **kwargs)
+            with Span(_TRACER, name, _CURRENT.get(), dict(fields)) as sp:
+                result = fn(*args, **kwargs)
+                if isinstance(result, int) and not isinstance(result, bool) and result != 0:
+                    sp.set_status("error")
+                    sp.set(exit_code=result)
+                return result
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
+
+
+def propagate(fn: F) -> F:
+    """Bind `fn` to the caller's span so work submitted to a thread pool nests under it."""
+    if _TRACER is None:
+        return fn
+    ctx = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        return ctx.copy().run(fn, *args, **kwargs)
+
+    return wrapper  # type: ignore[return-value]
+
+
+def event(
+    stage: str,
+    status: str = "ok",
+    run_id: str | None = None,
+    trace_id: str | None = None,
+    log_file: str | Path | None = None,
+    **fields: Any,
+) -> Dict[str, Any]:
+    """Write one point-in-time event (no duration), e.g. a workflow branch boundary."""
+    run_id = run_id or (_TRACER.run_id if _TRACER else None)
+    record: Dict[str, Any] = {
+        "ts": _iso(time.time()),
+        "run_id": run_id,
+        "trace_id": trace_id or (_TRACER.trace_id if _TRACER else None) or run_id,
+        "stage": stage,
+        "status": status,
+    }
+    for key in CORRELATION_FIELDS:
+        if fields.get(key):
+            record[key] = fields[key]
+    parent = _CURRENT.get()
+    if parent is not None:
+        record["parent_id"] = parent.span_id
+    if log_file is not None:
+        writer = get_writer(log_file)
+    elif _TRACER is not None:
+        writer = _TRACER.writer
+    else:
+        writer = get_writer(os.environ.get("PDFOR_TRACE_LOG") or DEFAULT_LOG_FILE)
+    writer.write(record)
+    return record
+
+
+def flush() -> None:
+    with _STATE_LOCK:
+        writers = list(_WRITERS.values())
+    for writer in writers:
+        writer.flush()
+
+
+def shutdown() -> None:
+    with _STATE_LOCK:
+        writers = list(_WRITERS.values())
+    for writer in writers:
+        writer.close()
+
+
+def _after_fork_in_child() -> None:
+    for writer in _WRITERS.values():
+        writer._after_fork()
+
+
+atexit.register(shutdown)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+if os.environ.get("PDFOR_TRACE_LOG"):
+    configure()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""Persistent segment-level translation memory for OCR routing (T06.3)."""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import tempfile
+import unicodedata
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable
+
+from payload_store import iter_payloads
+import stage_profile
+
+
+MEMORY_VERSION = 1
+
+
+def normalize_source(text: str) -> str:
+    """NFKC-fold and collapse whitespace so trivially different OCR reads share a key."""
+    return " ".join(unicodedata.normalize("NFKC", text or "").split())
+
+
+def file_hash(path: str | None) -> str | None:
+    if not path:
+        return None
+    target = Path(path)
+    if not target.is_file():
+        return None
+    digest = hashlib.sha256()
+    with target.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def memory_key(
+    source_text: str,
+    lang_in: str,
+    lang_out: str,
+    service: str,
+    prompt_hash: str | None,
+    glossary_hash: str | None,
+) -> str:
+    parts = [normalize_source(source_text), lang_in, lang_out, service, prompt_hash or "", glossary_hash or ""]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def load_memory(path: Path | None) -> Dict[str, Dict[str, Any]]:
+    if not path or not path.exists():
+        return {}
+    data = json.loads(path.read_text(encoding="utf-8"))
+    if data.get("version") != MEMORY_VERSION:
+        return {}
+    return data.get("entries", {})
+
+
+def save_memory(path: Path, entries: Dict[str, Dict[str, Any]]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", delete=False, dir=path.parent) as tmp:
+        tmp.write(json.dumps({"version": MEMORY_VERSION, "entries": entries}, ensure_ascii=False) + "\n")
+        tmp_path = Path(tmp.name)
+    tmp_path.replace(path)
+
+
+def record_translations(
+    entries: Dict[str, Dict[str, Any]],
+    payloads: Iterable[Dict[str, Any]],
+    translations: Dict[str, str],
+) -> int:
+    """Store provider results for routed payloads; returns the number of new/updated entries."""
+    stored = 0
+    now = datetime.now(timezone.utc).isoformat()
+    for payload in payloads:
+        key = payload.get("memory_key")
+        translated = translations.get(str(payload.get("segment_id")))
+        if not key or translated is None:
+            continue
+        entries[key] = {
+            "source_text": normalize_source(payload.get("source_text", "")),
+            "translated_text": translated,
+            "service": payload.get("service"),
+            "updated_at": now,
+        }
+        stored += 1
+    return stored
+
+
+def fan_out(
+    translations: Dict[str, str],
+    fanout: Dict[str, Any],
+) -> Dict[str, str]:
+    """Expand provider results plus memory hits back to every original segment_id."""
+    out: Dict[str, str] = {}
+    for seg_id, translated in translations.items():
+        out[seg_id] = translated
+        for dup_id in fanout.get("duplicates", {}).get(seg_id, []):
+            out[dup_id] = translated
+    for hit in fanout.get("memory_hits", []):
+        out[hit["segment_id"]] = hit["translated_text"]
+    return out
+
+
+def _translations_map(rows: Any) -> Dict[str, str]:
+    if isinstance(rows, dict):
+        rows = [rows]
+    return {
+        str(row["segment_id"]): str(row["translated_text"])
+        for row in rows
+        if row.get("segment_id") and row.get("translated_text") is not None
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Update translation memory and fan results out to segments")
+    parser.add_argument("translations", type=Path, help="JSON array of {segment_id, translated_text}")
+    parser.add_argument("--payloads", type=Path, required=True, help="translation-payloads.json (or compact directory) from routing")
+    parser.add_argument("--fanout", type=Path, help="fanout.json from routing")
+    parser.add_argument("--memory-path", type=Path, default=Path("logs/ocr/translation-memory.json"))
+    parser.add_argument("--output", type=Path, default=Path("logs/ocr/translated-segments.json"))
+    args = parser.parse_args()
+
+    translations = _translations_map(json.loads(args.translations.read_text()))
+    fanout = json.loads(args.fanout.read_text()) if args.fanout else {}
+
+    entries = load_memory(args.memory_path)
+    stored = record_translations(entries, iter_payloads(args.payloads), translations)
+    save_memory(args.memory_path, entries)
+
+    expanded = fan_out(translations, fanout)
+    rows = [{"segment_id": seg_id, "translated_text": text} for seg_id, text in sorted(expanded.items())]
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(rows, ensure_ascii=False, indent=2) + "\n")
+
+    print(
+        json.dumps(
+            {
+                "status": "PASS",
+                "stored": stored,
+                "memory_entries": len(entries),
+                "segments": len(rows),
+                "output": str(args.output),
+            }
+        )
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(stage_profile.run(main))
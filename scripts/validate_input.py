@@ -9,6 +9,9 @@ import mimetypes
 from pathlib import Path
 from typing import Dict, Iterable, List, Tuple
 
+import stage_profile
+import tracing
+
 
 def _read_bytes(path: Path) -> bytes:
     return path.read_bytes()
@@ -83,6 +86,7 @@ def collect_files(payload: dict) -> List[Path]:
     raise ValueError(f"Unsupported mode: {mode}")
 
 
+@tracing.traced()
 def validate_payload(payload: dict) -> Dict[str, List[str]]:
     errors: List[str] = []
     warnings: List[str] = []
@@ -122,6 +126,7 @@ def validate_payload(payload: dict) -> Dict[str, List[str]]:
     return {"errors": errors, "warnings": warnings}
 
 
+@tracing.traced("validate_input")
 def main() -> int:
     parser = argparse.ArgumentParser(description="Validate intake payload and PDF files.")
     parser.add_argument("payload", type=Path, help="Path to JSON payload file")
@@ -145,4 +150,4 @@ def main() -> int:
 
 
 if __name__ == "__main__":
-    raise SystemExit(main())
+    raise SystemExit(stage_profile.run(main))
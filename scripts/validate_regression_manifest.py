@@ -8,8 +8,41 @@ import json
 from pathlib import Path
 from typing import Any, Dict, List
 
+import stage_profile
+
 
 REQUIRED_KEYS = {"sample_id", "category", "input_file", "expected_checks"}
+THRESHOLD_KEYS = {"max_layout_shift", "min_block_iou", "min_content_bbox_iou", "max_phash_distance"}
+
+
+DEFAULT_THRESHOLDS_PATH = Path("configs/visual-thresholds.json")
+
+
+def load_thresholds(path: Path | None) -> Any:
+    """Per-category visual thresholds (`default` plus categories); `{}` when the file is absent."""
+    if path is None or not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def thresholds_for(category: str | None, thresholds: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    return {**thresholds.get("default", {}), **thresholds.get(str(category), {})}
+
+
+def validate_thresholds(thresholds: Any) -> List[str]:
+    if not isinstance(thresholds, dict):
+        return ["thresholds:not_object"]
+    errs: List[str] = []
+    for category, limits in thresholds.items():
+        if not isinstance(limits, dict):
+            errs.append(f"thresholds[{category}]:not_object")
+            continue
+        for key, value in limits.items():
+            if key not in THRESHOLD_KEYS:
+                errs.append(f"thresholds[{category}]:unknown_key:{key}")
+            elif isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+                errs.append(f"thresholds[{category}]:invalid_value:{key}")
+    return errs
 
 
 def validate_entry(entry: Dict[str, Any]) -> List[str]:
@@ -33,6 +66,12 @@ def validate_entry(entry: Dict[str, Any]) -> List[str]:
 def main() -> int:
     parser = argparse.ArgumentParser(description="Validate regression sample manifest")
     parser.add_argument("manifest", type=Path, help="Path to regression manifest JSON")
+    parser.add_argument(
+        "--thresholds",
+        type=Path,
+        default=DEFAULT_THRESHOLDS_PATH,
+        help="Per-category visual thresholds JSON (checked when present)",
+    )
     args = parser.parse_args()
 
     data = json.loads(args.manifest.read_text())
@@ -40,7 +79,7 @@ def main() -> int:
         print("MANIFEST_INVALID:root_not_array")
         return 1
 
-    all_errors: List[str] = []
+    all_errors: List[str] = validate_thresholds(load_thresholds(args.thresholds))
     ids = set()
     for i, entry in enumerate(data):
         if not isinstance(entry, dict):
@@ -64,4 +103,4 @@ def main() -> int:
 
 
 if __name__ == "__main__":
-    raise SystemExit(main())
+    raise SystemExit(stage_profile.run(main))
@@ -5,10 +5,19 @@ from __future__ import annotations
 
 import argparse
 import json
+import os
 import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 from typing import Any, Dict, List
 
+import page_ranges
+from pdf_structure import cached_inspect, structure_reasons
+import stage_profile
+import tracing
+
 
 NAME_RE = re.compile(r"^.+-ja_ru-\d{8}T\d{6}Z-bilingual\.pdf$")
 
@@ -21,8 +30,10 @@ def _is_pdf(path: Path) -> bool:
         return False
 
 
-def verify_record(rec: Dict[str, Any]) -> Dict[str, Any]:
+def verify_record(rec: Dict[str, Any], deep: bool = False, cache_dir: Path | None = None) -> Dict[str, Any]:
+    """Header/name checks; `deep` adds trailer, xref and page-count checks against the source's `page_range`."""
     reasons: List[str] = []
+    structure: Dict[str, Any] | None = None
 
     for key in ("run_id", "job_id", "file_id", "output_file"):
         if not rec.get(key):
@@ -38,8 +49,10 @@ def verify_record(rec: Dict[str, Any]) -> Dict[str, Any]:
             reasons.append("output_invalid_pdf_header")
         if not NAME_RE.match(output.name):
             reasons.append("output_name_policy_mismatch")
+        if deep:
+            structure = _deep_check(rec, output, cache_dir, reasons)
 
-    return {
+    result = {
         "run_id": rec.get("run_id"),
         "job_id": rec.get("job_id"),
         "file_id": rec.get("file_id"),
@@ -47,30 +60,93 @@ def verify_record(rec: Dict[str, Any]) -> Dict[str, Any]:
         "status": "PASS" if not reasons else "FAIL",
         "reasons": reasons,
     }
+    if structure is not None:
+        result["structure"] = structure
+    return result
+
+
+def _deep_check(rec: Dict[str, Any], output: Path, cache_dir: Path | None, reasons: List[str]) -> Dict[str, Any]:
+    info, hit = cached_inspect(output, cache_dir)
+    reasons.extend(structure_reasons(info))
+    structure = {
+        "bytes": info.get("bytes", 0),
+        "xref_kind": info.get("xref_kind"),
+        "xref_errors": info.get("xref_errors", []),
+        "output_pages": info.get("page_count"),
+        "source_pages": None,
+        "cache_hit": hit,
+    }
 
-
-def summarize(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    source = rec.get("source_file") or rec.get("input_file")
+    if source and Path(str(source)).is_file():
+        src_info, _ = cached_inspect(Path(str(source)), cache_dir)
+        structure["source_pages"] = src_info.get("page_count")
+        if src_info.get("page_count") is None:
+            reasons.append("source_page_count_unknown")
+            return structure
+        # Chunked and rerun records only cover their own page_range of the source.
+        try:
+            expected = page_ranges.page_count(page_ranges.clamp(page_ranges.parse(rec.get("page_range")), src_info["page_count"]))
+        except ValueError:
+            reasons.append("invalid_page_range")
+            return structure
+        structure["expected_pages"] = expected
+        if info.get("page_count") is not None and info["page_count"] < expected:
+            reasons.append("output_pages_less_than_source")
+    return structure
+
+
+@tracing.traced()
+def verify_records(
+    records: List[Dict[str, Any]], deep: bool, cache_dir: Path | None, max_workers: int
+) -> List[Dict[str, Any]]:
+    check = partial(verify_record, deep=deep, cache_dir=cache_dir)
+    if not deep or max_workers <= 1 or len(records) <= 1:
+        return [check(r) for r in records]
+    chunksize = max(1, len(records) // (max_workers * 8))
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(check, records, chunksize=chunksize))
+
+
+def summarize(results: List[Dict[str, Any]], elapsed_s: float | None = None) -> Dict[str, Any]:
     failed = sum(1 for r in results if r["status"] == "FAIL")
-    return {
+    summary: Dict[str, Any] = {
         "total": len(results),
         "passed": len(results) - failed,
         "failed": failed,
         "status": "PASS" if failed == 0 else "FAIL",
     }
+    if elapsed_s is not None:
+        structures = [r["structure"] for r in results if "structure" in r]
+        total_bytes = sum(s["bytes"] for s in structures)
+        summary["throughput"] = {
+            "elapsed_s": round(elapsed_s, 3),
+            "files_per_s": round(len(results) / elapsed_s, 1) if elapsed_s > 0 else None,
+            "mb_per_s": round(total_bytes / 1e6 / elapsed_s, 1) if elapsed_s > 0 else None,
+            "bytes_inspected": total_bytes,
+            "cache_hits": sum(1 for s in structures if s["cache_hit"]),
+        }
+    return summary
 
 
 def main() -> int:
     parser = argparse.ArgumentParser(description="Verify bilingual output artifacts")
     parser.add_argument("records", type=Path, help="JSON array with output artifact records")
     parser.add_argument("--output", type=Path, default=Path("logs/artifact-verification.json"))
+    parser.add_argument("--deep", action="store_true", help="Also check trailer/%%%%EOF, xref and page count vs source")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--cache-dir", type=Path, default=Path("logs/cache/pdf-structure"))
+    parser.add_argument("--no-cache", action="store_true")
     args = parser.parse_args()
 
     records = json.loads(args.records.read_text())
     if isinstance(records, dict):
         records = [records]
 
-    results = [verify_record(r) for r in records]
-    summary = summarize(results)
+    started = time.perf_counter()
+    cache_dir = None if args.no_cache else args.cache_dir
+    results = verify_records(records, args.deep, cache_dir, args.max_workers)
+    summary = summarize(results, time.perf_counter() - started if args.deep else None)
     payload = {"summary": summary, "results": results}
 
     args.output.parent.mkdir(parents=True, exist_ok=True)
@@ -80,4 +156,4 @@ def main() -> int:
 
 
 if __name__ == "__main__":
-    raise SystemExit(main())
+    raise SystemExit(stage_profile.run(main))
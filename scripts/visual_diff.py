@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""Pixel-level visual fidelity metrics between source and bilingual output pages (T08.3).
+
+Pages are rendered to grayscale PGM through `rasterize_pages` (cached by PDF content hash) and
+compared with vectorized NumPy operations:
+- `layout_shift`: largest block-band displacement (vertical per column band, horizontal per row
+  band) that best aligns source and output ink profiles, as a fraction of the page size,
+- `block_iou`: IoU of the occupied-block masks (where text/figures sit on the page),
+- `content_bbox_iou`: IoU of the overall ink bounding boxes,
+- `phash_distance`: Hamming distance (0..64) between DCT perceptual hashes.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from rasterize_pages import rasterize
+import stage_profile
+import tracing
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+
+DEFAULT_THRESHOLDS = {
+    "max_layout_shift": 0.02,
+    "min_block_iou": 0.6,
+    "min_content_bbox_iou": 0.8,
+    "max_phash_distance": 24,
+}
+INK_LEVEL = 128
+BLOCK_PX = 16
+SHIFT_BANDS = 8
+HASH_SIZE = 32
+
+
+def read_pgm(path: Path) -> "np.ndarray":
+    """Decode a binary (P5) 8-bit PGM as produced by `pdftoppm -gray`."""
+    data = Path(path).read_bytes()
+    fields: List[bytes] = []
+    pos = 0
+    while len(fields) < 4:
+        while data[pos : pos + 1].isspace():
+            pos += 1
+        if data[pos : pos + 1] == b"#":
+            pos = data.index(b"\n", pos) + 1
+            continue
+        end = pos
+        while not data[end : end + 1].isspace():
+            end += 1
+        fields.append(data[pos:end])
+        pos = end
+    if fields[0] != b"P5" or int(fields[3]) > 255:
+        raise ValueError(f"{path}: unsupported PGM ({fields[0]!r}, maxval {fields[3]!r})")
+    width, height = int(fields[1]), int(fields[2])
+    pixels = np.frombuffer(data, dtype=np.uint8, count=width * height, offset=pos + 1)
+    return pixels.reshape(height, width)
+
+
+def _block_mass(ink: "np.ndarray", size: int) -> "np.ndarray":
+    h, w = (ink.shape[0] // size) * size, (ink.shape[1] // size) * size
+    return ink[:h, :w].reshape(h // size, size, w // size, size).sum(axis=(1, 3))
+
+
+def _band_shifts(src: "np.ndarray", out: "np.ndarray", bands: int) -> "np.ndarray":
+    """Per-band displacement (pixels, along axis 0) that best aligns the ink profiles.
+
+    The page is cut into `bands` strips across axis 1; each strip's ink profile along axis 0 is
+    cross-correlated with the output's (FFT, all strips at once). Strips without ink on either
+    side report 0.
+    """
+    length = src.shape[0]
+    edges = np.linspace(0, src.shape[1], bands + 1).astype(int)
+    a = np.add.reduceat(src.astype(np.float64), edges[:-1], axis=1).T
+    b = np.add.reduceat(out.astype(np.float64), edges[:-1], axis=1).T
+    present = (a.sum(axis=1) > 0) & (b.sum(axis=1) > 0)
+    a -= a.mean(axis=1, keepdims=True)
+    b -= b.mean(axis=1, keepdims=True)
+    n = 2 * length
+    corr = np.fft.irfft(np.fft.rfft(b, n) * np.conj(np.fft.rfft(a, n)), n)
+    lags = np.arange(n)
+    lags[lags >= length] -= n
+    best = lags[np.argmax(corr, axis=1)]
+    return np.where(present, best, 0)
+
+
+def _bbox(ink: "np.ndarray") -> Tuple[int, int, int, int] | None:
+    rows = np.flatnonzero(ink.any(axis=1))
+    cols = np.flatnonzero(ink.any(axis=0))
+    if rows.size == 0:
+        return None
+    return int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1
+
+
+def _bbox_iou(a: Tuple[int, int, int, int] | None, b: Tuple[int, int, int, int] | None) -> float:
+    if a is None or b is None:
+        return 1.0 if a == b else 0.0
+    w = min(a[2], b[2]) - max(a[0], b[0])
+    h = min(a[3], b[3]) - max(a[1], b[1])
+    inter = max(0, w) * max(0, h)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union else 1.0
+
+
+def _dct_matrix(n: int) -> "np.ndarray":
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    mat = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    mat[0] /= np.sqrt(2.0)
+    return mat
+
+
+def phash(gray: "np.ndarray") -> int:
+    """64-bit DCT perceptual hash from an area-averaged 32x32 thumbnail."""
+    h, w = gray.shape
+    ys = np.linspace(0, h, HASH_SIZE + 1).astype(int)
+    xs = np.linspace(0, w, HASH_SIZE + 1).astype(int)
+    sums = np.add.reduceat(np.add.reduceat(gray.astype(np.float64), ys[:-1], axis=0), xs[:-1], axis=1)
+    areas = np.diff(ys)[:, None] * np.diff(xs)[None, :]
+    thumb = sums / np.maximum(areas, 1)
+    dct = _dct_matrix(HASH_SIZE)
+    low = (dct @ thumb @ dct.T)[:8, :8].ravel()
+    bits = low > np.median(low[1:])
+    return int("".join("1" if b else "0" for b in bits), 2)
+
+
+def page_metrics(source: str, output: str, block_px: int = BLOCK_PX) -> Dict[str, Any]:
+    src = read_pgm(Path(source))
+    out = read_pgm(Path(output))
+    h, w = min(src.shape[0], out.shape[0]), min(src.shape[1], out.shape[1])
+    size_match = src.shape == out.shape
+    src, out = src[:h, :w], out[:h, :w]
+    src_ink, out_ink = src < INK_LEVEL, out < INK_LEVEL
+
+    src_occ = _block_mass(src_ink, block_px) > 0
+    out_occ = _block_mass(out_ink, block_px) > 0
+    union = int((src_occ | out_occ).sum())
+    block_iou = float((src_occ & out_occ).sum()) / union if union else 1.0
+    dy = np.abs(_band_shifts(src_ink, out_ink, SHIFT_BANDS)) / h
+    dx = np.abs(_band_shifts(src_ink.T, out_ink.T, SHIFT_BANDS)) / w
+    layout_shift = float(max(dy.max(), dx.max()))
+
+    return {
+        "size_match": size_match,
+        "layout_shift": round(layout_shift, 5),
+        "block_iou": round(block_iou, 4),
+        "content_bbox_iou": round(_bbox_iou(_bbox(src_ink), _bbox(out_ink)), 4),
+        "phash_distance": bin(phash(src) ^ phash(out)).count("1"),
+    }
+
+
+def _page_job(pair: Tuple[str, str]) -> Dict[str, Any]:
+    try:
+        return page_metrics(*pair)
+    except (OSError, ValueError) as exc:
+        return {"error": str(exc)}
+
+
+def evaluate(metrics: Dict[str, Any], thresholds: Dict[str, Any]) -> Dict[str, bool]:
+    limits = {**DEFAULT_THRESHOLDS, **thresholds}
+    return {
+        "layout_shift_within_threshold": metrics["layout_shift"] <= limits["max_layout_shift"],
+        "block_iou_within_threshold": metrics["block_iou"] >= limits["min_block_iou"],
+        "content_bbox_iou_within_threshold": metrics["content_bbox_iou"] >= limits["min_content_bbox_iou"],
+        "perceptual_hash_within_threshold": metrics["phash_distance"] <= limits["max_phash_distance"],
+    }
+
+
+def worst_case(pages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "layout_shift": max(p["layout_shift"] for p in pages),
+        "block_iou": min(p["block_iou"] for p in pages),
+        "content_bbox_iou": min(p["content_bbox_iou"] for p in pages),
+        "phash_distance": max(p["phash_distance"] for p in pages),
+    }
+
+
+def render_pair(
+    source: Path, output: Path, config: Dict[str, Any], max_workers: int
+) -> Tuple[List[Tuple[str, str]], Dict[str, Any]]:
+    """Rasterize both documents (cached) and pair pages by number."""
+    rendered = {
+        role: rasterize(path, "all", config, max_workers=max_workers, section="visual_rasterizer")
+        for role, path in (("source", source), ("output", output))
+    }
+    pages = {
+        role: {item["page"]: item["path"] for item in res.get("items", []) if item["status"] == "PASS"}
+        for role, res in rendered.items()
+    }
+    common = sorted(set(pages["source"]) & set(pages["output"]))
+    info = {
+        "source_pages": len(pages["source"]),
+        "output_pages": len(pages["output"]),
+        "render_status": "PASS" if all(r.get("status") == "PASS" for r in rendered.values()) else "FAIL",
+        "cache": {role: res.get("cache") for role, res in rendered.items()},
+    }
+    return [(pages["source"][p], pages["output"][p]) for p in common], info
+
+
+@tracing.traced()
+def compare_documents(
+    pairs: Dict[str, Tuple[Path, Path]],
+    thresholds: Dict[str, Dict[str, Any]],
+    config: Dict[str, Any],
+    max_workers: int,
+) -> Dict[str, Dict[str, Any]]:
+    """Compare several (source, output) documents; all their pages share one process pool."""
+    if np is None:
+        return {key: {"status": "FAIL", "reason": "numpy_required"} for key in pairs}
+
+    rendered = {key: render_pair(src, out, config, max_workers) for key, (src, out) in pairs.items()}
+    jobs = [(key, pair) for key, (page_pairs, _) in rendered.items() for pair in page_pairs]
+    with ProcessPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        metrics = list(pool.map(_page_job, [pair for _, pair in jobs], chunksize=max(1, len(jobs) // (max_workers * 4))))
+
+    per_doc: Dict[str, List[Dict[str, Any]]] = {key: [] for key in pairs}
+    for (key, _), page in zip(jobs, metrics):
+        per_doc[key].append(page)
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for key, (_, info) in rendered.items():
+        pages = per_doc[key]
+        errors = [p["error"] for p in pages if "error" in p]
+        good = [p for p in pages if "error" not in p]
+        if not good or errors or info["render_status"] != "PASS":
+            results[key] = {"status": "FAIL", "reason": "render_or_decode_failed", "errors": errors[:5], **info}
+            continue
+        worst = worst_case(good)
+        checks = evaluate(worst, thresholds.get(key, {}))
+        results[key] = {
+            "status": "PASS" if all(checks.values()) else "FAIL",
+            "pages_compared": len(good),
+            "metrics": worst,
+            "checks": checks,
+            "pages": good,
+            **info,
+        }
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare rendered pages of a source PDF and its bilingual output")
+    parser.add_argument("source", type=Path)
+    parser.add_argument("output", type=Path)
+    parser.add_argument("--config", type=Path, default=Path("configs/ocr-tools.json"))
+    parser.add_argument("--thresholds", help="JSON object overriding the default thresholds")
+    parser.add_argument("--max-workers", type=int, default=2)
+    args = parser.parse_args()
+
+    config = json.loads(args.config.read_text())
+    thresholds = {"doc": json.loads(args.thresholds)} if args.thresholds else {}
+    result = compare_documents({"doc": (args.source, args.output)}, thresholds, config, args.max_workers)["doc"]
+    print(json.dumps(result, indent=2))
+    return 0 if result["status"] == "PASS" else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(stage_profile.run(main))